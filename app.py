@@ -1,42 +1,153 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, url_for, send_from_directory, g
 from flask_cors import CORS
 import requests
 import os
 from dotenv import load_dotenv
 import re
+import math
 import urllib.parse
 import json
+import logging
+import threading
+import time
+import uuid
+import mimetypes
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from geo_index import MAX_RADIUS_MILES, ZipSiteLocator
+from site_catalog import find_site
+from response_cache import LRUCache, CachedResponse, compute_etag, etag_matches, choose_encoding, normalize_query
+from traffic_capture import TrafficRecorder
+from metrics import METRICS
+from micro_batcher import MicroBatcher, BatchFailed
+from structured_logging import configure_logging, bind_request, unbind_request, log_event, dropped_records
+from refinement import RefinementSessions, intent_signature, intent_words, merge_filters, changed_filters
+from category_classifier import CategoryClassifier
+from vehicle_catalog import get_catalog as get_vehicle_catalog
+from response_shaping import dumps, parse_fields, parse_flag, shape_result
+from generation_budget import GenerationBudget
+from output_scanner import MAX_OUTPUT_CHARS, LABELLED_LIST_PATTERNS, find_json_object, product_phrases, capitalized_phrases
+from build_assets import hashed_name
+from prompt_library import SYSTEM_PROMPT, CATEGORY_PROMPTS, LIBRARY_HASH, prompt_hash, prompt_for_category
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
+logger = configure_logging()
+
+@app.before_request
+def bind_request_logging():
+    """Tag this request's log records with its id"""
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+    g.log_tokens = bind_request(g.request_id)
+
+@app.teardown_request
+def unbind_request_logging(exc=None):
+    tokens = g.pop('log_tokens', None)
+    if tokens is not None:
+        unbind_request(tokens)
+
+# Fingerprinted assets written by build_assets.py
+ASSET_DIST_DIR = os.path.join(app.static_folder, 'dist')
+ASSET_MANIFEST_PATH = os.path.join(ASSET_DIST_DIR, 'manifest.json')
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+ASSET_EXTENSIONS = {'br': 'br', 'gzip': 'gz'}
+
+def load_asset_manifest():
+    """Map source asset paths to their hashed build paths, if assets were built
+    
+    A build whose hash no longer matches its source file (edited since the
+    last build_assets.py run) is left out, so the unfingerprinted source is
+    served instead of stale code under a year-long cache header.
+    """
+    try:
+        with open(ASSET_MANIFEST_PATH) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    current = {}
+    for source, built in manifest.items():
+        try:
+            with open(os.path.join(app.static_folder, source), 'rb') as f:
+                content = f.read()
+        except OSError:
+            continue
+        if built == f"dist/{hashed_name(source, content)}":
+            current[source] = built
+        else:
+            log_event(logger, logging.WARNING, "stale_asset_build", asset=source, build=built)
+    return current
+
+ASSET_MANIFEST = load_asset_manifest()
+
+@app.template_global()
+def asset_url(filename):
+    """URL for a static asset, preferring its fingerprinted build"""
+    return url_for('static', filename=ASSET_MANIFEST.get(filename, filename))
 
 # Configure Ollama
 OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.2:3b')
+# Keep the model, and with it the evaluated system prompt, loaded between requests
+OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+# Optional name for a derived model with SYSTEM_PROMPT baked in
+OLLAMA_PROMPT_MODEL = os.getenv('OLLAMA_PROMPT_MODEL')
+# Send the compact prompt for the query's pre-extracted category (see prompt_library.py)
+CATEGORY_PROMPTS_ENABLED = os.getenv('OLLAMA_CATEGORY_PROMPTS', '1') != '0'
+# Most tokens an answer may take; with ADAPTIVE_NUM_PREDICT each request gets a
+# budget learned from recent answer lengths instead (see generation_budget.py)
+OLLAMA_NUM_PREDICT = int(os.getenv('OLLAMA_NUM_PREDICT', '1000'))
+ADAPTIVE_NUM_PREDICT = os.getenv('ADAPTIVE_NUM_PREDICT', '1') != '0'
+GENERATION_BUDGET = GenerationBudget(
+    default=OLLAMA_NUM_PREDICT,
+    fraction=float(os.getenv('NUM_PREDICT_PERCENTILE', '0.99')),
+    margin=float(os.getenv('NUM_PREDICT_MARGIN', '1.25'))
+)
+
+# Local category classifier used when no category keyword matches
+# (see category_classifier.py and train_category_model.py)
+CATEGORY_MODEL_PATH = os.getenv('CATEGORY_MODEL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'category_model.json'))
+CATEGORY_MODEL_MIN_CONFIDENCE = float(os.getenv('CATEGORY_MODEL_MIN_CONFIDENCE', '0.8'))
+# Answer queries naming a known make or model from data/vehicle_catalog.json instead of Ollama
+VEHICLE_CATALOG_ENABLED = os.getenv('VEHICLE_CATALOG', '1') != '0'
+
+# HTTP caching for GET /api/generate-link
+GENERATE_LINK_MAX_AGE = int(os.getenv('GENERATE_LINK_MAX_AGE', '3600'))
+GENERATE_LINK_STALE_WHILE_REVALIDATE = int(os.getenv('GENERATE_LINK_STALE_WHILE_REVALIDATE', '86400'))
+RESPONSE_CACHE = LRUCache(int(os.getenv('RESPONSE_CACHE_SIZE', '1024')))
+
+# Longest query accepted; the extractors and the prompt never need more
+MAX_QUERY_CHARS = int(os.getenv('MAX_QUERY_CHARS', '500'))
+QUERY_TOO_LONG = f'Query is too long (at most {MAX_QUERY_CHARS} characters)'
+
+# Latency budget for generate-link, overridable per request with the
+# X-Deadline-Ms header or a deadline_ms parameter (capped at the maximum)
+DEFAULT_DEADLINE_MS = int(os.getenv('GENERATE_LINK_DEADLINE_MS', '120000'))
+MAX_DEADLINE_MS = int(os.getenv('GENERATE_LINK_MAX_DEADLINE_MS', '120000'))
+OLLAMA_CONNECT_TIMEOUT = 10
+
+# Optional micro-batching: queries arriving within the window share one Ollama
+# call (0 disables it). See micro_batcher.py.
+OLLAMA_BATCH_WINDOW_MS = int(os.getenv('OLLAMA_BATCH_WINDOW_MS', '0'))
+OLLAMA_BATCH_MAX_SIZE = int(os.getenv('OLLAMA_BATCH_MAX_SIZE', '8'))
+OLLAMA_BATCH_CONCURRENCY = int(os.getenv('OLLAMA_BATCH_CONCURRENCY', '2'))
+OLLAMA_BATCH_TOKENS_PER_QUERY = 400
+
+# Opt-in traffic capture for load testing (see traffic_capture.py and replay_traffic.py)
+TRAFFIC_CAPTURE_DIR = os.getenv('TRAFFIC_CAPTURE_DIR')
+TRAFFIC_CAPTURE = TrafficRecorder(
+    TRAFFIC_CAPTURE_DIR,
+    sample_rate=float(os.getenv('TRAFFIC_CAPTURE_SAMPLE_RATE', '1.0')),
+    max_bytes=int(os.getenv('TRAFFIC_CAPTURE_MAX_BYTES', str(64 * 1024 * 1024))),
+    max_files=int(os.getenv('TRAFFIC_CAPTURE_MAX_FILES', '10'))
+) if TRAFFIC_CAPTURE_DIR else None
 
 # Craigslist configuration
 DEFAULT_CITY = "sfbay"  # San Francisco Bay Area
-CITY_MAPPING = {
-    "san francisco": "sfbay",
-    "sf": "sfbay",
-    "bay area": "sfbay",
-    "new york": "nyc",
-    "nyc": "nyc",
-    "los angeles": "losangeles",
-    "la": "losangeles",
-    "chicago": "chicago",
-    "seattle": "seattle",
-    "austin": "austin",
-    "denver": "denver",
-    "miami": "miami",
-    "atlanta": "atlanta",
-    "phoenix": "phoenix",
-    "dallas": "dallas",
-    "houston": "houston"
-}
+# City names are matched against the full site catalog in data/craigslist_sites.json
 
 # Category mapping for common searches
 CATEGORY_MAPPING = {
@@ -146,13 +257,22 @@ CATEGORY_MAPPING = {
     "other": "sss"
 }
 
+# Zip code -> nearest Craigslist site index, loaded once at startup
+ZIP_LOCATOR = ZipSiteLocator.load()
+
+def find_city_in_query(query):
+    """Return the city code explicitly mentioned in the query, or None"""
+    return find_site(query)
+
 def extract_city_from_query(query):
     """Extract city from user query if mentioned"""
-    query_lower = query.lower()
-    for city_name, city_code in CITY_MAPPING.items():
-        if city_name in query_lower:
-            return city_code
-    return DEFAULT_CITY
+    return find_city_in_query(query) or DEFAULT_CITY
+
+def resolve_city_from_zip(zip_code, radius=None):
+    """Return (nearest_site, nearby_sites) for a zip code using the offline index"""
+    if not zip_code:
+        return None, []
+    return ZIP_LOCATOR.locate(zip_code, radius)
 
 def extract_category_from_query(query):
     """Extract category from user query if mentioned"""
@@ -205,37 +325,78 @@ def extract_category_from_query(query):
     
     return None
 
-def extract_zip_code_from_query(query):
-    """Extract zip code from user query with context awareness"""
-    import re
-    query_lower = query.lower()
+def load_category_model():
+    """Load the trained category classifier, if there is one"""
+    if not os.path.isfile(CATEGORY_MODEL_PATH):
+        return None
+    try:
+        return CategoryClassifier.load(CATEGORY_MODEL_PATH)
+    except (OSError, ValueError, KeyError) as e:
+        log_event(logger, logging.WARNING, "category_model_load_failed", path=CATEGORY_MODEL_PATH, error=str(e))
+        return None
+
+CATEGORY_MODEL = load_category_model()
+
+def classify_category(query):
+    """Category from the keyword list, or from the local classifier when it is confident"""
+    category = extract_category_from_query(query)
+    if category is not None or CATEGORY_MODEL is None:
+        return category
+    predicted, confidence = CATEGORY_MODEL.predict(query)
+    METRICS.observe("classifier.confidence", round(confidence, 3))
+    if confidence < CATEGORY_MODEL_MIN_CONFIDENCE:
+        return None
+    METRICS.increment("classifier.used")
+    return predicted
+
+# Zip codes named as a place; only these move the search to another site
+CONTEXTUAL_ZIP_PATTERNS = [
+    # "within X miles of 90210" - most specific
+    r'within\s+\d+\s+miles?\s+of\s+(\d{5})',
+    # "near 90210" or "around 90210"
+    r'(?:near|around|in|at)\s+(\d{5})',
+    # "zip code 90210" or "postal code 90210"
+    r'(?:zip\s+code|postal\s+code|zip)\s+(\d{5})',
+    # "90210 area" or "90210 region"
+    r'(\d{5})\s+(?:area|region|zone)'
+]
+
+# A number right after these is a price, not a zip code
+PRICE_PREFIX = re.compile(r'(?:\$|\b(?:under|over|below|above|max|min|budget|price|less\s+than|more\s+than|up\s+to))\s*\$?\s*$')
+
+def find_zip_code(query, prices=()):
+    """Return (zip_code, contextual) for a query, or (None, False)
     
-    # Look for zip codes in specific contexts to avoid confusion with prices
-    zip_patterns = [
-        # "within X miles of 90210" - most specific
-        r'within\s+\d+\s+miles?\s+of\s+(\d{5})',
-        # "near 90210" or "around 90210"
-        r'(?:near|around|in|at)\s+(\d{5})',
-        # "zip code 90210" or "postal code 90210"
-        r'(?:zip\s+code|postal\s+code)\s+(\d{5})',
-        # "90210 area" or "90210 region"
-        r'(\d{5})\s+(?:area|region|zone)',
-        # General 5-digit pattern but validate it's a reasonable zip code
-        r'\b(\d{5})\b'
-    ]
+    contextual is True when the zip was named as a place ("near 94110");
+    a bare 5-digit number is only a guess. Numbers that read as a price, or
+    equal one of prices, are never zip codes.
+    """
+    query_lower = query.lower()
     
-    for pattern in zip_patterns:
+    for pattern in CONTEXTUAL_ZIP_PATTERNS:
         match = re.search(pattern, query_lower)
-        if match:
-            zip_code = match.group(1)
-            # Validate it's a reasonable US zip code (10000-99999)
-            if 10000 <= int(zip_code) <= 99999:
-                return zip_code
+        # Validate it's a reasonable US zip code (10000-99999)
+        if match and 10000 <= int(match.group(1)) <= 99999:
+            return match.group(1), True
     
-    return None
+    # General 5-digit pattern, skipping anything that looks like a price
+    for match in re.finditer(r'\b(\d{5})\b', query_lower):
+        zip_code = match.group(1)
+        if not 10000 <= int(zip_code) <= 99999 or int(zip_code) in prices:
+            continue
+        if PRICE_PREFIX.search(query_lower, 0, match.start()):
+            continue
+        return zip_code, False
+    
+    return None, False
+
+def extract_zip_code_from_query(query):
+    """Extract zip code from user query with context awareness"""
+    min_price, max_price = extract_price_from_query(query)
+    return find_zip_code(query, (min_price, max_price))[0]
 
 def extract_radius_from_query(query):
-    """Extract radius from user query"""
+    """Extract radius from user query, capped at Craigslist's largest search distance"""
     import re
     query_lower = query.lower()
     
@@ -254,7 +415,7 @@ def extract_radius_from_query(query):
         match = re.search(pattern, query_lower)
         if match:
             radius_value = int(match.group(1)) * multiplier
-            return int(radius_value)
+            return min(int(radius_value), MAX_RADIUS_MILES)
     
     return None
 
@@ -495,7 +656,7 @@ def extract_vehicle_parameters(query):
 
 def extract_partial_response(ai_response, fallback_category):
     """Intelligently extract information from AI response when JSON parsing fails"""
-    import re
+    ai_response = ai_response[:MAX_OUTPUT_CHARS]
     
     # Initialize with fallback values
     result = {
@@ -508,17 +669,15 @@ def extract_partial_response(ai_response, fallback_category):
     
     # Try to extract recommendations from the response text
     # Look for patterns like "recommended monitors are:", "items:", etc.
-    recommendation_patterns = [
-        r'recommendations?[:\s]+([^.]+)',
-        r'items?[:\s]+([^.]+)',
-        r'suggested[:\s]+([^.]+)',
-        r'popular[:\s]+([^.]+)',
-        r'([A-Z][a-z]+(?:\s+[A-Z][a-z0-9]+)*\s+(?:monitor|tv|laptop|car|phone|furniture|apartment|house|job))',
-        r'([A-Z][a-z]+(?:\s+[A-Z][a-z0-9]+)*\s+[A-Z][a-z]+(?:\s+[A-Z][a-z0-9]+)*)'
+    # The phrase finders scan in linear time (see output_scanner.py)
+    recommendation_finders = [
+        *(pattern.findall for pattern in LABELLED_LIST_PATTERNS),
+        lambda text: product_phrases(text, ignore_case=True),
+        lambda text: capitalized_phrases(text, ignore_case=True)
     ]
     
-    for pattern in recommendation_patterns:
-        matches = re.findall(pattern, ai_response, re.IGNORECASE)
+    for find in recommendation_finders:
+        matches = find(ai_response)
         if matches:
             # Clean up the matches and extract individual items
             for match in matches:
@@ -535,13 +694,10 @@ def extract_partial_response(ai_response, fallback_category):
     # If no recommendations found, try to extract from the explanation
     if not result["recommendations"]:
         # Look for brand names and product types
-        brand_patterns = [
-            r'([A-Z][a-z]+(?:\s+[A-Z][a-z0-9]+)*\s+(?:monitor|tv|laptop|car|phone|furniture|apartment|house|job))',
-            r'([A-Z][a-z]+(?:\s+[A-Z][a-z0-9]+)*\s+[A-Z][a-z]+(?:\s+[A-Z][a-z0-9]+)*)'
-        ]
+        brand_finders = [product_phrases, capitalized_phrases]
         
-        for pattern in brand_patterns:
-            matches = re.findall(pattern, ai_response)
+        for find in brand_finders:
+            matches = find(ai_response)
             if matches:
                 for match in matches:
                     if match and len(match) > 2 and match not in result["recommendations"]:
@@ -588,16 +744,56 @@ def extract_partial_response(ai_response, fallback_category):
     
     # If still no recommendations, provide generic ones based on category
     if not result["recommendations"]:
-        if fallback_category == "sys":
-            result["recommendations"] = ["Computer", "Laptop", "Monitor", "Desktop", "Tablet"]
-        elif fallback_category == "cta":
-            result["recommendations"] = ["Car", "Truck", "SUV", "Sedan", "Vehicle"]
-        elif fallback_category == "fua":
-            result["recommendations"] = ["Furniture", "Couch", "Table", "Chair", "Bed"]
-        elif fallback_category == "apa":
-            result["recommendations"] = ["Apartment", "Studio", "1BR", "2BR", "Rental"]
-        else:
-            result["recommendations"] = ["Item", "Product", "Service", "Goods"]
+        result["recommendations"] = default_recommendations(fallback_category)
+    
+    return result
+
+def default_recommendations(category):
+    """Generic recommendations for a category when the AI gave none"""
+    if category == "sys":
+        return ["Computer", "Laptop", "Monitor", "Desktop", "Tablet"]
+    elif category == "cta":
+        return ["Car", "Truck", "SUV", "Sedan", "Vehicle"]
+    elif category == "fua":
+        return ["Furniture", "Couch", "Table", "Chair", "Bed"]
+    elif category == "apa":
+        return ["Apartment", "Studio", "1BR", "2BR", "Rental"]
+    else:
+        return ["Item", "Product", "Service", "Goods"]
+
+def extract_streamed_fields(partial_response):
+    """Pull the fields that were completed in a JSON answer cut off mid-stream
+    
+    Only fully closed string values are kept, so a recommendation that was
+    still being written when the stream stopped is dropped.
+    """
+    result = {"recommendations": []}
+    
+    list_match = re.search(r'"recommendations"\s*:\s*\[', partial_response)
+    if list_match:
+        string_or_end = re.compile(r'\s*,?\s*(?:"((?:[^"\\]|\\.)*)"|(\]))')
+        position = list_match.end()
+        while True:
+            match = string_or_end.match(partial_response, position)
+            if not match or match.group(2):
+                break
+            try:
+                item = json.loads(f'"{match.group(1)}"').strip()
+            except json.JSONDecodeError:
+                break
+            if item and item not in result["recommendations"]:
+                result["recommendations"].append(item)
+            position = match.end()
+    
+    category_match = re.search(r'"category"\s*:\s*"([a-z]{3})"', partial_response)
+    if category_match:
+        result["category"] = category_match.group(1)
+    
+    for key in ("min_price", "max_price"):
+        # A trailing delimiter shows the number was not still being streamed
+        price_match = re.search(rf'"{key}"\s*:\s*(\d+)\s*[,}}]', partial_response)
+        if price_match:
+            result[key] = int(price_match.group(1))
     
     return result
 
@@ -660,225 +856,959 @@ def generate_craigslist_link(keywords, city, category, min_price=None, max_price
         return f"{base_url}?{'&'.join(params)}"
     return base_url
 
+# Identifies the model and prompts that produced a result, for ETags
+SYSTEM_PROMPT_HASH = prompt_hash(SYSTEM_PROMPT)
+MODEL_VERSION = f"{OLLAMA_MODEL}+{LIBRARY_HASH if CATEGORY_PROMPTS_ENABLED else SYSTEM_PROMPT_HASH}"
+
+# A failed creation is tried again after this many seconds
+PROMPT_MODEL_RETRY_SECONDS = float(os.getenv('OLLAMA_PROMPT_MODEL_RETRY', '60'))
+
+class PromptModel:
+    """A derived Ollama model with one system prompt built in
+    
+    It is tagged with a hash of the base model and the prompt, so changing
+    OLLAMA_MODEL or editing a prompt creates a new model instead of reusing a
+    stale one.
+    """
+    
+    def __init__(self, system_prompt, base_model=None):
+        self.system_prompt = system_prompt
+        self.base_model = base_model or OLLAMA_MODEL
+        self.name = f"{OLLAMA_PROMPT_MODEL.split(':')[0]}:{prompt_hash(self.base_model, system_prompt)}"
+        self.ready = False
+        self.failed_at = None
+        self.creating = threading.Lock()
+    
+    def create(self):
+        """Create the model unless Ollama has it; returns whether it can be used"""
+        if not self.creating.acquire(blocking=False):
+            return self.ready  # Another thread is creating it
+        try:
+            show = requests.post(f"{OLLAMA_BASE_URL}/api/show", json={"model": self.name}, timeout=10)
+            if show.status_code != 200:
+                created = requests.post(f"{OLLAMA_BASE_URL}/api/create", json={
+                    "model": self.name,
+                    "from": self.base_model,
+                    "system": self.system_prompt,
+                    "stream": False
+                }, timeout=300)
+                created.raise_for_status()
+            self.ready = True
+        except requests.exceptions.RequestException as e:
+            # Requests keep sending the system prompt themselves until a retry works
+            self.failed_at = time.monotonic()
+            log_event(logger, logging.WARNING, "prompt_model_unavailable",
+                      model=self.name, error=str(e), retry_seconds=PROMPT_MODEL_RETRY_SECONDS)
+        finally:
+            self.creating.release()
+        return self.ready
+    
+    def ensure(self):
+        """Whether requests can use the model; never blocks
+        
+        The model is created at startup by warm_prompt_cache(), or in the
+        background after the first request that needs it when the app runs
+        under another server. A failed creation is retried after
+        PROMPT_MODEL_RETRY_SECONDS.
+        """
+        if self.ready:
+            return True
+        failed_at = self.failed_at
+        if not self.creating.locked() and (
+                failed_at is None or time.monotonic() - failed_at >= PROMPT_MODEL_RETRY_SECONDS):
+            threading.Thread(target=self.create, name="prompt-model", daemon=True).start()
+        return False
+
+# The system prompts requests can get, most general first
+ACTIVE_PROMPTS = list(dict.fromkeys([SYSTEM_PROMPT, *(CATEGORY_PROMPTS.values() if CATEGORY_PROMPTS_ENABLED else ())]))
+# One derived model per prompt, keyed by the prompt text
+PROMPT_MODELS = {prompt: PromptModel(prompt) for prompt in ACTIVE_PROMPTS} if OLLAMA_PROMPT_MODEL else {}
+PROMPT_MODEL_NAME = PROMPT_MODELS[SYSTEM_PROMPT].name if PROMPT_MODELS else None
+
+def build_chat_payload(user_query, stream=True, num_predict=OLLAMA_NUM_PREDICT, category=None,
+                       use_prompt_model=True):
+    """Ollama /api/chat payload for a query
+    
+    Queries with a pre-extracted category get that category's compact prompt.
+    Each system prompt is sent byte-for-byte identically every time (or is
+    baked into its prompt model), so Ollama can reuse its evaluated
+    prefix from the loaded model's cache and only evaluate the user message.
+    With use_prompt_model=False the prompt is always sent in the messages and
+    the prompt models are left alone.
+    """
+    user_prompt = f"User request: {user_query}"
+    system_prompt = prompt_for_category(category) if CATEGORY_PROMPTS_ENABLED else SYSTEM_PROMPT
+    
+    prompt_model = PROMPT_MODELS.get(system_prompt) if use_prompt_model else None
+    if prompt_model is not None and prompt_model.ensure():
+        model = prompt_model.name
+        messages = [{"role": "user", "content": user_prompt}]
+    else:
+        model = OLLAMA_MODEL
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    return {
+        "model": model,
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {
+            "temperature": 0.1,
+            "num_predict": num_predict,  # Output token budget
+            "top_k": 15,         # Limit token selection for speed
+            "top_p": 0.9,        # Nucleus sampling for efficiency
+            "repeat_penalty": 1.1 # Prevent repetitive responses
+        }
+    }
+
+def record_ollama_stats(final_chunk):
+    """Record token counts and timings from the last chunk of an Ollama answer"""
+    METRICS.increment("ollama.requests")
+    for key in ("prompt_eval_count", "eval_count"):
+        if key in final_chunk:
+            METRICS.observe(f"ollama.{key}", final_chunk[key])
+    for key in ("prompt_eval_duration", "eval_duration", "load_duration", "total_duration"):
+        if key in final_chunk:
+            # Ollama reports durations in nanoseconds
+            METRICS.observe(f"ollama.{key.replace('_duration', '_ms')}", round(final_chunk[key] / 1e6, 2))
+
+def warm_prompt_cache():
+    """Create the prompt models if configured, then load the model and evaluate every system prompt ahead of the first request"""
+    for prompt_model in PROMPT_MODELS.values():
+        prompt_model.create()
+    # One category per distinct prompt; None gets the full prompt
+    categories = {SYSTEM_PROMPT: None}
+    if CATEGORY_PROMPTS_ENABLED:
+        for category, prompt in CATEGORY_PROMPTS.items():
+            categories.setdefault(prompt, category)
+    for prompt, category in categories.items():
+        try:
+            payload = build_chat_payload("", stream=False, num_predict=1, category=category)
+            requests.post(f"{OLLAMA_BASE_URL}/api/chat", json=payload, timeout=300).raise_for_status()
+        except requests.exceptions.RequestException as e:
+            log_event(logger, logging.WARNING, "ollama_warmup_failed", prompt=prompt_hash(prompt), error=str(e))
+
+def extract_query_filters(user_query):
+    """Run every deterministic extractor over a user query"""
+    min_price, max_price = extract_price_from_query(user_query)
+    zip_code, contextual_zip = find_zip_code(user_query, (min_price, max_price))
+    radius = extract_radius_from_query(user_query)
+    
+    # A named city wins; otherwise use the Craigslist site nearest a zip code
+    # named as a place. A bare 5-digit number only becomes the postal filter.
+    zip_city, nearby_sites = resolve_city_from_zip(zip_code if contextual_zip else None, radius)
+    city = find_city_in_query(user_query) or zip_city or DEFAULT_CITY
+    
+    return {
+        "city": city,
+        "nearby_cities": [site for site, _ in nearby_sites if site != city],
+        "category": classify_category(user_query),
+        "zip_code": zip_code,
+        "radius": radius,
+        "min_price": min_price,
+        "max_price": max_price,
+        "vehicle_params": extract_vehicle_parameters(user_query)
+    }
+
+class RequestCancelled(Exception):
+    """Raised when the client cancels a request while Ollama is generating"""
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's latency budget runs out while Ollama is generating
+    
+    Carries whatever text Ollama streamed before the deadline.
+    """
+    
+    def __init__(self, partial_response=""):
+        super().__init__("Deadline exceeded before Ollama finished")
+        self.partial_response = partial_response
+
+def parse_deadline(value):
+    """Turn a deadline in milliseconds (or None for the default) into a monotonic deadline"""
+    try:
+        budget_ms = int(value) if value not in (None, '') else DEFAULT_DEADLINE_MS
+    except (TypeError, ValueError):
+        budget_ms = DEFAULT_DEADLINE_MS
+    budget_ms = max(0, min(budget_ms, MAX_DEADLINE_MS))
+    return time.monotonic() + budget_ms / 1000
+
+def request_deadline(data=None):
+    """Deadline for the current request from its header, parameter or the server default"""
+    value = request.headers.get('X-Deadline-Ms')
+    if value is None and data:
+        value = data.get('deadline_ms')
+    if value is None:
+        value = request.args.get('deadline_ms')
+    return parse_deadline(value)
+
+# Cancellation events for in-flight requests, keyed by the client's request id.
+# These live in process memory, so a cancel only reaches requests on the same worker.
+IN_FLIGHT_REQUESTS = {}
+CANCELLED_REQUEST_IDS = OrderedDict()  # cancels that arrived before their request
+MAX_CANCELLED_REQUEST_IDS = 1000
+IN_FLIGHT_LOCK = threading.Lock()
+
+def register_request(request_id):
+    """Track a request so it can be cancelled; returns its cancel event"""
+    cancel_event = threading.Event()
+    if request_id:
+        with IN_FLIGHT_LOCK:
+            if CANCELLED_REQUEST_IDS.pop(request_id, None):
+                cancel_event.set()
+            IN_FLIGHT_REQUESTS[request_id] = cancel_event
+    return cancel_event
+
+def release_request(request_id):
+    """Stop tracking a finished request"""
+    if request_id:
+        with IN_FLIGHT_LOCK:
+            IN_FLIGHT_REQUESTS.pop(request_id, None)
+
+def cancel_request_by_id(request_id):
+    """Signal an in-flight request to stop; returns True if it was running"""
+    with IN_FLIGHT_LOCK:
+        cancel_event = IN_FLIGHT_REQUESTS.get(request_id)
+        if cancel_event is None:
+            CANCELLED_REQUEST_IDS[request_id] = True
+            while len(CANCELLED_REQUEST_IDS) > MAX_CANCELLED_REQUEST_IDS:
+                CANCELLED_REQUEST_IDS.popitem(last=False)
+            return False
+    cancel_event.set()
+    return True
+
+def stream_chat(payload, cancel_event=None, deadline=None, max_chars=MAX_OUTPUT_CHARS):
+    """Stream an Ollama chat answer and return (response text, final chunk or {})
+    
+    Setting cancel_event, or passing the monotonic deadline, stops reading and
+    closes the connection, which makes Ollama abort the generation. A missed
+    deadline raises DeadlineExceeded with the text streamed so far. Output past
+    max_chars is cut off the same way.
+    """
+    def remaining():
+        return deadline - time.monotonic()
+    
+    content_parts = []
+    output_chars = 0
+    final_chunk = {}
+    if remaining() <= 0:
+        raise DeadlineExceeded()
+    
+    try:
+        # The read timeout bounds each wait for a chunk by the time left
+        with requests.post(
+            f"{OLLAMA_BASE_URL}/api/chat",
+            json=payload,
+            stream=True,
+            timeout=(min(OLLAMA_CONNECT_TIMEOUT, remaining()), remaining())
+        ) as response:
+            response.raise_for_status()
+            
+            # Collect the streamed message chunks
+            for line in response.iter_lines():
+                if cancel_event is not None and cancel_event.is_set():
+                    raise RequestCancelled("Request cancelled by client")
+                if remaining() <= 0:
+                    raise DeadlineExceeded("".join(content_parts))
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if 'error' in chunk:
+                    raise Exception(f"Ollama API error: {chunk['error']}")
+                content_parts.append(chunk['message']['content'])
+                output_chars += len(content_parts[-1])
+                if chunk.get('done'):
+                    record_ollama_stats(chunk)
+                    final_chunk = chunk
+                    break
+                if output_chars > max_chars:
+                    # Runaway output; closing the stream stops the generation
+                    METRICS.increment("ollama.output_capped")
+                    log_event(logger, logging.WARNING, "ollama_output_capped", response_chars=output_chars)
+                    break
+        
+        ai_response = "".join(content_parts).strip()
+        
+        log_event(logger, logging.DEBUG, "ollama_response",
+                  response_chars=len(ai_response), preview=ai_response[:200])
+        
+    except requests.exceptions.RequestException as e:
+        # Timeouts while streaming surface as ConnectionError, so check the clock
+        if remaining() <= 0:
+            raise DeadlineExceeded("".join(content_parts))
+        if isinstance(e, requests.exceptions.Timeout):
+            raise Exception("Request timed out. Ollama model is still processing. Try again in a moment.")
+        raise Exception(f"Ollama API error: {str(e)}")
+    except (KeyError, json.JSONDecodeError) as e:
+        raise Exception(f"Invalid response from Ollama: {str(e)}")
+    
+    return ai_response, final_chunk
+
+def hit_budget(final_chunk, num_predict):
+    """Whether Ollama stopped an answer because it used up num_predict"""
+    return final_chunk.get("done_reason") == "length" or final_chunk.get("eval_count", 0) >= num_predict
+
+def query_ollama(user_query, cancel_event=None, deadline=None, category=None):
+    """Ask Ollama for recommendations and return the raw response text
+    
+    The answer is streamed (see stream_chat) so the client can cancel it and
+    the deadline can stop it. The pre-extracted category selects the prompt
+    and the learned output budget; an answer the budget cut off before its
+    JSON was complete is asked for once more with the full OLLAMA_NUM_PREDICT.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + 120  # Increased timeout to 2 minutes
+    
+    num_predict = GENERATION_BUDGET.budget(OLLAMA_MODEL, category) if ADAPTIVE_NUM_PREDICT else OLLAMA_NUM_PREDICT
+    METRICS.observe("budget.num_predict", num_predict)
+    
+    ollama_payload = build_chat_payload(user_query, num_predict=num_predict, category=category)
+    ai_response, final_chunk = stream_chat(ollama_payload, cancel_event, deadline)
+    parsed_response, json_end = find_json_object(ai_response[:MAX_OUTPUT_CHARS])
+    
+    if final_chunk and hit_budget(final_chunk, num_predict) and num_predict < OLLAMA_NUM_PREDICT:
+        METRICS.increment("budget.truncated")
+        if parsed_response is None:
+            # The JSON didn't fit; the tokens spent so far are lost
+            METRICS.increment("budget.retries")
+            METRICS.increment("budget.retry_tokens", final_chunk.get("eval_count", num_predict))
+            log_event(logger, logging.INFO, "budget_retry", num_predict=num_predict, category=category)
+            num_predict = OLLAMA_NUM_PREDICT
+            ollama_payload = build_chat_payload(user_query, num_predict=num_predict, category=category)
+            ai_response, final_chunk = stream_chat(ollama_payload, cancel_event, deadline)
+            parsed_response, json_end = find_json_object(ai_response[:MAX_OUTPUT_CHARS])
+        else:
+            # The answer was complete and the model kept talking; the budget stopped it early
+            saved = OLLAMA_NUM_PREDICT - num_predict
+            METRICS.increment("budget.rambles_stopped")
+            METRICS.increment("budget.tokens_saved_max", saved)
+            if final_chunk.get("eval_count") and final_chunk.get("eval_duration"):
+                ms_per_token = final_chunk["eval_duration"] / 1e6 / final_chunk["eval_count"]
+                METRICS.increment("budget.ms_saved_max", round(saved * ms_per_token))
+    
+    # A retry ran with the full OLLAMA_NUM_PREDICT, so it saved nothing
+    METRICS.increment("budget.reserved_tokens_saved", OLLAMA_NUM_PREDICT - num_predict)
+    
+    if parsed_response is not None and final_chunk.get("eval_count"):
+        # Learn the tokens up to the end of the JSON; anything after it is rambling
+        GENERATION_BUDGET.record(OLLAMA_MODEL, category,
+                                 math.ceil(final_chunk["eval_count"] * json_end / max(len(ai_response), 1)))
+    
+    return ai_response
+
+BATCH_INSTRUCTIONS = """There are {count} separate user requests below. Answer each one on its own and return ONLY a JSON array of exactly {count} objects, one per request in the same order, each in the JSON format above.
+
+{requests}"""
+
+def query_ollama_batch(items):
+    """Answer several (user_query, category, deadline) items with one Ollama call
+    
+    Returns one raw JSON answer string per item, in order, so each can go
+    through parse_ai_response like a single answer. Raises if the reply is not
+    a JSON array with one object per item. The call stops at the earliest
+    deadline in the batch, and its output is capped at MAX_OUTPUT_CHARS per
+    item.
+    """
+    deadline = min(item_deadline for _, _, item_deadline in items)
+    categories = {category for _, category, _ in items}
+    # Items sharing a category share its compact prompt; mixed batches use the full one
+    category = categories.pop() if len(categories) == 1 else None
+    numbered = "\n".join(f"{number}. User request: {user_query}"
+                         for number, (user_query, _, _) in enumerate(items, 1))
+    
+    payload = build_chat_payload("", stream=True, num_predict=OLLAMA_BATCH_TOKENS_PER_QUERY * len(items),
+                                 category=category)
+    payload["messages"][-1]["content"] = BATCH_INSTRUCTIONS.format(count=len(items), requests=numbered)
+    
+    ai_response, _ = stream_chat(payload, deadline=deadline, max_chars=MAX_OUTPUT_CHARS * len(items))
+    
+    start, end = ai_response.find('['), ai_response.rfind(']')
+    if start < 0 or end < start:
+        raise ValueError("Batch answer has no JSON array")
+    answers = json.loads(ai_response[start:end + 1])
+    if not isinstance(answers, list) or len(answers) != len(items) or not all(isinstance(a, dict) for a in answers):
+        raise ValueError(f"Batch answer does not have {len(items)} objects")
+    return [json.dumps(answer) for answer in answers]
+
+OLLAMA_BATCHER = MicroBatcher(
+    query_ollama_batch,
+    window_ms=OLLAMA_BATCH_WINDOW_MS,
+    max_size=OLLAMA_BATCH_MAX_SIZE,
+    concurrency=OLLAMA_BATCH_CONCURRENCY
+) if OLLAMA_BATCH_WINDOW_MS > 0 else None
+
+def wait_for_batch(future, cancel_event=None, deadline=None):
+    """Wait for a batched answer while still honouring cancellation and the deadline"""
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            future.cancel()
+            raise RequestCancelled("Request cancelled by client")
+        timeout = 0.1
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                future.cancel()
+                raise DeadlineExceeded()
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            continue
+
+def request_ai_response(user_query, cancel_event=None, deadline=None, category=None):
+    """Raw AI answer for a query, through the micro-batcher when it is enabled"""
+    if OLLAMA_BATCHER is None:
+        return query_ollama(user_query, cancel_event, deadline, category)
+    
+    try:
+        # The batch call gives up when the earliest deadline in it passes
+        batch_deadline = deadline if deadline is not None else time.monotonic() + 120
+        return wait_for_batch(OLLAMA_BATCHER.submit((user_query, category, batch_deadline)), cancel_event, deadline)
+    except BatchFailed as e:
+        # A batch that could not be split is retried one query at a time
+        METRICS.increment("batch.fallbacks")
+        log_event(logger, logging.WARNING, "batch_fallback", error=str(e))
+        return query_ollama(user_query, cancel_event, deadline, category)
+
+def parse_ai_response(ai_response, category):
+    """Parse the JSON answer out of a raw Ollama response"""
+    # One linear pass finds the first complete JSON object, however long or odd the output
+    parsed_response, _ = find_json_object(ai_response[:MAX_OUTPUT_CHARS])
+    if parsed_response is None:
+        # Intelligent fallback based on the actual response content
+        parsed_response = extract_partial_response(ai_response, category)
+    
+    return parsed_response
+
+def build_item_links(recommendations, city, filters, parsed_response):
+    """Build one Craigslist search link per recommended item on a single site"""
+    craigslist_links = []
+    
+    for item in recommendations:
+        if item and item.strip():  # Skip empty items
+            individual_url = generate_craigslist_link(
+                [item],  # Single item
+                city,
+                parsed_response.get("category", filters["category"]) or "sss",
+                parsed_response.get("min_price") or filters["min_price"],  # Use extracted price or AI price
+                parsed_response.get("max_price") or filters["max_price"],  # Use extracted price or AI price
+                filters["zip_code"],  # Include zip code
+                filters["radius"],    # Include radius
+                filters["vehicle_params"]  # Include vehicle parameters
+            )
+            craigslist_links.append({
+                "item": item,
+                "url": individual_url
+            })
+    
+    return craigslist_links
+
+def vehicle_catalog_answer(user_query, filters):
+    """Answer a query naming a known vehicle from the local catalog, or None to ask Ollama"""
+    if not VEHICLE_CATALOG_ENABLED or filters["category"] not in (None, "cta"):
+        return None
+    answer = get_vehicle_catalog().recommendations(user_query)
+    if answer is None:
+        return None
+    METRICS.increment("vehicle_catalog.hits")
+    answer["min_price"], answer["max_price"] = filters["min_price"], filters["max_price"]
+    return answer
+
+def build_link_result(user_query, filters, parsed_response, degraded=False):
+    """Combine extracted filters and the parsed AI answer into the API result"""
+    category = filters["category"]
+    
+    # Generate individual Craigslist links for each recommendation
+    recommendations = parsed_response.get("recommendations", [])
+    craigslist_links = build_item_links(recommendations, filters["city"], filters, parsed_response)
+    
+    # Same searches on every other Craigslist site within the radius
+    nearby_links = [
+        {"city": nearby_city, "links": build_item_links(recommendations, nearby_city, filters, parsed_response)}
+        for nearby_city in filters.get("nearby_cities", [])
+    ]
+    
+    # Prepare response
+    return {
+        "success": True,
+        "query": user_query,
+        "recommendations": recommendations,
+        "explanation": parsed_response.get("explanation", ""),
+        "craigslist_links": craigslist_links,  # Multiple individual links
+        "city": filters["city"],
+        "nearby_cities": filters.get("nearby_cities", []),
+        "nearby_links": nearby_links,
+        "category": parsed_response.get("category", category) or "sss",
+        "min_price": parsed_response.get("min_price"),
+        "max_price": parsed_response.get("max_price"),
+        "zip_code": filters["zip_code"],
+        "radius": filters["radius"],
+        "vehicle_params": filters["vehicle_params"],  # Include vehicle parameters
+        "degraded": degraded  # True when the deadline cut the AI answer short
+    }
+
+@app.route('/static/dist/<path:filename>')
+def dist_asset(filename):
+    """Serve fingerprinted assets with year-long caching and precompressed variants"""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    
+    served = filename
+    if encoding and os.path.isfile(os.path.join(ASSET_DIST_DIR, f"{filename}.{ASSET_EXTENSIONS[encoding]}")):
+        served = f"{filename}.{ASSET_EXTENSIONS[encoding]}"
+    else:
+        encoding = None
+    
+    response = send_from_directory(ASSET_DIST_DIR, served, mimetype=mimetype, max_age=31536000)
+    response.headers['Cache-Control'] = ASSET_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers.pop('Content-Disposition', None)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
 @app.route('/')
 def index():
     """Serve the main page"""
     return render_template('index.html')
 
+def build_degraded_response(partial_response, category):
+    """Best-effort answer from whatever Ollama streamed before the deadline"""
+    parsed_response = extract_streamed_fields(partial_response)
+    streamed = len(parsed_response["recommendations"])
+    if not streamed:
+        parsed_response["recommendations"] = default_recommendations(parsed_response.get("category", category))
+    parsed_response["explanation"] = (
+        f"Partial results: the AI ran out of time after {streamed} recommendation(s)."
+        if streamed else
+        "Partial results: the AI ran out of time, so these are general searches for the category."
+    )
+    return parsed_response
+
+def start_traffic_trace(method, user_query):
+    """Start a capture record for this request if capture is on and it is sampled"""
+    if TRAFFIC_CAPTURE is None or not TRAFFIC_CAPTURE.sampled():
+        return None
+    g.traffic_started = time.perf_counter()
+    g.traffic_trace = {"ts": time.time(), "method": method, "query": user_query, "stages": {}}
+    return g.traffic_trace
+
+def mark_stage(trace, stage, started):
+    """Record how long a pipeline stage took; returns the start of the next one"""
+    now = time.perf_counter()
+    trace["stages"][stage] = round((now - started) * 1000, 2)
+    return now
+
+@app.after_request
+def record_traffic(response):
+    """Hand a finished request's capture record to the background writer"""
+    trace = g.pop('traffic_trace', None)
+    if trace is not None:
+        trace["status"] = response.status_code
+        trace["duration_ms"] = round((time.perf_counter() - g.traffic_started) * 1000, 2)
+        TRAFFIC_CAPTURE.record(trace)
+    return response
+
+def generate_result(user_query, cancel_event=None, deadline=None, trace=None, filters=None):
+    """Run the full extraction, Ollama and link-building pipeline for one query
+    
+    If the deadline passes before the AI's JSON answer is complete, the result
+    is built from the extracted filters and any partial AI answer, and flagged
+    as degraded. A trace dict, when
+    given, collects stage timings and the raw Ollama response for capture.
+    Precomputed filters (from a refinement) skip the extraction step, and
+    their prices take precedence over the AI's.
+    """
+    refined = filters is not None
+    started = time.perf_counter()
+    if trace is None:
+        trace = {"stages": {}}  # stage timings still go to the log
+    if deadline is not None:
+        trace["deadline_ms"] = max(0, round((deadline - time.monotonic()) * 1000))
+    
+    # Extract city, category, zip code, radius, price, and vehicle parameters from query
+    if filters is None:
+        filters = extract_query_filters(user_query)
+    started = mark_stage(trace, "filters_ms", started)
+    
+    degraded = False
+    ai_response = ""
+    parsed_response = vehicle_catalog_answer(user_query, filters)
+    if parsed_response is not None:
+        trace["vehicle_catalog"] = True
+        started = mark_stage(trace, "catalog_ms", started)
+    else:
+        try:
+            ai_response = request_ai_response(user_query, cancel_event, deadline, filters["category"])
+        except DeadlineExceeded as e:
+            ai_response = e.partial_response
+            # The model may have finished its JSON before the deadline cut it off
+            parsed_response, _ = find_json_object(ai_response[:MAX_OUTPUT_CHARS])
+            degraded = parsed_response is None
+        started = mark_stage(trace, "ollama_ms", started)
+        trace["raw_response"] = ai_response
+        
+        if degraded:
+            trace["degraded"] = True
+            parsed_response = build_degraded_response(ai_response, filters["category"])
+        elif parsed_response is None:
+            parsed_response = parse_ai_response(ai_response, filters["category"])
+        started = mark_stage(trace, "parse_ms", started)
+    
+    if refined:
+        # The AI reads prices from the whole combined query; the merged filters know which one is current
+        for key in ("min_price", "max_price"):
+            if filters[key] is not None:
+                parsed_response[key] = filters[key]
+    
+    result = build_link_result(user_query, filters, parsed_response, degraded=degraded)
+    mark_stage(trace, "links_ms", started)
+    
+    log_event(logger, logging.INFO, "generate_result",
+              category=result["category"], degraded=degraded, response_chars=len(ai_response),
+              vehicle_catalog=trace.get("vehicle_catalog", False),
+              recommendations=len(result["recommendations"]), links=len(result["craigslist_links"]),
+              **trace["stages"])
+    return result
+
 @app.route('/api/generate-link', methods=['POST'])
 def generate_link():
     """Generate Craigslist link based on user query"""
+    request_id = request.headers.get('X-Request-ID')
+    trace = None
     try:
         data = request.get_json()
         user_query = data.get('query', '').strip()
         
         if not user_query:
             return jsonify({'error': 'Query is required'}), 400
+        if len(user_query) > MAX_QUERY_CHARS:
+            return jsonify({'error': QUERY_TOO_LONG}), 400
+        try:
+            shape = response_shape(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Extract city, category, zip code, radius, price, and vehicle parameters from query
-        city = extract_city_from_query(user_query)
-        category = extract_category_from_query(user_query)
-        zip_code = extract_zip_code_from_query(user_query)
-        radius = extract_radius_from_query(user_query)
-        vehicle_params = extract_vehicle_parameters(user_query)
-        
-        # Extract price information from query
-        min_price, max_price = extract_price_from_query(user_query)
-        
-        # Prepare prompt for Ollama Llama 3.1 8B
-        system_prompt = """You are an expert Craigslist searcher. Extract from user request: 3-5 specific item recommendations, price range (min/max), different parameters, and the MOST ACCURATE Craigslist category. Return JSON only:
-
-{"recommendations": ["item1", "item2", "item3"], "min_price": null or number, "max_price": null or number, "category": "category_code", "explanation": "Brief explanation"}
-
-CRITICAL RULES:
-1. Choose the MOST SPECIFIC category. Do NOT default to general categories.
-2. For vehicle searches, ONLY include the core vehicle name/model in recommendations - NOT color, year, mileage, transmission, or title status.
-3. Vehicle-specific details (color, year, mileage, transmission, title status) are handled by URL parameters, not search keywords.
-4. Do not include search terms like "refurbished", "used" or "second hand" in the search query.
-5. ABSOLUTELY NO UNDERSCORES IN THE SEARCH QUERY.
-6. CRITICAL: When extracting prices, be VERY careful to distinguish between:
-   - PRICES: "under $15000", "less than $1000", "$5000"
-   - ZIP CODES: "90210", "10001", "94102"
-   - NEVER confuse prices with zip codes in your analysis!
-   - ALWAYS make sure to check if the user has a price range. For example, if the user says "from $800 to $1800" then you should extract the price range as $800 to $1800.
-7. CRITICAL: If the user DOES NOT specify a price, DO NOT PUT PRICE PARAMETERS IN THE JSON.
-8. CRITICAL: NEVER extract mileage as price. "100k miles" is MILEAGE, not "$100". Only extract prices when there are clear price indicators like "$", "under", "budget", "price", "cost".
-9. CRITICAL: IF the user does not specify a specific car/item (such as "fun manual cars") give valid inferences based on the user's query (such as, if the user asks for "fun manual cars" give suggestions you think are valid like BMW 335i, corvette, etc.), but do NOT search "fun manual cars" as the search query.
-10. CRITICAL: When the user specifies vehicle-specific details (such as white color) make sure to KEEP THE COLOR IN THE URL PARAMETER EXACTLY AS THE USER SPECIFIES, IF THE USER SPECIFIES.
-11. DO NOT DEFAULT TO A RANDOM COLOR (such as blue) IN THE URL PARAMETERS IF THE USER DOES NOT SPECIFY A COLOR. MAKE SURE TO ABSOLUTELY FOLLOW THE USER'S SPECIFICATIONS AT ALL COSTS.
-12. ALWAYS assume, when the user provides a car model name they want (Such as "BMW M340i") that they want to search for that specific car model name, and not any other car model name.
-13. IF THE USER SPECIFIES SOMETHING THEY WANT THAT IS A SPECIFIC MODEL (such as iPhone 15 Pro) then you should search for that specific model, and not any other model. Make sure to DIRECTLY follow what the user wants.
-EXAMPLES:
-- Query: "black BMW 335i 2010 to 2015 under 100k miles automatic clean title"
-- CORRECT: {"recommendations": ["BMW 335i", "BMW 3 Series", "BMW 335i Sedan"], "category": "cta"}
-- WRONG: {"recommendations": ["black BMW 335i", "2010-2015", "automatic", "clean title"]}
-
-- Query: "Honda Civic 2015 or newer automatic FWD clean title under $15000 within 15 miles of 90210"
-- CORRECT: {"recommendations": ["Honda Civic", "Honda Civic Sedan", "Honda Civic Coupe"], "max_price": 15000, "category": "cta"}
-- WRONG: {"recommendations": ["Honda Civic 2015", "automatic", "FWD", "clean title"], "max_price": 90210}
-
-- Query: "MacBook Pro 13 inch under $1000"
-- CORRECT: {"recommendations": ["MacBook Pro", "MacBook Pro 13", "MacBook Pro 13 inch"], "max_price": 1000, "category": "sys"}
-- WRONG: {"recommendations": ["MacBook Pro 13 inch under $1000"]}
-
-- Query: "BMW 335i 2010 to 2015 under 100k miles automatic clean title"
-- CORRECT: {"recommendations": ["BMW 335i", "BMW 3 Series", "BMW 335i Sedan"], "category": "cta"}
-- WRONG: {"recommendations": ["BMW 335i", "BMW 3 Series"], "max_price": 100, "category": "cta"}
-
-- Query: "white bmw i3 within 100 miles of 94086 under 100k miles clean title"
-- CORRECT: Proper recomendation with THE COLOR WHITE IN THE URL PARAMETER: https://sfbay.craigslist.org/search/cta?auto_paint=9&auto_title_status=1&max_auto_miles=100000&postal=94086&query=BMW%20i3&search_distance=100#search=2~gallery~0
-- WRONG: Proper recommendation with the color blue in the URL parameter, which is NOT what the user specified:https://sfbay.craigslist.org/search/cta?auto_paint=2&auto_title_status=1&max_auto_miles=100000&postal=94086&query=BMW%20i3&search_distance=100#search=2~gallery~0
-- Query: "Apple watch in good condition within 20 miles of 90210"
-- CORRECT: Proper recommendation of "Apple watch" and "Apple Watch Series" with the URL Parameter: "https://losangeles.craigslist.org/search/ela?postal=90210&query=Apple%20Watch&search_distance=20#search=2~gallery~0"
-- WRONG: Incorrect recommendation of "Apple watch" and "Apple Watch Series" with the URL Parameter (KEEP IN MIND, USE THE CORRECT CATEGORY FOR ELECTRONICS): "https://losangeles.craigslist.org/search/mca?postal=90210&query=Apple%20Watch&search_distance=20#search=2~gallery~0"
-
-PRICE vs ZIP CODE vs MILEAGE DISTINCTION:
-- PRICES: Look for "$" symbol, "under", "less than", "budget", "price", "cost"
-- ZIP CODES: Look for "within X miles of", "near", "around", "zip code", "postal code"
-- MILEAGE: Look for "k miles", "miles", "mi" - NEVER extract as price
-- NEVER extract a 5-digit number as price if it appears after "miles of" or "near"
-- NEVER extract "100k miles" as "$100" - it's MILEAGE, not PRICE
-
-Key Categories:
-- cta: Cars & trucks, vehicles, automotive
-- mca: Motorcycles, scooters, ATVs
-- boa: Boats, watercraft, marine
-- rva: RVs, campers, trailers
-- sys: Computers, laptops, desktops, tech
-- moa: Mobile phones, smartphones, tablets
-- jwa: Jewelry, watches, luxury items
-- ele: Electronics, smartwatches, TVs, cameras, gaming, audio
-- fua: Furniture, home goods, appliances
-- apa: Apartments, rentals, housing
-- rea: Real estate, houses, condos, land
-- roo: Rooms, sublets, shared housing
-- jjj: Jobs, employment, careers
-- sks: Skilled trades, services, repairs
-- com: Community, events, activities
-- cla: Clothing, shoes, fashion
-- bks: Books, media, literature
-- msg: Musical instruments, equipment
-- bia: Bicycles, bikes, cycling
-- spo: Sports, fitness, outdoor, recreation
-- pet: Pets, animals, livestock
-- sss: General for sale (ONLY if no specific category fits)
-
-IMPORTANT: Mobile devices go in 'moa', NOT 'cta'. Electronics go in 'ele'. Be precise. WATCHES go in 'jwa', NOT 'ele'. BE PRECISE."""
-        
-        user_prompt = f"User request: {user_query}"
-        
-        # Call Ollama API
-        ollama_payload = {
-            "model": OLLAMA_MODEL,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "stream": False,
-            "options": {
-                "temperature": 0.1,
-                "num_predict": 1000,  # Increased for complete responses
-                "top_k": 15,         # Limit token selection for speed
-                "top_p": 0.9,        # Nucleus sampling for efficiency
-                "repeat_penalty": 1.1 # Prevent repetitive responses
-            }
-        }
+        trace = start_traffic_trace('POST', user_query)
+        deadline = request_deadline(data)
+        cancel_event = register_request(request_id)
+        return json_result(generate_result(user_query, cancel_event, deadline, trace), shape)
         
-        try:
-            response = requests.post(
-                f"{OLLAMA_BASE_URL}/api/chat",
-                json=ollama_payload,
-                timeout=120  # Increased timeout to 2 minutes
-            )
-            response.raise_for_status()
-            
-            # Parse Ollama response
-            ai_response = response.json()['message']['content'].strip()
-            
-            # Log the response for debugging (remove in production)
-            print(f"Ollama response length: {len(ai_response)}")
-            print(f"Ollama response preview: {ai_response[:200]}...")
-            
-        except requests.exceptions.Timeout:
-            raise Exception("Request timed out. Ollama model is still processing. Try again in a moment.")
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Ollama API error: {str(e)}")
-        except KeyError as e:
-            raise Exception(f"Invalid response from Ollama: {str(e)}")
+    except RequestCancelled as e:
+        log_event(logger, logging.INFO, "request_cancelled")
+        return jsonify({
+            'error': str(e),
+            'success': False,
+            'cancelled': True
+        }), 499
         
-        # Try to extract JSON from response with improved parsing
+    except Exception as e:
+        logger.exception("generate_link_failed")
+        if trace is not None:
+            trace["error"] = str(e)
+        return jsonify({
+            'error': f'An error occurred: {str(e)}',
+            'success': False
+        }), 500
+    
+    finally:
+        release_request(request_id)
+
+def response_shape(data=None):
+    """The (fields, compact) a request asked for, from its JSON body or query string, or None for the full result"""
+    data = data or {}
+    fields = parse_fields(data.get('fields', request.args.get('fields')))
+    compact = parse_flag(data.get('compact', request.args.get('compact')))
+    if fields is None and not compact:
+        return None
+    return fields, compact
+
+def json_result(result, shape=None, status=200, headers=None):
+    """Serialize a result, shaped as the request asked"""
+    if shape is not None:
+        result = shape_result(result, *shape)
+    return Response(dumps(result), status=status, headers=headers, mimetype='application/json')
+
+# Shaped variants kept per cached result; more distinct shapes are built per request
+MAX_SHAPES_PER_ENTRY = 16
+
+def shaped_cached_response(cached, shape, user_query):
+    """The cached variant of a result for a request's query text and fields/compact selection, with its own ETag
+    
+    Spellings of a query that normalize alike share the cache entry, but each
+    response echoes the query as its request sent it.
+    """
+    variant = cached.shapes.get((user_query, shape))
+    if variant is None:
+        result = json.loads(cached.body)
+        result["query"] = user_query
+        if shape is not None:
+            result = shape_result(result, *shape)
+        body = dumps(result)
+        variant = CachedResponse(body, compute_etag(body, MODEL_VERSION))
+        if len(cached.shapes) < MAX_SHAPES_PER_ENTRY:
+            cached.shapes[(user_query, shape)] = variant
+    return variant
+
+def cached_json_response(cached):
+    """Serve a cached result with validators, cache headers and compression"""
+    headers = {
+        'ETag': cached.etag,
+        'Cache-Control': f'public, max-age={GENERATE_LINK_MAX_AGE}, '
+                         f'stale-while-revalidate={GENERATE_LINK_STALE_WHILE_REVALIDATE}',
+        'Vary': 'Accept-Encoding'
+    }
+    
+    if etag_matches(request.headers.get('If-None-Match'), cached.etag):
+        return Response(status=304, headers=headers)
+    
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(cached.encoded(encoding), mimetype='application/json', headers=headers)
+
+@app.route('/api/generate-link', methods=['GET'])
+def generate_link_cacheable():
+    """Cacheable GET form of generate-link, keyed on the normalized query"""
+    request_id = request.headers.get('X-Request-ID')
+    user_query = (request.args.get('q') or request.args.get('query') or '').strip()
+    cache_key = normalize_query(user_query)
+    
+    if not user_query:
+        return jsonify({'error': 'Query is required'}), 400
+    if len(user_query) > MAX_QUERY_CHARS:
+        return jsonify({'error': QUERY_TOO_LONG}), 400
+    try:
+        shape = response_shape()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    trace = start_traffic_trace('GET', user_query)
+    cached = RESPONSE_CACHE.get(cache_key)
+    if trace is not None:
+        trace["cache_hit"] = cached is not None
+    if cached is None:
         try:
-            # First, try to find complete JSON in the response
-            json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', ai_response, re.DOTALL)
-            if json_match:
-                try:
-                    parsed_response = json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    # Try to fix common JSON issues
-                    fixed_json = json_match.group()
-                    # Remove trailing incomplete text
-                    if fixed_json.count('{') > fixed_json.count('}'):
-                        # Find the last complete object
-                        last_brace = fixed_json.rfind('}')
-                        if last_brace > 0:
-                            fixed_json = fixed_json[:last_brace + 1]
-                    
-                    try:
-                        parsed_response = json.loads(fixed_json)
-                    except json.JSONDecodeError:
-                        raise Exception("JSON parsing failed after cleanup")
-            else:
-                # Try to extract partial information from the response
-                parsed_response = extract_partial_response(ai_response, category)
-                
+            deadline = request_deadline()
+            cancel_event = register_request(request_id)
+            result = generate_result(user_query, cancel_event, deadline, trace)
+        except RequestCancelled as e:
+            log_event(logger, logging.INFO, "request_cancelled")
+            return jsonify({'error': str(e), 'success': False, 'cancelled': True}), 499, {'Cache-Control': 'no-store'}
         except Exception as e:
-            # Intelligent fallback based on the actual response content
-            parsed_response = extract_partial_response(ai_response, category)
-        
-        # Generate individual Craigslist links for each recommendation
-        recommendations = parsed_response.get("recommendations", [])
-        craigslist_links = []
+            logger.exception("generate_link_failed")
+            if trace is not None:
+                trace["error"] = str(e)
+            return jsonify({
+                'error': f'An error occurred: {str(e)}',
+                'success': False
+            }), 500, {'Cache-Control': 'no-store'}
+        finally:
+            release_request(request_id)
         
-        for item in recommendations:
-            if item and item.strip():  # Skip empty items
-                individual_url = generate_craigslist_link(
-                    [item],  # Single item
-                    city,
-                    parsed_response.get("category", category) or "sss",
-                    parsed_response.get("min_price") or min_price,  # Use extracted price or AI price
-                    parsed_response.get("max_price") or max_price,  # Use extracted price or AI price
-                    zip_code,  # Include zip code
-                    radius,    # Include radius
-                    vehicle_params  # Include vehicle parameters
-                )
-                craigslist_links.append({
-                    "item": item,
-                    "url": individual_url
-                })
-        
-        # Prepare response
-        result = {
-            "success": True,
-            "query": user_query,
-            "recommendations": recommendations,
-            "explanation": parsed_response.get("explanation", ""),
-            "craigslist_links": craigslist_links,  # Multiple individual links
-            "city": city,
-            "category": parsed_response.get("category", category) or "sss",
-            "min_price": parsed_response.get("min_price"),
-            "max_price": parsed_response.get("max_price"),
-            "zip_code": zip_code,
-            "radius": radius,
-            "vehicle_params": vehicle_params  # Include vehicle parameters
-        }
-        
-        return jsonify(result)
+        # Partial answers are served once but never cached
+        if result["degraded"]:
+            return json_result(result, shape, headers={'Cache-Control': 'no-store'})
         
+        body = dumps(result)
+        cached = CachedResponse(body, compute_etag(body, MODEL_VERSION))
+        cached.shapes[(user_query, None)] = cached
+        RESPONSE_CACHE.put(cache_key, cached)
+    
+    return cached_json_response(shaped_cached_response(cached, shape, user_query))
+
+# /api/parse previews and their serialized form by normalized query; typing
+# and backspacing revisit the same prefixes
+PARSE_CACHE = LRUCache(int(os.getenv('PARSE_CACHE_SIZE', '4096')))
+PARSE_MAX_AGE = 300
+
+def parse_preview(user_query):
+    """Filters the extractors find in a query and the category search link they give, without Ollama"""
+    filters = extract_query_filters(user_query)
+    category = filters["category"]
+    # A named vehicle ("bmw 335i") means cars & trucks, as generate-link's catalog answer would say
+    if category is None and VEHICLE_CATALOG_ENABLED and get_vehicle_catalog().recommendations(user_query) is not None:
+        category = "cta"
+    category = category or "sss"
+    return {
+        "success": True,
+        "query": user_query,
+        "city": filters["city"],
+        "nearby_cities": filters["nearby_cities"],
+        "category": category,
+        "min_price": filters["min_price"],
+        "max_price": filters["max_price"],
+        "zip_code": filters["zip_code"],
+        "radius": filters["radius"],
+        "vehicle_params": filters["vehicle_params"],
+        "link": generate_craigslist_link(
+            [], filters["city"], category, filters["min_price"], filters["max_price"],
+            filters["zip_code"], filters["radius"], filters["vehicle_params"]
+        )
+    }
+
+@app.route('/api/parse', methods=['GET'])
+def parse_query():
+    """Instant preview of the deterministic filters for a query, for as-you-type feedback
+    
+    Spellings that normalize alike share a cache entry; the response echoes
+    the query as sent.
+    """
+    user_query = (request.args.get('q') or request.args.get('query') or '').strip()
+    cache_key = normalize_query(user_query)
+    if not cache_key:
+        return jsonify({'error': 'Query is required'}), 400
+    if len(user_query) > MAX_QUERY_CHARS:
+        return jsonify({'error': QUERY_TOO_LONG}), 400
+
+    cached = PARSE_CACHE.get(cache_key)
+    if cached is None:
+        preview = parse_preview(cache_key)
+        cached = (preview, dumps(preview))
+        PARSE_CACHE.put(cache_key, cached)
+    preview, body = cached
+    if user_query != cache_key:
+        body = dumps({**preview, "query": user_query})
+    return Response(body, mimetype='application/json',
+                    headers={'Cache-Control': f'public, max-age={PARSE_MAX_AGE}'})
+
+# Refinement sessions for /api/refine (see refinement.py)
+REFINE_SESSIONS = RefinementSessions(
+    max_sessions=int(os.getenv('REFINE_SESSION_LIMIT', '10000')),
+    ttl_seconds=int(os.getenv('REFINE_SESSION_TTL', '1800'))
+)
+
+# The parts of a result that came from the AI, reused when only filters change
+AI_ANSWER_FIELDS = ("recommendations", "explanation", "category", "min_price", "max_price")
+
+def refine_filters(previous, refinement):
+    """Filters for the session's query with a refinement's filters applied on top"""
+    update = extract_query_filters(refinement)
+    if not find_zip_code(refinement, (update["min_price"], update["max_price"]))[1]:
+        # Only a zip code named as a place moves the session ("near 94110");
+        # a bare number in "under 15000 instead" is a price
+        update["zip_code"] = None
+    filters = merge_filters(previous, update, item_changed=bool(intent_words(refinement)))
+    
+    named_city = find_city_in_query(refinement)
+    if named_city and not update["zip_code"]:
+        # The session's zip code belongs to the place it used to search
+        filters["zip_code"] = None
+    zip_city, nearby_sites = resolve_city_from_zip(filters["zip_code"], filters["radius"])
+    if named_city:
+        filters["city"] = named_city
+    elif update["zip_code"] and zip_city:
+        filters["city"] = zip_city
+    filters["nearby_cities"] = [site for site, _ in nearby_sites if site != filters["city"]]
+    return filters
+
+@app.route('/api/refine', methods=['POST'])
+def refine():
+    """Generate links for a query or refinement, reusing the AI answer when only filters change
+    
+    Send {"query": ...} to start a session (or to replace its query), then
+    {"session_id": ..., "refinement": "under $8000 instead"} or a full edited
+    {"session_id": ..., "query": ...}. Ollama only runs again when the item
+    being searched for changes.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    session_id = str(data.get('session_id') or '').strip() or REFINE_SESSIONS.new_id()
+    user_query = str(data.get('query') or '').strip()
+    refinement = str(data.get('refinement') or '').strip()
+    session = REFINE_SESSIONS.get(session_id)
+    
+    if refinement and session:
+        effective_query = f"{session['query']}, {refinement}"
+        # Each refinement lengthens the session's query, so the cap covers the combination
+        if len(effective_query) > MAX_QUERY_CHARS:
+            return jsonify({'error': f'{QUERY_TOO_LONG}; start a new search'}), 400
+        filters = refine_filters(session["filters"], refinement)
+        intent_changed = bool(intent_words(refinement))
+        intent = intent_signature(effective_query) if intent_changed else session["intent"]
+    elif user_query:
+        if len(user_query) > MAX_QUERY_CHARS:
+            return jsonify({'error': QUERY_TOO_LONG}), 400
+        effective_query = user_query
+        filters = extract_query_filters(user_query)
+        intent = intent_signature(user_query)
+        intent_changed = session is None or intent != session["intent"]
+    else:
+        return jsonify({'error': 'Query is required (or a refinement for an active session)'}), 400
+    try:
+        shape = response_shape(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    request_id = request.headers.get('X-Request-ID')
+    llm_skipped = session is not None and not intent_changed and not session["degraded"]
+    try:
+        if llm_skipped:
+            answer = dict(session["answer"])
+            if (filters["min_price"], filters["max_price"]) != (session["filters"]["min_price"], session["filters"]["max_price"]):
+                # The stored AI prices belong to the old query
+                answer["min_price"], answer["max_price"] = filters["min_price"], filters["max_price"]
+            result = build_link_result(effective_query, filters, answer)
+        else:
+            cancel_event = register_request(request_id)
+            result = generate_result(effective_query, cancel_event, request_deadline(data), filters=filters)
+    except RequestCancelled as e:
+        log_event(logger, logging.INFO, "request_cancelled")
+        return jsonify({'error': str(e), 'success': False, 'cancelled': True}), 499
     except Exception as e:
+        logger.exception("refine_failed")
         return jsonify({
             'error': f'An error occurred: {str(e)}',
             'success': False
         }), 500
+    finally:
+        release_request(request_id)
+    
+    REFINE_SESSIONS.save(session_id, effective_query, filters,
+                         {field: result[field] for field in AI_ANSWER_FIELDS}, intent, result["degraded"])
+    changed = changed_filters(session["filters"], filters) if session else []
+    METRICS.increment("refine.llm_skipped" if llm_skipped else "refine.llm_called")
+    log_event(logger, logging.INFO, "refine", llm_skipped=llm_skipped, changed=changed)
+    
+    result.update({
+        'session_id': session_id,
+        'llm_skipped': llm_skipped,
+        'changed_filters': changed
+    })
+    return json_result(result, shape)
+
+@app.route('/api/cancel', methods=['POST'])
+def cancel_request():
+    """Cancel an in-flight generate-link request by its X-Request-ID"""
+    data = request.get_json(force=True, silent=True) or {}
+    request_id = str(data.get('request_id', '')).strip()
+    
+    if not request_id:
+        return jsonify({'error': 'request_id is required'}), 400
+    
+    return jsonify({'success': True, 'cancelled': cancel_request_by_id(request_id)})
+
+@app.route('/api/metrics')
+def metrics():
+    """Ollama token and timing statistics and cache counters for this worker"""
+    return jsonify({
+        'model': OLLAMA_MODEL,
+        'prompt_models': [prompt_model.name for prompt_model in PROMPT_MODELS.values() if prompt_model.ready],
+        'ollama': METRICS.snapshot(),
+        'response_cache': {
+            'size': len(RESPONSE_CACHE),
+            'hits': RESPONSE_CACHE.hits,
+            'misses': RESPONSE_CACHE.misses
+        },
+        'parse_cache': {
+            'size': len(PARSE_CACHE),
+            'hits': PARSE_CACHE.hits,
+            'misses': PARSE_CACHE.misses
+        },
+        'logging': {'dropped_records': dropped_records()},
+        'category_model': CATEGORY_MODEL_PATH if CATEGORY_MODEL else None,
+        'generation_budget': GENERATION_BUDGET.snapshot() if ADAPTIVE_NUM_PREDICT else None
+    })
 
 @app.route('/api/health')
 def health_check():
@@ -886,4 +1816,5 @@ def health_check():
     return jsonify({'status': 'healthy', 'service': 'AI Craigslist Link Generator'})
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    threading.Thread(target=warm_prompt_cache, daemon=True).start()
+    app.run(debug=True, host='0.0.0.0', port=int(os.getenv('PORT', '5000')))
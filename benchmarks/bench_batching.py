@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency of micro-batched vs individual Ollama calls
+
+Fires the golden queries at Ollama from a pool of concurrent clients, first
+with one /api/chat call per query and then through a MicroBatcher for each
+window size given. Reports queries per second, latency percentiles, mean
+batch size and how many batches had to fall back to individual calls, so the
+throughput gain can be weighed against the latency the window adds.
+
+Usage:
+    python benchmarks/bench_batching.py
+    python benchmarks/bench_batching.py --concurrency 16 --windows 20 50 --max-size 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from metrics import METRICS, percentile
+from micro_batcher import MicroBatcher
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden_queries.jsonl')
+
+def run_mode(label, queries, concurrency):
+    before = METRICS.snapshot()["counters"]
+
+    def one(query):
+        started = time.perf_counter()
+        try:
+            app.request_ai_response(query, category=app.extract_category_from_query(query))
+            ok = True
+        except Exception:
+            ok = False
+        return ok, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, queries))
+    elapsed = time.perf_counter() - started
+
+    after = METRICS.snapshot()["counters"]
+    delta = {name: after.get(name, 0) - before.get(name, 0) for name in after}
+    latencies = sorted(latency for _, latency in results)
+    failed = sum(1 for ok, _ in results if not ok)
+    batches = delta.get("batch.batches", 0)
+    batch_info = (f"   mean batch {delta.get('batch.items', 0) / batches:4.1f}   "
+                  f"fallbacks {delta.get('batch.fallbacks', 0)}") if batches else ""
+    print(f"{label:<12} {len(queries) / elapsed:7.2f} q/s   p50 {percentile(latencies, 0.5):8.0f} ms   "
+          f"p95 {percentile(latencies, 0.95):8.0f} ms   Ollama calls {delta.get('ollama.requests', 0):4d}   "
+          f"errors {failed}{batch_info}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare micro-batched and individual Ollama calls")
+    parser.add_argument('--golden', default=GOLDEN_PATH, help="file of queries to send")
+    parser.add_argument('--concurrency', type=int, default=16, help="simultaneous clients")
+    parser.add_argument('--windows', type=int, nargs='+', default=[20, 50], help="batch windows in ms")
+    parser.add_argument('--max-size', type=int, default=8, help="maximum queries per batch")
+    args = parser.parse_args()
+
+    with open(args.golden) as f:
+        queries = [json.loads(line)["query"] for line in f if line.strip()]
+    print(f"Model {app.OLLAMA_MODEL} at {app.OLLAMA_BASE_URL}, {len(queries)} queries, "
+          f"{args.concurrency} concurrent clients")
+
+    # Load the model before timing anything
+    app.query_ollama(queries[0])
+
+    app.OLLAMA_BATCHER = None
+    run_mode("individual", queries, args.concurrency)
+    for window_ms in args.windows:
+        app.OLLAMA_BATCHER = MicroBatcher(app.query_ollama_batch, window_ms=window_ms,
+                                          max_size=args.max_size, concurrency=app.OLLAMA_BATCH_CONCURRENCY)
+        run_mode(f"batch {window_ms}ms", queries, args.concurrency)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
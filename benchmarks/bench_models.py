@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Latency vs accuracy of Ollama models and sampling options
+
+Runs the labelled queries in benchmarks/golden_queries.jsonl against every
+combination of model and option set, using the same prompts app.py sends, and
+measures for each configuration:
+
+- category, price and keyword accuracy against the golden labels
+- JSON validity: the answer contains a JSON object that parses as-is
+- time to first token, end-to-end latency and generation tokens/sec
+
+The report lists configurations from fastest to slowest and marks the Pareto
+frontier: configurations no other one beats on both median latency and
+quality (the mean of the three accuracy scores). With --min-quality it also
+names the fastest configuration that reaches that quality.
+
+Option sets come from a JSON file mapping a name to Ollama options, merged
+over the options app.py uses; the default sets are below.
+
+Usage:
+    python benchmarks/bench_models.py --models llama3.2:3b llama3.1:8b mistral:7b
+    python benchmarks/bench_models.py --option-sets my_options.json --min-quality 0.8 --json results.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from bench_prompts import GOLDEN_PATH, load_golden, score
+from metrics import percentile
+
+DEFAULT_OPTION_SETS = {
+    "default": {},
+    "short": {"num_predict": 400},
+    "greedy": {"temperature": 0, "top_k": 1},
+}
+
+def is_valid_json(ai_response):
+    """True when the first '{' in the answer starts a JSON object that parses"""
+    start = ai_response.find('{')
+    if start < 0:
+        return False
+    try:
+        json.JSONDecoder().raw_decode(ai_response[start:])
+        return True
+    except json.JSONDecodeError:
+        return False
+
+def ask(model, options, query, category):
+    """Stream one answer; returns (text, ttft ms, total ms, final chunk)"""
+    # The app's system prompt for the category, sent in the messages: the
+    # derived prompt models only exist for OLLAMA_MODEL, and creating them
+    # would run in the background while the benchmark is timing
+    payload = app.build_chat_payload(query, category=category, use_prompt_model=False)
+    payload["model"] = model
+    payload["options"] = {**payload["options"], **options}
+
+    started = time.perf_counter()
+    first_token = None
+    parts = []
+    final = {}
+    with requests.post(f"{app.OLLAMA_BASE_URL}/api/chat", json=payload, stream=True, timeout=600) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            content = chunk.get("message", {}).get("content", "")
+            if content and first_token is None:
+                first_token = time.perf_counter()
+            parts.append(content)
+            if chunk.get("done"):
+                final = chunk
+                break
+    finished = time.perf_counter()
+    ttft = ((first_token or finished) - started) * 1000
+    return "".join(parts), ttft, (finished - started) * 1000, final
+
+def run_config(model, option_name, options, golden):
+    ttfts, totals, speeds = [], [], []
+    valid = 0
+    hits = [0, 0, 0]
+    errors = 0
+    for row in golden:
+        category = app.classify_category(row["query"])
+        try:
+            ai_response, ttft, total, final = ask(model, options, row["query"], category)
+        except (requests.exceptions.RequestException, ValueError):
+            errors += 1
+            continue
+        ttfts.append(ttft)
+        totals.append(total)
+        if final.get("eval_duration"):
+            speeds.append(final.get("eval_count", 0) / (final["eval_duration"] / 1e9))
+        valid += is_valid_json(ai_response)
+        for index, ok in enumerate(score(row, app.parse_ai_response(ai_response, category))):
+            hits[index] += ok
+
+    n = len(golden)
+    ttfts.sort()
+    totals.sort()
+    category_acc, price_acc, keyword_acc = (hit / n for hit in hits)
+    return {
+        "model": model,
+        "options": option_name,
+        "category_accuracy": round(category_acc, 3),
+        "price_accuracy": round(price_acc, 3),
+        "keyword_accuracy": round(keyword_acc, 3),
+        "quality": round((category_acc + price_acc + keyword_acc) / 3, 3),
+        "json_valid_rate": round(valid / n, 3),
+        "errors": errors,
+        "ttft_p50_ms": round(percentile(ttfts, 0.5) or 0, 1),
+        "latency_p50_ms": round(percentile(totals, 0.5) or 0, 1),
+        "latency_p95_ms": round(percentile(totals, 0.95) or 0, 1),
+        "tokens_per_sec": round(sum(speeds) / len(speeds), 1) if speeds else None,
+    }
+
+def pareto_frontier(results):
+    """Results not dominated on (lower median latency, higher quality)"""
+    frontier = []
+    for result in results:
+        dominated = any(
+            other["latency_p50_ms"] <= result["latency_p50_ms"] and other["quality"] >= result["quality"]
+            and (other["latency_p50_ms"] < result["latency_p50_ms"] or other["quality"] > result["quality"])
+            for other in results
+        )
+        if not dominated:
+            frontier.append(result)
+    return frontier
+
+def print_report(results, min_quality):
+    frontier = pareto_frontier(results)
+    print()
+    print(f"{'':2}{'model':<22}{'options':<10}{'quality':>8}{'category':>9}{'price':>7}{'keywords':>9}"
+          f"{'json':>6}{'ttft':>8}{'p50':>9}{'p95':>9}{'tok/s':>8}")
+    for result in sorted(results, key=lambda result: result["latency_p50_ms"]):
+        marker = "* " if result in frontier else "  "
+        tokens = f"{result['tokens_per_sec']:.1f}" if result["tokens_per_sec"] is not None else "-"
+        print(f"{marker}{result['model']:<22}{result['options']:<10}{result['quality']:>8.2f}"
+              f"{result['category_accuracy']:>9.2f}{result['price_accuracy']:>7.2f}{result['keyword_accuracy']:>9.2f}"
+              f"{result['json_valid_rate']:>6.2f}{result['ttft_p50_ms']:>8.0f}{result['latency_p50_ms']:>9.0f}"
+              f"{result['latency_p95_ms']:>9.0f}{tokens:>8}")
+    print("\n* Pareto frontier (no other configuration is both faster and more accurate)")
+
+    if min_quality is not None:
+        good_enough = [result for result in frontier if result["quality"] >= min_quality]
+        if good_enough:
+            best = min(good_enough, key=lambda result: result["latency_p50_ms"])
+            print(f"Fastest configuration with quality >= {min_quality}: {best['model']} / {best['options']}")
+        else:
+            print(f"No configuration reached quality {min_quality}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Ollama models and options on the golden queries")
+    parser.add_argument('--models', nargs='+', default=[app.OLLAMA_MODEL], help="Ollama models to compare")
+    parser.add_argument('--option-sets', help="JSON file mapping option set names to Ollama options")
+    parser.add_argument('--golden', default=GOLDEN_PATH, help="golden query file")
+    parser.add_argument('--min-quality', type=float, help="report the fastest configuration at or above this quality")
+    parser.add_argument('--json', help="also write the raw results to this file")
+    args = parser.parse_args()
+
+    option_sets = DEFAULT_OPTION_SETS
+    if args.option_sets:
+        with open(args.option_sets) as f:
+            option_sets = json.load(f)
+
+    golden = load_golden(args.golden)
+    results = []
+    for model in args.models:
+        # Load the model before timing anything
+        ask(model, {}, golden[0]["query"], None)
+        for option_name, options in option_sets.items():
+            print(f"{model} / {option_name}...", file=sys.stderr)
+            results.append(run_config(model, option_name, options, golden))
+
+    print_report(results, args.min_quality)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
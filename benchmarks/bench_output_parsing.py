@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Worst-case parsing time of raw model output
+
+Feeds parse_ai_response() adversarial outputs of growing length: long runs of
+words that never complete a phrase, unclosed and deeply nested braces,
+unterminated strings, label words without a full stop, and a valid answer
+buried after prose. Each row prints the slowest of a few runs per length.
+Time should grow at most linearly up to MAX_OUTPUT_CHARS and stay flat past
+it, because longer output is cut to the cap.
+
+With --legacy, the same inputs also go through all the JSON and phrase
+regexes that parse_ai_response() and extract_partial_response() could run
+before output_scanner.py, to show the growth they had. Keep --max-chars modest with
+it; the legacy patterns take seconds on 16k characters.
+
+Usage:
+    python benchmarks/bench_output_parsing.py
+    python benchmarks/bench_output_parsing.py --legacy --max-chars 8000
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from output_scanner import MAX_OUTPUT_CHARS
+
+ADVERSARIAL_OUTPUTS = {
+    "capitalized words": lambda n: "Ab " * n,
+    "words, no product": lambda n: "Great Value " * n,
+    "alphanumeric run": lambda n: "ab " + "a1 " * n,
+    "open braces": lambda n: "{" * n,
+    "unclosed pairs": lambda n: "{" + "{a}" * n,
+    "nested unclosed": lambda n: '{"a": ' * n,
+    "unterminated string": lambda n: '{"explanation": "' + "x\\\"" * n,
+    "labels, no period": lambda n: "recommendation " * n,
+    "answer after prose": lambda n: "Sure thing " * n + json.dumps({"recommendations": ["Honda Civic"], "category": "cta"}),
+}
+
+LEGACY_JSON = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
+LEGACY_PHRASES = [
+    r'recommendations?[:\s]+([^.]+)',
+    r'items?[:\s]+([^.]+)',
+    r'suggested[:\s]+([^.]+)',
+    r'popular[:\s]+([^.]+)',
+    r'([A-Z][a-z]+(?:\s+[A-Z][a-z0-9]+)*\s+(?:monitor|tv|laptop|car|phone|furniture|apartment|house|job))',
+    r'([A-Z][a-z]+(?:\s+[A-Z][a-z0-9]+)*\s+[A-Z][a-z]+(?:\s+[A-Z][a-z0-9]+)*)'
+]
+
+def legacy_parse(text):
+    """Every JSON and phrase regex the old parser could run on a text, without the length cap"""
+    re.search(LEGACY_JSON, text, re.DOTALL)
+    for pattern in LEGACY_PHRASES:
+        re.findall(pattern, text, re.IGNORECASE)
+    for pattern in LEGACY_PHRASES[4:]:
+        re.findall(pattern, text)
+
+def worst_ms(parse, text, repeats):
+    worst = 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        parse(text)
+        worst = max(worst, (time.perf_counter() - started) * 1000)
+    return worst
+
+def main():
+    parser = argparse.ArgumentParser(description="Time parsing of adversarial model output")
+    parser.add_argument('--max-chars', type=int, default=64000, help="longest output to try")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--legacy', action='store_true', help="also time the regexes used before")
+    args = parser.parse_args()
+
+    lengths = []
+    length = 1000
+    while length <= args.max_chars:
+        lengths.append(length)
+        length *= 2
+    parsers = [("scanner", lambda text: app.parse_ai_response(text, None))]
+    if args.legacy:
+        parsers.append(("legacy", legacy_parse))
+
+    print(f"MAX_OUTPUT_CHARS = {MAX_OUTPUT_CHARS}; worst of {args.repeats} runs, in ms")
+    print(f"{'output':<20} {'parser':<8}" + "".join(f"{length:>10}" for length in lengths))
+    for name, make in ADVERSARIAL_OUTPUTS.items():
+        texts = [make(length)[:length] if name != "answer after prose" else make(length // 11) for length in lengths]
+        for label, parse in parsers:
+            timings = [worst_ms(parse, text, args.repeats) for text in texts]
+            print(f"{name:<20} {label:<8}" + "".join(f"{ms:10.2f}" for ms in timings))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
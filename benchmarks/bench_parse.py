@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Throughput of the /api/parse preview endpoint
+
+Replays the golden queries the way the frontend sends them while someone
+types: every word prefix of each query, in order. Requests go through the
+Flask test client, so the numbers are for one worker without network
+overhead. Reports requests per second and latency with an empty parse cache
+(every prefix parsed) and with a warm one (prefixes seen before, as when
+users backspace or type common queries), plus the time parse_preview() itself
+takes per prefix.
+
+Usage:
+    python benchmarks/bench_parse.py --passes 5
+"""
+
+import argparse
+import os
+import sys
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from bench_prompts import GOLDEN_PATH, load_golden
+from metrics import percentile
+
+def typing_prefixes(query):
+    words = query.split()
+    return [" ".join(words[:i]) for i in range(1, len(words) + 1)]
+
+def run(client, urls):
+    timings = []
+    started = time.perf_counter()
+    for url in urls:
+        request_started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - request_started) * 1e6)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} returned {response.status_code}")
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return len(urls) / elapsed, timings
+
+def report(label, rate, timings):
+    print(f"{label:<6} {rate:8.0f} req/s   p50 {percentile(timings, 0.5):6.0f} us   "
+          f"p99 {percentile(timings, 0.99):6.0f} us")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /api/parse throughput")
+    parser.add_argument('--passes', type=int, default=5, help="times the warm-cache traffic is replayed")
+    args = parser.parse_args()
+
+    prefixes = [prefix for row in load_golden(GOLDEN_PATH) for prefix in typing_prefixes(row["query"])]
+    urls = [f"/api/parse?q={urllib.parse.quote(prefix)}" for prefix in dict.fromkeys(prefixes)]
+    client = app.app.test_client()
+    print(f"{len(urls)} distinct typing prefixes from {len(load_golden(GOLDEN_PATH))} golden queries")
+
+    timings = []
+    for prefix in dict.fromkeys(prefixes):
+        started = time.perf_counter()
+        app.parse_preview(prefix)
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    print(f"parse_preview alone: p50 {percentile(timings, 0.5):.0f} us, p99 {percentile(timings, 0.99):.0f} us")
+
+    app.PARSE_CACHE.entries.clear()
+    report("cold", *run(client, urls))
+    report("warm", *run(client, urls * args.passes))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Prompt-eval cost with and without system-prompt prefix reuse
+
+Sends the same queries to Ollama in three configurations and reports the
+prompt_eval_count and prompt_eval_duration Ollama returns for each call:
+
+- fresh:  a unique marker in front of SYSTEM_PROMPT defeats the cached
+          prefix, so every call evaluates the whole prompt (the old cost once
+          the model had been unloaded or another prompt had run in between)
+- shared: the identical SYSTEM_PROMPT with keep_alive, as app.py sends it
+- baked:  the derived model named by OLLAMA_PROMPT_MODEL, system prompt
+          built in (skipped unless OLLAMA_PROMPT_MODEL is set)
+
+Usage:
+    python benchmarks/bench_prompt_prefix.py
+    OLLAMA_PROMPT_MODEL=craigslink python benchmarks/bench_prompt_prefix.py --rounds 5
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+QUERIES = [
+    "I want a reliable car under $10,000",
+    "cheap laptop for coding under $500",
+    "furniture for small apartment in NYC",
+    "BMW 335i 2010 to 2015 under 100k miles automatic clean title within 20 miles of 94086",
+    "used road bike in Portland, OR",
+]
+
+def chat(payload):
+    """One non-streaming call; returns (wall ms, final response dict)"""
+    started = time.perf_counter()
+    response = requests.post(f"{app.OLLAMA_BASE_URL}/api/chat", json=payload, timeout=600)
+    response.raise_for_status()
+    return (time.perf_counter() - started) * 1000, response.json()
+
+def fresh_payload(query):
+    payload = app.build_chat_payload(query, stream=False)
+    payload["model"] = app.OLLAMA_MODEL
+    payload["messages"] = [
+        {"role": "system", "content": f"[run {uuid.uuid4().hex}]\n{app.SYSTEM_PROMPT}"},
+        {"role": "user", "content": f"User request: {query}"}
+    ]
+    return payload
+
+def shared_payload(query):
+    payload = app.build_chat_payload(query, stream=False)
+    payload["model"] = app.OLLAMA_MODEL
+    payload["messages"] = [
+        {"role": "system", "content": app.SYSTEM_PROMPT},
+        {"role": "user", "content": f"User request: {query}"}
+    ]
+    return payload
+
+def baked_payload(query):
+    payload = app.build_chat_payload(query, stream=False)
+    payload["model"] = app.PROMPT_MODEL_NAME
+    payload["messages"] = [{"role": "user", "content": f"User request: {query}"}]
+    return payload
+
+def run_mode(label, build_payload, rounds):
+    # One untimed call loads the model (and, where it can, caches the prefix)
+    chat(build_payload(QUERIES[0]))
+    walls, counts, evals = [], [], []
+    for _ in range(rounds):
+        for query in QUERIES:
+            wall_ms, result = chat(build_payload(query))
+            walls.append(wall_ms)
+            counts.append(result.get("prompt_eval_count", 0))
+            evals.append(result.get("prompt_eval_duration", 0) / 1e6)
+    calls = len(walls)
+    print(f"{label:<8} {calls:>5} calls   prompt tokens {sum(counts) / calls:8.1f}   "
+          f"prompt eval {sum(evals) / calls:9.1f} ms   wall {sum(walls) / calls:9.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=3, help="passes over the query list per mode")
+    args = parser.parse_args()
+
+    print(f"Model {app.OLLAMA_MODEL} at {app.OLLAMA_BASE_URL}, system prompt {len(app.SYSTEM_PROMPT)} chars")
+    run_mode("fresh", fresh_payload, args.rounds)
+    run_mode("shared", shared_payload, args.rounds)
+    # Create the derived model now rather than in the background
+    if app.PROMPT_MODELS and app.PROMPT_MODELS[app.SYSTEM_PROMPT].create():
+        run_mode("baked", baked_payload, args.rounds)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
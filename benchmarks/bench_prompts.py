@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Prompt tokens, latency and accuracy of category prompts vs the full prompt
+
+Runs every query in benchmarks/golden_queries.jsonl through Ollama twice:
+once with the full SYSTEM_PROMPT (the old behaviour) and once with the prompt
+app.py now picks from the pre-extracted category. Reports Ollama's
+prompt_eval_count and prompt_eval_duration, wall time, and how often the
+parsed answer gets the golden category, price and at least one expected
+keyword in its recommendations.
+
+Each golden line is {"query", "category", "keywords", "max_price"[, "min_price"]};
+a price of null means the answer must not set one.
+
+Usage:
+    python benchmarks/bench_prompts.py
+    python benchmarks/bench_prompts.py --sizes-only
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import prompt_library
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden_queries.jsonl')
+
+def load_golden(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def print_sizes(golden):
+    """Prompt sizes in characters (roughly 4 per token), and how often each is used"""
+    full = len(prompt_library.SYSTEM_PROMPT)
+    total = 0
+    for row in golden:
+        total += len(prompt_library.prompt_for_category(app.extract_category_from_query(row["query"])))
+    print(f"Full prompt: {full} chars. Category prompts: "
+          + ", ".join(f"{category} {len(prompt)}" for category, prompt in sorted(prompt_library.CATEGORY_PROMPTS.items())))
+    print(f"Mean system prompt over the golden set: {full} -> {total / len(golden):.0f} chars")
+
+def ask(query, system_prompt):
+    payload = app.build_chat_payload(query, stream=False)
+    payload["model"] = app.OLLAMA_MODEL
+    payload["messages"] = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"User request: {query}"}
+    ]
+    started = time.perf_counter()
+    response = requests.post(f"{app.OLLAMA_BASE_URL}/api/chat", json=payload, timeout=600)
+    response.raise_for_status()
+    return (time.perf_counter() - started) * 1000, response.json()
+
+def score(row, parsed):
+    """(category ok, price ok, keyword ok) for one parsed answer"""
+    category_ok = parsed.get("category") == row["category"]
+    price_ok = all(parsed.get(key) == row.get(key) for key in ("min_price", "max_price") if key in row)
+    recommendations = " | ".join(str(item) for item in parsed.get("recommendations", [])).lower()
+    keyword_ok = any(keyword in recommendations for keyword in row["keywords"])
+    return category_ok, price_ok, keyword_ok
+
+def run_mode(label, golden, pick_prompt):
+    walls, counts, evals = [], [], []
+    hits = [0, 0, 0]
+    for row in golden:
+        category = app.extract_category_from_query(row["query"])
+        wall_ms, result = ask(row["query"], pick_prompt(category))
+        parsed = app.parse_ai_response(result["message"]["content"], category)
+        for index, ok in enumerate(score(row, parsed)):
+            hits[index] += ok
+        walls.append(wall_ms)
+        counts.append(result.get("prompt_eval_count", 0))
+        evals.append(result.get("prompt_eval_duration", 0) / 1e6)
+    n = len(golden)
+    print(f"{label:<9} prompt tokens {sum(counts) / n:7.1f}   prompt eval {sum(evals) / n:8.1f} ms   "
+          f"wall {sum(walls) / n:8.1f} ms   category {hits[0]}/{n}   price {hits[1]}/{n}   keywords {hits[2]}/{n}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare category prompts with the full prompt")
+    parser.add_argument('--golden', default=GOLDEN_PATH, help="golden query file")
+    parser.add_argument('--sizes-only', action='store_true', help="print prompt sizes without calling Ollama")
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden)
+    print_sizes(golden)
+    if args.sizes_only:
+        return 0
+
+    print(f"Model {app.OLLAMA_MODEL} at {app.OLLAMA_BASE_URL}, {len(golden)} golden queries")
+    # Load the model before timing anything
+    ask(golden[0]["query"], prompt_library.SYSTEM_PROMPT)
+    run_mode("full", golden, lambda category: prompt_library.SYSTEM_PROMPT)
+    run_mode("category", golden, prompt_library.prompt_for_category)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Cache hit rate with and without consistent-hash routing across app instances
+
+Starts several local app instances (each its own process, with its own
+response cache), then sends the golden queries to them several times in
+random order through the cacheable GET endpoint:
+
+- random: each request goes to a random instance, like a plain load balancer
+- routed: each request goes through cache_router.Router
+
+For each mode it reports the combined response cache hit rate (from the
+instances' /api/metrics), Ollama calls and latency. It also reports what
+share of the queries would move to another instance if one instance left the
+ring.
+
+Usage:
+    OLLAMA_BASE_URL=http://localhost:11434 python benchmarks/bench_routing.py --instances 3 --rounds 4
+"""
+
+import argparse
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_prompts import GOLDEN_PATH, load_golden
+from cache_router import HashRing, Router, create_app
+from metrics import percentile
+from response_cache import normalize_query
+
+def start_instances(ports):
+    processes = []
+    for port in ports:
+        code = f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"
+        processes.append(subprocess.Popen([sys.executable, '-c', code], cwd=ROOT,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    for port in ports:
+        for _ in range(100):
+            try:
+                requests.get(f"http://127.0.0.1:{port}/api/health", timeout=1)
+                break
+            except requests.exceptions.RequestException:
+                time.sleep(0.1)
+    return processes
+
+def cache_totals(nodes):
+    hits = misses = ollama = 0
+    for node in nodes:
+        metrics = requests.get(f"{node}/api/metrics", timeout=5).json()
+        hits += metrics["response_cache"]["hits"]
+        misses += metrics["response_cache"]["misses"]
+        ollama += metrics["ollama"]["counters"].get("ollama.requests", 0)
+    return hits, misses, ollama
+
+def run_mode(label, queries, ports, concurrency, routed):
+    processes = start_instances(ports)
+    nodes = [f"http://127.0.0.1:{port}" for port in ports]
+    server = None
+    try:
+        if routed:
+            server = make_server('127.0.0.1', 0, create_app(Router(nodes)), threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            targets = [f"http://127.0.0.1:{server.server_port}"]
+        else:
+            targets = nodes
+
+        def one(query):
+            started = time.perf_counter()
+            url = f"{random.choice(targets)}/api/generate-link?q={urllib.parse.quote(query)}"
+            ok = requests.get(url, timeout=300).ok
+            return ok, (time.perf_counter() - started) * 1000
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(one, queries))
+        hits, misses, ollama = cache_totals(nodes)
+    finally:
+        if server is not None:
+            server.shutdown()
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    latencies = sorted(latency for _, latency in results)
+    errors = sum(1 for ok, _ in results if not ok)
+    print(f"{label:<8} cache hit rate {hits / max(hits + misses, 1):6.1%}   Ollama calls {ollama:4d}   "
+          f"p50 {percentile(latencies, 0.5):7.0f} ms   p95 {percentile(latencies, 0.95):7.0f} ms   errors {errors}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cache hit rates with and without query routing")
+    parser.add_argument('--instances', type=int, default=3, help="app instances to start")
+    parser.add_argument('--base-port', type=int, default=5101, help="port of the first instance")
+    parser.add_argument('--rounds', type=int, default=4, help="times each golden query is sent")
+    parser.add_argument('--concurrency', type=int, default=4, help="simultaneous clients")
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    queries = [row["query"] for row in load_golden(GOLDEN_PATH)]
+    traffic = queries * args.rounds
+    random.seed(7)
+    random.shuffle(traffic)
+    ports = [args.base_port + i for i in range(args.instances)]
+    print(f"{args.instances} instances, {len(queries)} distinct queries x {args.rounds} rounds")
+
+    run_mode("random", traffic, ports, args.concurrency, routed=False)
+    run_mode("routed", traffic, ports, args.concurrency, routed=True)
+
+    nodes = [f"http://127.0.0.1:{port}" for port in ports]
+    ring = HashRing(nodes)
+    keys = [normalize_query(query) for query in queries]
+    before = {key: ring.owner(key) for key in keys}
+    ring.remove(nodes[-1])
+    moved = sum(ring.owner(key) != before[key] for key in keys)
+    print(f"Removing one instance moves {moved}/{len(keys)} queries "
+          f"(the {sum(owner == nodes[-1] for owner in before.values())} it owned)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Startup time, memory and lookup latency of the Craigslist site matcher
+
+Compares the catalog-backed matcher in site_catalog.py (cold build, and load
+from the disk cache) with the 16-entry CITY_MAPPING substring scan it replaced.
+
+Usage:
+    python benchmarks/bench_site_catalog.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import site_catalog
+
+# The hand-written mapping app.py used before the site catalog
+LEGACY_CITY_MAPPING = {
+    "san francisco": "sfbay", "sf": "sfbay", "bay area": "sfbay",
+    "new york": "nyc", "nyc": "nyc",
+    "los angeles": "losangeles", "la": "losangeles",
+    "chicago": "chicago", "seattle": "seattle", "austin": "austin",
+    "denver": "denver", "miami": "miami", "atlanta": "atlanta",
+    "phoenix": "phoenix", "dallas": "dallas", "houston": "houston"
+}
+
+QUERIES = [
+    "I want a reliable car under $10,000",
+    "cheap laptop for coding under $500",
+    "furniture for small apartment in NYC",
+    "remote software job in Seattle",
+    "apartment for rent in Los Angeles under $2000",
+    "BMW 335i 2010 to 2015 under 100k miles automatic clean title within 20 miles of 94086",
+    "used road bike in Portland, OR",
+    "kayak near Traverse City",
+]
+
+def legacy_find_city(query):
+    query_lower = query.lower()
+    for city_name, city_code in LEGACY_CITY_MAPPING.items():
+        if city_name in query_lower:
+            return city_code
+    return None
+
+def measure(label, load):
+    """Time and trace one cold load"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed * 1000:8.2f} ms   retained {current / 1024:8.1f} KB   peak {peak / 1024:8.1f} KB")
+    return result
+
+def lookup_latency(find, iterations=20000):
+    started = time.perf_counter()
+    for i in range(iterations):
+        find(QUERIES[i % len(QUERIES)])
+    return (time.perf_counter() - started) / iterations * 1e6
+
+def main():
+    cache_dir = tempfile.mkdtemp(prefix="craigslink-bench-")
+    try:
+        print("Startup")
+        measure("legacy dict", lambda: dict(LEGACY_CITY_MAPPING))
+        matcher = measure("catalog, cold build", lambda: site_catalog.load_matcher(cache_dir=cache_dir))
+        measure("catalog, disk cache", lambda: site_catalog.load_matcher(cache_dir=cache_dir))
+        print(f"\nCatalog: {len(matcher.sites)} sites, {len(matcher.phrases)} phrases")
+
+        print("\nLookup latency")
+        print(f"{'legacy dict scan':<28} {lookup_latency(legacy_find_city):8.2f} us")
+        print(f"{'catalog matcher':<28} {lookup_latency(matcher.find_site):8.2f} us")
+
+        print("\nResults")
+        for query in QUERIES:
+            print(f"  {legacy_find_city(query) or '-':<12} {matcher.find_site(query) or '-':<12} {query}")
+    finally:
+        shutil.rmtree(cache_dir)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Coverage and lookup latency of the vehicle catalog
+
+Loads data/vehicle_catalog.json, then runs the golden queries through the
+same check generate_result() makes before calling Ollama. Reports how many
+vehicle queries the catalog answers, what it recommends for each, and the
+per-query lookup time.
+
+Usage:
+    python benchmarks/bench_vehicle_catalog.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import vehicle_catalog
+from bench_prompts import GOLDEN_PATH, load_golden
+from metrics import percentile
+
+def main():
+    started = time.perf_counter()
+    catalog = vehicle_catalog.load_catalog()
+    print(f"Catalog load: {(time.perf_counter() - started) * 1000:.2f} ms, "
+          f"{sum(len(make['models']) for make in catalog.makes)} models, {len(catalog.phrases)} phrases")
+
+    golden = load_golden(GOLDEN_PATH)
+    answered = {"cta": 0, "other": 0}
+    totals = {"cta": 0, "other": 0}
+    for row in golden:
+        kind = "cta" if row["category"] == "cta" else "other"
+        totals[kind] += 1
+        answer = app.vehicle_catalog_answer(row["query"], app.extract_query_filters(row["query"]))
+        if answer is not None:
+            answered[kind] += 1
+            print(f"  {row['query'][:60]:<60} -> {', '.join(answer['recommendations'])}")
+    print(f"Answered {answered['cta']}/{totals['cta']} vehicle queries and "
+          f"{answered['other']}/{totals['other']} other queries without Ollama")
+
+    timings = []
+    for _ in range(200):
+        for row in golden:
+            started = time.perf_counter()
+            catalog.recommendations(row["query"])
+            timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    print(f"Lookup: p50 {percentile(timings, 0.5):.1f} us, p99 {percentile(timings, 0.99):.1f} us")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Build fingerprinted, precompressed static assets
+
+Copies each file in ASSETS to static/dist/ under a content-hashed name
+(style.css -> style.3f2a9c1b7d.css), writes .gz and, when the brotli package
+is installed, .br variants next to it, and records the mapping in
+static/dist/manifest.json. app.py reads the manifest at startup so templates
+link the hashed paths, which can then be cached for a year.
+
+Usage:
+    python build_assets.py
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Paths relative to static/
+ASSETS = [
+    'css/style.css',
+    'js/app.js',
+]
+
+def hashed_name(path, content):
+    """style.css + content -> style.<hash>.css"""
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest}{ext}"
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+def remove_stale_builds(asset, built):
+    """Delete older hashed copies (and their compressed variants) of an asset"""
+    directory = os.path.join(DIST_DIR, os.path.dirname(asset))
+    if not os.path.isdir(directory):
+        return
+    root, ext = os.path.splitext(os.path.basename(asset))
+    pattern = re.compile(rf"^{re.escape(root)}\.[0-9a-f]{{10}}{re.escape(ext)}(\.gz|\.br)?$")
+    current = os.path.basename(built)
+    for name in os.listdir(directory):
+        if pattern.match(name) and not name.startswith(current):
+            os.remove(os.path.join(directory, name))
+
+def build():
+    manifest = {}
+    for asset in ASSETS:
+        with open(os.path.join(STATIC_DIR, asset), 'rb') as f:
+            content = f.read()
+
+        built = hashed_name(asset, content)
+        remove_stale_builds(asset, built)
+        target = os.path.join(DIST_DIR, built)
+        write_file(target, content)
+        # mtime=0 keeps the gzip output byte-identical between builds
+        write_file(f"{target}.gz", gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            write_file(f"{target}.br", brotli.compress(content, quality=11))
+
+        manifest[asset] = f"dist/{built}"
+        print(f"{asset} -> static/dist/{built}")
+
+    write_file(MANIFEST_PATH, (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode('utf-8'))
+    if brotli is None:
+        print("brotli not installed - wrote .gz variants only")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(build())
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Bulk offline link generation for large JSONL query files
+
+Streams queries in and results out, one JSON object per line, without loading
+the whole file into memory. Regex extraction runs in-process (or across a
+process pool with --workers, though it takes only tens of microseconds per
+query, so the pool rarely pays for its pickling), Ollama calls are capped at a
+fixed concurrency, repeated queries are answered from a
+bounded in-memory cache and progress is checkpointed after every batch so an
+interrupted run picks up where it left off.
+
+Usage:
+    python bulk_generate.py queries.jsonl results.jsonl
+    python bulk_generate.py queries.jsonl results.jsonl --ollama-concurrency 4
+
+Each input line must be a JSON object with a "query" field. An optional "id"
+field is copied to the matching output line.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import extract_query_filters, query_ollama, parse_ai_response, build_link_result, normalize_query, vehicle_catalog_answer
+from response_cache import LRUCache
+
+def load_checkpoint(path):
+    """Return the saved checkpoint, or None when starting fresh"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_checkpoint(path, input_lines, output_offset):
+    """Atomically record how far the run has got"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"input_lines": input_lines, "output_offset": output_offset}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_batches(input_file, batch_size, skip_lines):
+    """Yield (line_number, raw_line) batches, skipping already processed lines"""
+    batch = []
+    for line_number, line in enumerate(input_file, 1):
+        if line_number <= skip_lines:
+            continue
+        batch.append((line_number, line))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def parse_line(line_number, line):
+    """Decode one input line into a row dict, or an error message"""
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        return None, f"Invalid JSON on line {line_number}: {e}"
+    if not isinstance(row, dict) or not str(row.get('query', '')).strip():
+        return None, f"Line {line_number} has no query"
+    return row, None
+
+def generate_for_query(user_query, filters):
+    """Run the Ollama stage for a single unique query, unless the vehicle catalog answers it"""
+    answer = vehicle_catalog_answer(user_query, filters)
+    if answer is not None:
+        return answer
+    category = filters["category"]
+    return parse_ai_response(query_ollama(user_query, category=category), category)
+
+def process_batch(batch, pool, pool_size, executor, cache):
+    """Process one batch and return output records in input order"""
+    rows = []
+    records = {}
+    for line_number, line in batch:
+        if not line.strip():
+            continue
+        row, error = parse_line(line_number, line)
+        if error:
+            records[line_number] = {"line": line_number, "success": False, "error": error}
+        else:
+            rows.append((line_number, row, row['query'].strip()))
+
+    # One chunk per worker keeps the pickling overhead per batch small
+    queries = [user_query for _, _, user_query in rows]
+    if pool is not None and queries:
+        chunksize = -(-len(queries) // pool_size)
+        all_filters = pool.map(extract_query_filters, queries, chunksize)
+    else:
+        all_filters = [extract_query_filters(user_query) for user_query in queries]
+
+    # Only unique, uncached queries go to Ollama
+    answers = {}
+    pending = {}
+    for (_, _, user_query), filters in zip(rows, all_filters):
+        key = normalize_query(user_query)
+        if key in answers or key in pending:
+            continue
+        cached = cache.get(key)
+        if cached is not None:
+            answers[key] = cached
+        else:
+            pending[key] = executor.submit(generate_for_query, user_query, filters)
+
+    for key, future in pending.items():
+        try:
+            answers[key] = future.result()
+            cache.put(key, answers[key])
+        except Exception as e:
+            answers[key] = e
+
+    for (line_number, row, user_query), filters in zip(rows, all_filters):
+        answer = answers[normalize_query(user_query)]
+        if isinstance(answer, Exception):
+            record = {'error': f'An error occurred: {str(answer)}', 'success': False}
+        else:
+            record = build_link_result(user_query, filters, answer)
+        record = {"line": line_number, **record}
+        if 'id' in row:
+            record = {"id": row['id'], **record}
+        records[line_number] = record
+
+    return [records[line_number] for line_number in sorted(records)], len(pending)
+
+def run(args):
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    checkpoint = load_checkpoint(checkpoint_path) if not args.restart else None
+    skip_lines = checkpoint["input_lines"] if checkpoint else 0
+
+    if checkpoint and os.path.exists(args.output):
+        # Drop anything written after the last checkpoint
+        output_file = open(args.output, 'r+b')
+        output_file.truncate(checkpoint["output_offset"])
+        output_file.seek(checkpoint["output_offset"])
+        print(f"Resuming after line {skip_lines}", file=sys.stderr)
+    else:
+        output_file = open(args.output, 'wb')
+        skip_lines = 0
+
+    cache = LRUCache(args.dedupe_cache)
+    pool = multiprocessing.Pool(args.workers) if args.workers > 0 else None
+    executor = ThreadPoolExecutor(max_workers=args.ollama_concurrency)
+
+    started = time.monotonic()
+    last_report = started
+    processed = 0
+    llm_calls = 0
+    input_lines = skip_lines
+
+    try:
+        with open(args.input, encoding='utf-8') as input_file:
+            for batch in read_batches(input_file, args.batch_size, skip_lines):
+                records, batch_llm_calls = process_batch(batch, pool, args.workers, executor, cache)
+                for record in records:
+                    output_file.write(json.dumps(record).encode('utf-8') + b"\n")
+                output_file.flush()
+                os.fsync(output_file.fileno())
+
+                input_lines = batch[-1][0]
+                save_checkpoint(checkpoint_path, input_lines, output_file.tell())
+
+                processed += len(records)
+                llm_calls += batch_llm_calls
+                now = time.monotonic()
+                if now - last_report >= args.report_every:
+                    last_report = now
+                    rate = processed / (now - started)
+                    print(f"line {input_lines}: {processed} queries, {rate:.1f} queries/s, "
+                          f"{llm_calls} Ollama calls, {cache.hits} cache hits", file=sys.stderr)
+    finally:
+        output_file.close()
+        executor.shutdown(wait=True)
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    elapsed = time.monotonic() - started
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Done: {processed} queries in {elapsed:.1f}s ({rate:.1f} queries/s), "
+          f"{llm_calls} Ollama calls, {cache.hits} cache hits", file=sys.stderr)
+    # No checkpoint is written when the input had nothing left to process
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate Craigslist links for a JSONL file of queries")
+    parser.add_argument('input', help="input JSONL file, one {\"query\": ...} object per line")
+    parser.add_argument('output', help="output JSONL file")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="processes used for regex extraction (default 0 runs it in-process)")
+    parser.add_argument('--ollama-concurrency', type=int, default=4,
+                        help="maximum number of Ollama calls in flight")
+    parser.add_argument('--batch-size', type=int, default=256,
+                        help="lines read, processed and checkpointed together")
+    parser.add_argument('--dedupe-cache', type=int, default=100000,
+                        help="number of distinct queries whose AI answer is kept for reuse")
+    parser.add_argument('--checkpoint', help="checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument('--restart', action='store_true',
+                        help="ignore any existing checkpoint and start from the first line")
+    parser.add_argument('--report-every', type=float, default=10.0,
+                        help="seconds between throughput reports")
+    return run(parser.parse_args())
+
+if __name__ == "__main__":
+    sys.exit(main())
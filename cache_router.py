@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Cache-affinity router for running several app instances
+
+Each app instance keeps its own response cache, refinement sessions and warm
+Ollama state, so behind a plain load balancer repeated queries land on random
+instances and every instance caches a little of everything. This router sends
+each normalized query to an owner instance picked by consistent hashing:
+
+- HashRing places every instance at many points (virtual nodes) on a hash
+  ring, and a key belongs to the first instance clockwise from its hash.
+  Adding or removing an instance only moves the keys of the ring segments it
+  owns, about 1/n of them.
+- BoundedLoadBalancer caps each instance at load_factor times the average
+  number of requests in flight (consistent hashing with bounded loads). When a
+  popular query's owner is full, the request goes to the next instance on the
+  ring instead, so one hot query can't pile up on one instance.
+
+Refine requests are routed by session id (the router assigns one when the
+client has none yet) so a session stays on the instance that stores it. The
+load bound doesn't apply to them: a session only moves on when its owner is
+down, since no other instance has it. Cancel requests go to the instance
+running the request they name. Instances that fail a health check or refuse
+a connection leave the ring until they answer again.
+
+Usage:
+    PORT=5001 python app.py & PORT=5002 python app.py & PORT=5003 python app.py &
+    python cache_router.py --nodes http://127.0.0.1:5001,http://127.0.0.1:5002,http://127.0.0.1:5003 --port 5000
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+
+import requests
+from flask import Flask, Response, jsonify, request
+
+from response_cache import normalize_query
+
+# Hop-by-hop and length headers are set by the server for the response we send
+SKIPPED_HEADERS = frozenset(["connection", "keep-alive", "transfer-encoding", "content-length", "host"])
+
+def ring_hash(value):
+    """Stable 64-bit position on the ring"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class HashRing:
+    """Consistent hash ring with virtual nodes"""
+
+    def __init__(self, nodes=(), vnodes=160):
+        self.vnodes = vnodes
+        # (node set, sorted ring positions, node at each position), replaced
+        # as a whole so readers never see a half-built ring
+        self.state = (frozenset(), [], [])
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self):
+        return self.state[0]
+
+    def _rebuild(self, nodes):
+        ring = sorted((ring_hash(f"{node}#{i}"), node) for node in nodes for i in range(self.vnodes))
+        self.state = (frozenset(nodes), [point for point, _ in ring], [node for _, node in ring])
+
+    def add(self, node):
+        if node not in self.nodes:
+            self._rebuild(self.nodes | {node})
+
+    def remove(self, node):
+        if node in self.nodes:
+            self._rebuild(self.nodes - {node})
+
+    def walk(self, key):
+        """Distinct nodes in ring order, starting with the key's owner"""
+        nodes, points, owners = self.state
+        if not points:
+            return
+        start = bisect.bisect(points, ring_hash(key))
+        seen = set()
+        for i in range(len(points)):
+            node = owners[(start + i) % len(points)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(nodes):
+                    return
+
+    def owner(self, key):
+        return next(self.walk(key), None)
+
+class BoundedLoadBalancer:
+    """Pick ring owners while keeping every node under load_factor times the mean load"""
+
+    def __init__(self, ring, load_factor=1.25):
+        self.ring = ring
+        self.load_factor = load_factor
+        self.loads = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, key, exclude=(), bounded=True):
+        """Reserve a slot on the first node with spare capacity; returns the node, or None
+
+        With bounded=False the key's owner is used however busy it is, and
+        later nodes only when the owner is excluded.
+        """
+        with self.lock:
+            nodes = [node for node in self.ring.nodes if node not in exclude]
+            if not nodes:
+                return None
+            in_flight = sum(self.loads.get(node, 0) for node in nodes) + 1
+            capacity = math.ceil(self.load_factor * in_flight / len(nodes))
+            candidates = self.ring.walk(key) if key is not None else sorted(nodes, key=lambda node: self.loads.get(node, 0))
+            for node in candidates:
+                if node not in exclude and (not bounded or self.loads.get(node, 0) < capacity):
+                    self.loads[node] = self.loads.get(node, 0) + 1
+                    return node
+            return None
+
+    def release(self, node):
+        with self.lock:
+            self.loads[node] = max(0, self.loads.get(node, 0) - 1)
+
+class Router:
+    """Forward requests to app instances by routing key"""
+
+    def __init__(self, nodes, vnodes=160, load_factor=1.25, timeout=180, health_interval=5):
+        self.all_nodes = [node.rstrip('/') for node in nodes]
+        self.ring = HashRing(self.all_nodes, vnodes)
+        self.balancer = BoundedLoadBalancer(self.ring, load_factor)
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.local = threading.local()
+        self.in_flight = {}     # X-Request-ID -> node, for routing cancels
+        self.stats = {node: {"requests": 0, "owner": 0, "spilled": 0, "errors": 0} for node in self.all_nodes}
+        self.lock = threading.Lock()
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def routing_key(self, path, body):
+        """The key a request is hashed on, or None to use the least loaded instance"""
+        if path == '/api/generate-link':
+            query = request.args.get('q') or request.args.get('query') if request.method == 'GET' else body.get('query')
+            return normalize_query(str(query or '')) or None
+        if path == '/api/refine':
+            return f"session:{body['session_id']}"
+        return None
+
+    def mark_down(self, node):
+        with self.lock:
+            self.ring.remove(node)
+
+    def check_health(self):
+        """Take failing instances out of the ring and put recovered ones back"""
+        for node in self.all_nodes:
+            try:
+                healthy = requests.get(f"{node}/api/health", timeout=2).ok
+            except requests.exceptions.RequestException:
+                healthy = False
+            with self.lock:
+                if healthy:
+                    self.ring.add(node)
+                else:
+                    self.ring.remove(node)
+
+    def start_health_checks(self):
+        def run():
+            while True:
+                time.sleep(self.health_interval)
+                self.check_health()
+        threading.Thread(target=run, name="router-health", daemon=True).start()
+
+    def forward(self, path):
+        body = request.get_json(force=True, silent=True) if request.method == 'POST' else None
+        body = body if isinstance(body, dict) else {}
+        data = request.get_data()
+
+        if path == '/api/refine' and not str(body.get('session_id') or '').strip():
+            body['session_id'] = uuid.uuid4().hex
+            data = json.dumps(body).encode('utf-8')
+        if path == '/api/cancel':
+            return self.cancel(body, data)
+
+        key = self.routing_key(path, body)
+        # Sessions live on their owner only, so they stick to it while it is up
+        bounded = key is None or not key.startswith('session:')
+        request_id = request.headers.get('X-Request-ID')
+        tried = set()
+        while True:
+            node = self.balancer.acquire(key, exclude=tried, bounded=bounded)
+            if node is None:
+                return jsonify({'error': 'No app instance available', 'success': False}), 503
+            tried.add(node)
+            if request_id:
+                self.in_flight[request_id] = node
+            try:
+                upstream = self.send(node, path, data)
+                # Keep the instance's compression; the client negotiated it
+                body = upstream.raw.read(decode_content=False)
+                upstream.close()
+            except requests.exceptions.ConnectionError:
+                self.mark_down(node)
+                with self.lock:
+                    self.stats[node]["errors"] += 1
+                continue
+            except requests.exceptions.RequestException as e:
+                with self.lock:
+                    self.stats[node]["errors"] += 1
+                return jsonify({'error': f'App instance failed: {str(e)}', 'success': False}), 502
+            finally:
+                self.balancer.release(node)
+                if request_id:
+                    self.in_flight.pop(request_id, None)
+
+            with self.lock:
+                stats = self.stats[node]
+                stats["requests"] += 1
+                if key is not None:
+                    stats["owner" if node == self.ring.owner(key) else "spilled"] += 1
+            return self.relay(upstream, body, node)
+
+    def send(self, node, path, data):
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in SKIPPED_HEADERS}
+        # Don't let requests ask for a compressed body the client can't read
+        headers.setdefault('Accept-Encoding', 'identity')
+        return self.session().request(
+            request.method, f"{node}{path}", params=request.args, data=data, headers=headers,
+            timeout=self.timeout, stream=True, allow_redirects=False
+        )
+
+    def relay(self, upstream, body, node):
+        headers = [(name, value) for name, value in upstream.headers.items() if name.lower() not in SKIPPED_HEADERS]
+        headers.append(('X-Routed-To', node))
+        return Response(body, status=upstream.status_code, headers=headers)
+
+    def cancel(self, body, data):
+        """Send a cancel to the instance running the request, or to every instance if unknown"""
+        node = self.in_flight.get(str(body.get('request_id', '')).strip())
+        nodes = [node] if node else sorted(self.ring.nodes)
+        cancelled = False
+        for target in nodes:
+            try:
+                response = self.send(target, '/api/cancel', data)
+                cancelled = cancelled or bool(response.json().get('cancelled'))
+            except (requests.exceptions.RequestException, ValueError):
+                continue
+        return jsonify({'success': True, 'cancelled': cancelled})
+
+    def status(self):
+        with self.lock:
+            return {
+                "nodes": {node: {"healthy": node in self.ring.nodes, "in_flight": self.balancer.loads.get(node, 0),
+                                 **self.stats[node]} for node in self.all_nodes},
+                "load_factor": self.balancer.load_factor,
+                "vnodes": self.ring.vnodes
+            }
+
+def create_app(router):
+    app = Flask(__name__)
+
+    @app.route('/router/status')
+    def router_status():
+        """Ring membership, in-flight load and owner/spill counts per instance"""
+        return jsonify(router.status())
+
+    @app.route('/', defaults={'path': ''}, methods=['GET', 'POST'])
+    @app.route('/<path:path>', methods=['GET', 'POST'])
+    def proxy(path):
+        return router.forward(f"/{path}")
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Route queries to app instances by consistent hashing")
+    parser.add_argument('--nodes', default=os.getenv('ROUTER_NODES', ''),
+                        help="comma-separated app instance URLs (or ROUTER_NODES)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '5000')))
+    parser.add_argument('--vnodes', type=int, default=160, help="ring points per instance")
+    parser.add_argument('--load-factor', type=float, default=1.25,
+                        help="max in-flight requests per instance, as a multiple of the mean")
+    parser.add_argument('--health-interval', type=float, default=5, help="seconds between health checks")
+    args = parser.parse_args()
+
+    nodes = [node.strip() for node in args.nodes.split(',') if node.strip()]
+    if not nodes:
+        parser.error("no app instances given (--nodes or ROUTER_NODES)")
+    router = Router(nodes, vnodes=args.vnodes, load_factor=args.load_factor, health_interval=args.health_interval)
+    router.start_health_checks()
+    create_app(router).run(host=args.host, port=args.port, threaded=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Local category classifier trained from logged LLM decisions
+
+A multinomial naive Bayes model over hashed text features: words, word pairs
+and character trigrams, each hashed into 2**bits buckets with crc32 so the
+same query always maps to the same buckets in every process. Predicting is a
+dictionary lookup per feature, a few microseconds per query, with no
+dependencies beyond the standard library.
+
+Raw naive Bayes posteriors are poorly calibrated (usually over-confident), so
+the log scores are divided by a temperature fitted on held-out examples. The confidence returned by
+predict() can then be compared against a threshold (see
+CATEGORY_MODEL_MIN_CONFIDENCE in app.py) to decide when to trust it.
+
+Models are trained with train_category_model.py and saved as JSON.
+"""
+
+import json
+import math
+import zlib
+
+from site_catalog import query_words
+
+MODEL_FORMAT = 1
+
+def query_features(query, bits):
+    """Hashed feature buckets of a query, with counts"""
+    words = query_words(query)
+    tokens = [f"w:{word}" for word in words]
+    tokens.extend(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+    for word in words:
+        padded = f" {word} "
+        tokens.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+
+    mask = (1 << bits) - 1
+    counts = {}
+    for token in tokens:
+        bucket = zlib.crc32(token.encode()) & mask
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+def softmax(scores, temperature=1.0):
+    top = max(scores)
+    exps = [math.exp((score - top) / temperature) for score in scores]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+class CategoryClassifier:
+    """Hashed-feature naive Bayes over Craigslist category codes"""
+
+    def __init__(self, classes, priors, weights, unseen, bits=18, temperature=1.0):
+        self.classes = classes          # category codes
+        self.priors = priors            # log P(class)
+        self.weights = weights          # per class: bucket -> log P(bucket | class)
+        self.unseen = unseen            # per class: log P of a bucket never seen with it
+        self.bits = bits
+        self.temperature = temperature
+        # Inverted index so scoring touches only the classes a bucket was seen
+        # with: bucket -> [(class index, weight above that class's unseen weight)]
+        self.index = {}
+        for i, class_weights in enumerate(weights):
+            for bucket, weight in class_weights.items():
+                self.index.setdefault(bucket, []).append((i, weight - unseen[i]))
+
+    @classmethod
+    def train(cls, examples, bits=18, alpha=0.1):
+        """Fit on (query, category) pairs"""
+        class_counts = {}
+        feature_counts = {}
+        for query, category in examples:
+            class_counts[category] = class_counts.get(category, 0) + 1
+            counts = feature_counts.setdefault(category, {})
+            for bucket, count in query_features(query, bits).items():
+                counts[bucket] = counts.get(bucket, 0) + count
+
+        classes = sorted(class_counts)
+        total_examples = sum(class_counts.values())
+        buckets = 1 << bits
+        priors, weights, unseen = [], [], []
+        for category in classes:
+            counts = feature_counts[category]
+            denominator = math.log(sum(counts.values()) + alpha * buckets)
+            priors.append(math.log(class_counts[category] / total_examples))
+            weights.append({bucket: math.log(count + alpha) - denominator for bucket, count in counts.items()})
+            unseen.append(math.log(alpha) - denominator)
+        return cls(classes, priors, weights, unseen, bits)
+
+    def scores(self, query):
+        """Unnormalized log posterior per class"""
+        features = query_features(query, self.bits)
+        total = sum(features.values())
+        scores = [prior + total * unseen for prior, unseen in zip(self.priors, self.unseen)]
+        index = self.index
+        for bucket, count in features.items():
+            for i, delta in index.get(bucket, ()):
+                scores[i] += count * delta
+        return scores
+
+    def predict_proba(self, query):
+        """Calibrated probability per class, in self.classes order"""
+        return softmax(self.scores(query), self.temperature)
+
+    def predict(self, query):
+        """Return (category, confidence) for a query"""
+        probabilities = self.predict_proba(query)
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        return self.classes[best], probabilities[best]
+
+    def calibrate(self, examples):
+        """Pick the temperature that minimizes log loss on held-out (query, category) pairs"""
+        index = {category: i for i, category in enumerate(self.classes)}
+        rows = [(self.scores(query), index[category]) for query, category in examples if category in index]
+        if not rows:
+            return self.temperature
+
+        def log_loss(temperature):
+            return -sum(math.log(max(softmax(scores, temperature)[label], 1e-12)) for scores, label in rows)
+
+        candidates = [round(0.1 * 1.25 ** step, 3) for step in range(40)]
+        self.temperature = min(candidates, key=log_loss)
+        return self.temperature
+
+    def to_dict(self):
+        return {
+            "format": MODEL_FORMAT,
+            "bits": self.bits,
+            "temperature": self.temperature,
+            "classes": self.classes,
+            "priors": self.priors,
+            "unseen": self.unseen,
+            # JSON object keys are strings
+            "weights": [{str(bucket): round(weight, 5) for bucket, weight in weights.items()}
+                        for weights in self.weights],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("format") != MODEL_FORMAT:
+            raise ValueError(f"unsupported category model format {data.get('format')}")
+        weights = [{int(bucket): weight for bucket, weight in class_weights.items()}
+                   for class_weights in data["weights"]]
+        return cls(data["classes"], data["priors"], weights, data["unseen"],
+                   data["bits"], data["temperature"])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
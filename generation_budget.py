@@ -0,0 +1,76 @@
+"""
+Adaptive num_predict from observed answer lengths
+
+A complete answer is usually well under 150 tokens, but every request used to
+reserve num_predict=1000, so a model that kept talking after its JSON was
+allowed to generate up to 1000 tokens. GenerationBudget keeps a rolling
+window of how many output tokens answers needed, per model and category: the
+eval_count Ollama reports, scaled to the part of the text up to the end of
+the JSON, so rambling after the answer doesn't count. It budgets each request
+at a high percentile of that window times a margin, plus a few tokens.
+
+Until a category has enough samples the model-wide window is used, and until
+the model has enough, the full default. Answers whose JSON the budget cut off
+are not added to the window (their real length is unknown), and the caller
+asks for them again with the full default.
+"""
+
+import math
+import threading
+from collections import deque
+
+from metrics import percentile
+
+# Category key of the model-wide window
+ALL_CATEGORIES = "*"
+
+class GenerationBudget:
+    """Per-(model, category) output-length windows and the num_predict they suggest"""
+
+    def __init__(self, default=1000, minimum=64, fraction=0.99, margin=1.25, extra=16,
+                 min_samples=20, window=500):
+        self.default = default
+        self.minimum = minimum
+        self.fraction = fraction
+        self.margin = margin
+        self.extra = extra
+        self.min_samples = min_samples
+        self.window = window
+        self.samples = {}   # (model, category or ALL_CATEGORIES) -> deque of answer token counts
+        self.lock = threading.Lock()
+
+    def record(self, model, category, tokens):
+        """Add the tokens a complete answer needed"""
+        with self.lock:
+            for key in ((model, category), (model, ALL_CATEGORIES)):
+                samples = self.samples.get(key)
+                if samples is None:
+                    samples = self.samples[key] = deque(maxlen=self.window)
+                samples.append(tokens)
+
+    def budget(self, model, category):
+        """num_predict for the next request of a category"""
+        with self.lock:
+            for key in ((model, category), (model, ALL_CATEGORIES)):
+                samples = self.samples.get(key)
+                if samples is not None and len(samples) >= self.min_samples:
+                    values = sorted(samples)
+                    break
+            else:
+                return self.default
+        learned = math.ceil(percentile(values, self.fraction) * self.margin) + self.extra
+        return max(self.minimum, min(self.default, learned))
+
+    def snapshot(self):
+        """Window sizes, percentiles and current budgets, for /api/metrics"""
+        with self.lock:
+            windows = {key: sorted(samples) for key, samples in self.samples.items()}
+        return {
+            f"{model}/{category or 'none'}": {
+                "samples": len(values),
+                "p50": percentile(values, 0.5),
+                "p99": percentile(values, 0.99),
+                "num_predict": self.budget(model, category)
+            }
+            for (model, category), values in sorted(windows.items(), key=lambda item: (item[0][0], str(item[0][1])))
+        }
@@ -0,0 +1,198 @@
+"""
+Offline zip code to Craigslist site lookup
+
+Zip code centroids and Craigslist site centroids are bundled under data/ and
+loaded once into flat, array-backed indexes:
+
+- data/zip_centroids.csv maps contiguous zip code ranges to a centroid. The
+  bundled file has one range per 3-digit zip prefix; a finer file (down to one
+  row per 5-digit zip) can be dropped in with the same columns.
+- data/site_centroids.csv holds one centroid per Craigslist site.
+
+Zip lookups are a binary search over the range starts. Sites are bucketed into
+a fixed grid of CELL_DEGREES cells, so nearest-site and radius queries only
+compute distances for sites in nearby cells. A zip lookup with a 50 mile
+radius takes well under 100 microseconds. Radii are capped at
+MAX_RADIUS_MILES, and radius queries never visit cells outside the occupied
+part of the grid, so even the largest radius stays cheap.
+
+Memory footprint with the bundled data (~520 zip ranges, ~400 sites) is about
+85 KB: four 8-byte arrays for the zip ranges, two 8-byte arrays plus the site
+code strings for the sites, and the grid buckets. A full 5-digit zip file
+(~42,000 rows) grows the zip arrays to about 1.3 MB.
+"""
+
+import bisect
+import csv
+import math
+import os
+from array import array
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+ZIP_CENTROIDS_PATH = os.path.join(DATA_DIR, 'zip_centroids.csv')
+SITE_CENTROIDS_PATH = os.path.join(DATA_DIR, 'site_centroids.csv')
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = 69.0
+CELL_DEGREES = 2.0
+# Craigslist's largest search_distance; a wider radius is treated as this one
+MAX_RADIUS_MILES = 250
+# Most nearby sites locate() returns; each one is a full set of links
+MAX_NEARBY_SITES = 10
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in miles"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+class ZipIndex:
+    """Sorted zip code ranges with their centroids"""
+
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.starts = array('l', (row[0] for row in rows))
+        self.ends = array('l', (row[1] for row in rows))
+        self.lats = array('d', (row[2] for row in rows))
+        self.lons = array('d', (row[3] for row in rows))
+
+    @classmethod
+    def from_csv(cls, path=ZIP_CENTROIDS_PATH):
+        with open(path, newline='') as f:
+            return cls([(int(row['zip_start']), int(row['zip_end']), float(row['lat']), float(row['lon']))
+                        for row in csv.DictReader(f)])
+
+    def centroid(self, zip_code):
+        """Return (lat, lon) for a zip code, or None if it is not covered"""
+        try:
+            zip_value = int(zip_code)
+        except (TypeError, ValueError):
+            return None
+        position = bisect.bisect_right(self.starts, zip_value) - 1
+        if position < 0 or zip_value > self.ends[position]:
+            return None
+        return self.lats[position], self.lons[position]
+
+class SiteIndex:
+    """Craigslist site centroids bucketed into a lat/lon grid"""
+
+    def __init__(self, rows):
+        self.codes = [row[0] for row in rows]
+        self.lats = array('d', (row[1] for row in rows))
+        self.lons = array('d', (row[2] for row in rows))
+        buckets = {}
+        for position, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+            buckets.setdefault(self._cell(lat, lon), []).append(position)
+        self.grid = {cell: array('H', positions) for cell, positions in buckets.items()}
+        rows = [row for row, _ in self.grid] or [0]
+        cols = [col for _, col in self.grid] or [0]
+        self.bounds = min(rows), min(cols), max(rows), max(cols)
+        self.max_ring = int(360 / CELL_DEGREES)
+
+    @classmethod
+    def from_csv(cls, path=SITE_CENTROIDS_PATH):
+        with open(path, newline='') as f:
+            return cls([(row['site'], float(row['lat']), float(row['lon'])) for row in csv.DictReader(f)])
+
+    @staticmethod
+    def _cell(lat, lon):
+        return int(math.floor(lat / CELL_DEGREES)), int(math.floor(lon / CELL_DEGREES))
+
+    def _ring(self, cell, ring):
+        """Yield site positions in the cells exactly `ring` steps from `cell`"""
+        row, col = cell
+        for d_row in range(-ring, ring + 1):
+            for d_col in range(-ring, ring + 1):
+                if max(abs(d_row), abs(d_col)) != ring:
+                    continue
+                positions = self.grid.get((row + d_row, col + d_col))
+                if positions:
+                    yield from positions
+
+    def _ring_lower_bound(self, lat, ring):
+        """Minimum distance in miles to any point in a ring around lat"""
+        if ring <= 1:
+            return 0.0
+        lon_scale = math.cos(math.radians(min(89.0, abs(lat) + ring * CELL_DEGREES)))
+        return (ring - 1) * CELL_DEGREES * MILES_PER_DEGREE * max(lon_scale, 0.01)
+
+    def nearest(self, lat, lon):
+        """Return (site, distance_miles) for the closest site"""
+        cell = self._cell(lat, lon)
+        best_position, best_distance = None, float('inf')
+        for ring in range(self.max_ring + 1):
+            if best_position is not None and self._ring_lower_bound(lat, ring) > best_distance:
+                break
+            for position in self._ring(cell, ring):
+                distance = haversine_miles(lat, lon, self.lats[position], self.lons[position])
+                if distance < best_distance:
+                    best_position, best_distance = position, distance
+        if best_position is None:
+            return None
+        return self.codes[best_position], best_distance
+
+    def _cells(self, min_row, min_col, max_row, max_col):
+        """Yield the site positions of the occupied cells in a block of the grid"""
+        grid_min_row, grid_min_col, grid_max_row, grid_max_col = self.bounds
+        min_row, min_col = max(min_row, grid_min_row), max(min_col, grid_min_col)
+        max_row, max_col = min(max_row, grid_max_row), min(max_col, grid_max_col)
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self.grid):
+            for (row, col), positions in self.grid.items():
+                if min_row <= row <= max_row and min_col <= col <= max_col:
+                    yield positions
+            return
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                positions = self.grid.get((row, col))
+                if positions:
+                    yield positions
+
+    def within(self, lat, lon, radius_miles):
+        """Return [(site, distance_miles)] for every site within the radius, closest first
+
+        The radius is capped at MAX_RADIUS_MILES.
+        """
+        radius_miles = min(radius_miles, MAX_RADIUS_MILES)
+        lat_span = radius_miles / MILES_PER_DEGREE
+        lon_span = radius_miles / (MILES_PER_DEGREE * max(math.cos(math.radians(min(89.0, abs(lat) + lat_span))), 0.01))
+        min_row, min_col = self._cell(lat - lat_span, lon - lon_span)
+        max_row, max_col = self._cell(lat + lat_span, lon + lon_span)
+        matches = []
+        for positions in self._cells(min_row, min_col, max_row, max_col):
+            for position in positions:
+                distance = haversine_miles(lat, lon, self.lats[position], self.lons[position])
+                if distance <= radius_miles:
+                    matches.append((self.codes[position], distance))
+        matches.sort(key=lambda match: match[1])
+        return matches
+
+class ZipSiteLocator:
+    """Resolve a zip code to its nearest Craigslist site and the sites around it"""
+
+    def __init__(self, zip_index, site_index):
+        self.zip_index = zip_index
+        self.site_index = site_index
+
+    @classmethod
+    def load(cls, zip_path=ZIP_CENTROIDS_PATH, site_path=SITE_CENTROIDS_PATH):
+        return cls(ZipIndex.from_csv(zip_path), SiteIndex.from_csv(site_path))
+
+    def locate(self, zip_code, radius=None, limit=MAX_NEARBY_SITES):
+        """Return (nearest_site, nearby_sites) for a zip code
+
+        nearby_sites lists (site, distance_miles) for the `limit` closest other
+        sites within `radius` miles of the zip centroid (capped at
+        MAX_RADIUS_MILES). Returns (None, []) for unknown zips.
+        """
+        centroid = self.zip_index.centroid(zip_code)
+        if centroid is None:
+            return None, []
+        nearest = self.site_index.nearest(*centroid)
+        if nearest is None:
+            return None, []
+        nearby = []
+        if radius:
+            nearby = [(site, round(distance, 1)) for site, distance in self.site_index.within(*centroid, radius)
+                      if site != nearest[0]][:limit]
+        return nearest[0], nearby
@@ -0,0 +1,67 @@
+"""
+In-process metrics for the /api/metrics endpoint
+
+Keeps counters and a bounded window of recent samples per metric name, so
+summaries (count, mean and percentiles) reflect current behaviour rather than
+everything since startup. Like the request caches, the numbers are per worker
+process.
+"""
+
+import threading
+from collections import deque
+
+SAMPLE_WINDOW = 1000
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class Metrics:
+    """Thread-safe counters and rolling sample windows"""
+
+    def __init__(self, window=SAMPLE_WINDOW):
+        self.window = window
+        self.counters = {}
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        """Add a sample to a metric's window"""
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(value)
+
+    def values(self, name):
+        """Recent samples for a metric, oldest first"""
+        with self.lock:
+            return list(self.samples.get(name, ()))
+
+    def summary(self, name):
+        values = sorted(self.values(name))
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "mean": round(sum(values) / len(values), 2),
+            "p50": percentile(values, 0.5),
+            "p95": percentile(values, 0.95),
+            "max": values[-1]
+        }
+
+    def snapshot(self):
+        """All counters and sample summaries as a JSON-friendly dict"""
+        with self.lock:
+            counters = dict(self.counters)
+            names = list(self.samples)
+        return {"counters": counters, "samples": {name: self.summary(name) for name in sorted(names)}}
+
+METRICS = Metrics()
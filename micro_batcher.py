@@ -0,0 +1,98 @@
+"""
+Micro-batching of concurrent Ollama requests
+
+A MicroBatcher collects items submitted within a short window (or until it
+has max_size of them) and hands them to run_batch in one call. A batch is
+only collected once one of the `concurrency` workers is free to run it. Each submitter
+gets a Future for its own result. If run_batch raises or returns the wrong
+number of results, every future in the batch fails with BatchFailed so the
+callers can fall back to individual requests.
+
+Batch sizes, queueing delay, batch call time and failures are recorded in
+metrics.METRICS under "batch.*".
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from metrics import METRICS
+
+class BatchFailed(Exception):
+    """Raised for every item of a batch that could not be answered as a batch"""
+
+class MicroBatcher:
+    """Group items that arrive close together into batch calls"""
+
+    def __init__(self, run_batch, window_ms=30, max_size=8, concurrency=2):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self.pending = queue.Queue()
+        # Batches run on a small pool so the next window fills while Ollama works
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="micro-batch")
+        # A batch is only collected once a worker is free to run it; until
+        # then new items wait in the queue and join the next batch
+        self.free_workers = threading.Semaphore(concurrency)
+        self.thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, item):
+        """Queue an item and return a Future for its result"""
+        future = Future()
+        self.pending.put((item, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        """Block for the first item, then gather more until the window closes or the batch is full"""
+        batch = [self.pending.get()]
+        closes = time.perf_counter() + self.window
+        while len(batch) < self.max_size:
+            remaining = closes - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self.free_workers.acquire()
+            self.executor.submit(self._dispatch, self._collect())
+
+    def _dispatch(self, batch):
+        try:
+            self._run_batch(batch)
+        finally:
+            self.free_workers.release()
+
+    def _run_batch(self, batch):
+        # Skip callers that gave up (cancelled or out of time) while queued
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        for _, _, queued in batch:
+            METRICS.observe("batch.wait_ms", round((started - queued) * 1000, 2))
+        METRICS.increment("batch.batches")
+        METRICS.increment("batch.items", len(batch))
+        METRICS.observe("batch.size", len(batch))
+
+        try:
+            results = self.run_batch([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"expected {len(batch)} results, got {len(results)}")
+        except Exception as e:
+            METRICS.increment("batch.failures")
+            for _, future, _ in batch:
+                future.set_exception(BatchFailed(str(e)))
+            return
+        finally:
+            METRICS.observe("batch.call_ms", round((time.perf_counter() - started) * 1000, 2))
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
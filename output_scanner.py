@@ -0,0 +1,180 @@
+"""
+Linear-time scanning of raw model output
+
+The model's answer is normally one JSON object, sometimes wrapped in prose or
+cut off by num_predict. find_json_object() locates the first complete object
+in a single pass that skips over string literals and tracks brace depth,
+instead of a nested regex, and says where it ends.
+
+When the answer has no JSON at all, extract_partial_response() mines item
+names from the prose. The phrase patterns it used to run with re.findall
+(runs of capitalized words, optionally ending in a product word) backtracked
+over every word of a run from every starting word, which grew quadratically
+with the length of the output. product_phrases() and capitalized_phrases()
+find the same phrases from one tokenizing pass, using per-run lookup tables
+instead of backtracking.
+
+Callers cap the text at MAX_OUTPUT_CHARS first, so the worst case is bounded
+as well as linear.
+"""
+
+import functools
+import json
+import re
+
+# About twice what num_predict=1000 produces; longer output is rambling
+MAX_OUTPUT_CHARS = 8000
+# Deeper nesting than any answer uses; keeps json.loads far from its recursion limit
+MAX_JSON_DEPTH = 32
+
+JSON_DELIMITER = re.compile(r'[{}"]')
+# Rest of a JSON string after its opening quote; the alternatives can't overlap, so no backtracking
+JSON_STRING_REST = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+# A JSON object opens with a key or closes at once; anything else ("{a}") is not worth parsing
+JSON_OBJECT_START = re.compile(r'\{\s*["}]')
+
+# "Recommendations: a, b and c." style lists
+LABELLED_LIST_PATTERNS = [
+    re.compile(r'recommendations?[:\s]+([^.]+)', re.IGNORECASE),
+    re.compile(r'items?[:\s]+([^.]+)', re.IGNORECASE),
+    re.compile(r'suggested[:\s]+([^.]+)', re.IGNORECASE),
+    re.compile(r'popular[:\s]+([^.]+)', re.IGNORECASE),
+]
+
+PRODUCT_WORDS = ("monitor", "tv", "laptop", "car", "phone", "furniture", "apartment", "house", "job")
+PRODUCT_PREFIX = {
+    False: re.compile("|".join(PRODUCT_WORDS)),
+    True: re.compile("|".join(PRODUCT_WORDS), re.IGNORECASE),
+}
+
+WORD = re.compile(r'[A-Za-z][A-Za-z0-9]*')
+# (first word of a phrase, any later word) for case-sensitive and case-insensitive matching
+WORD_FORMS = {
+    False: (re.compile(r'[A-Z][a-z]+'), re.compile(r'[A-Z][a-z0-9]+')),
+    True: (re.compile(r'[A-Za-z]{2,}'), re.compile(r'[A-Za-z][A-Za-z0-9]+')),
+}
+
+def find_json_object(text):
+    """Return (first complete JSON object in text as a dict, offset just past it), or (None, None)
+
+    Quotes outside an object are prose and ignored. An object that doesn't
+    parse, or nests deeper than MAX_JSON_DEPTH, is skipped and the scan goes on
+    after it. A brace that never closes ("Use a { brace. {...}") would swallow
+    everything after it, so when the text ends inside an object the scan
+    starts again just past that brace, at most MAX_JSON_DEPTH times.
+    """
+    position, depth, start, restarts = 0, 0, None, 0
+    while True:
+        match = JSON_DELIMITER.search(text, position)
+        if match is not None and match.group() == '"' and depth:
+            string_end = JSON_STRING_REST.match(text, match.end())
+            if string_end is not None:
+                position = string_end.end()
+                continue
+            match = None  # The string never closes, so neither does the object
+        if match is None:
+            if not depth or restarts >= MAX_JSON_DEPTH:
+                return None, None
+            position, depth, start, restarts = start + 1, 0, None, restarts + 1
+            continue
+        delimiter, position = match.group(), match.end()
+        if delimiter == '{':
+            if depth == 0:
+                start = match.start()
+            depth += 1
+            if depth > MAX_JSON_DEPTH:
+                depth, start = 0, None
+        elif delimiter == '}' and depth:
+            depth -= 1
+            if depth == 0 and JSON_OBJECT_START.match(text, start):
+                try:
+                    parsed = json.loads(text[start:position])
+                except ValueError:
+                    parsed = None
+                if isinstance(parsed, dict):
+                    return parsed, position
+
+def word_runs(text):
+    """Lists of two or more word matches separated only by whitespace, in order"""
+    runs, run, previous_end = [], [], None
+    for match in WORD.finditer(text):
+        if run and not text[previous_end:match.start()].isspace():
+            if len(run) > 1:
+                runs.append(run)
+            run = []
+        run.append(match)
+        previous_end = match.end()
+    if len(run) > 1:
+        runs.append(run)
+    return runs
+
+def _run_tables(run, ignore_case):
+    """Per-word lookup tables for one run
+
+    is_first[i]: the word can start a phrase
+    continues_to[i]: index of the first word at or after i that can't continue a phrase
+    last_first[i]: largest index <= i of a word that can start a phrase, or -1
+    """
+    first_form, later_form = WORD_FORMS[ignore_case]
+    is_first = [first_form.fullmatch(word.group()) is not None for word in run]
+    continues_to = [len(run)] * (len(run) + 1)
+    for i in range(len(run) - 1, -1, -1):
+        continues_to[i] = continues_to[i + 1] if later_form.fullmatch(run[i].group()) else i
+    last_first, latest = [], -1
+    for i, first in enumerate(is_first):
+        latest = i if first else latest
+        last_first.append(latest)
+    return is_first, continues_to, last_first
+
+# extract_partial_response() runs product_phrases() and capitalized_phrases() over the same text
+@functools.lru_cache(maxsize=8)
+def _tabled_runs(text, ignore_case):
+    return [(run, *_run_tables(run, ignore_case)) for run in word_runs(text)]
+
+def product_phrases(text, ignore_case=False):
+    """Capitalized words ending in a product word: "Dell Ultrasharp monitor"
+
+    Finds what re.findall() of
+    [A-Z][a-z]+(?:\\s+[A-Z][a-z0-9]+)*\\s+(?:monitor|tv|...) would, except
+    that phrases start at a word start (the pattern can start at "Book" inside
+    "MacBook"). Each phrase runs to the last product word it can reach.
+    """
+    phrases = []
+    for run, is_first, continues_to, _ in _tabled_runs(text, ignore_case):
+        # Length of the product word each word starts with ("monitors" -> 7), or 0
+        product_prefix = PRODUCT_PREFIX[ignore_case].match
+        products = [len(prefix.group()) if prefix else 0
+                    for prefix in (product_prefix(word.group()) for word in run)]
+        last_product, latest = [], -1
+        for i, product in enumerate(products):
+            latest = i if product else latest
+            last_product.append(latest)
+
+        i = 0
+        while i < len(run) - 1:
+            end = last_product[min(continues_to[i + 1], len(run) - 1)] if is_first[i] else -1
+            if end > i:
+                phrases.append(text[run[i].start():run[end].start() + products[end]])
+                i = end + 1
+            else:
+                i += 1
+    return phrases
+
+def capitalized_phrases(text, ignore_case=False):
+    """Runs of two or more capitalized words: "Honda Civic", "Sony Bravia X90"
+
+    Finds what re.findall() of
+    [A-Z][a-z]+(?:\\s+[A-Z][a-z0-9]+)*\\s+[A-Z][a-z]+(?:\\s+[A-Z][a-z0-9]+)*
+    would, except that phrases start and end at word boundaries.
+    """
+    phrases = []
+    for run, is_first, continues_to, last_first in _tabled_runs(text, ignore_case):
+        i = 0
+        while i < len(run) - 1:
+            end = continues_to[i + 1]
+            if is_first[i] and end > i + 1 and last_first[end - 1] > i:
+                phrases.append(text[run[i].start():run[end - 1].end()])
+                i = end
+            else:
+                i += 1
+    return phrases
@@ -0,0 +1,112 @@
+"""
+Refinement sessions for /api/refine
+
+A session remembers the last query of a conversation-style search, its
+extracted filters and the AI answer. When the next edit only changes things
+the deterministic extractors handle (price, zip code, radius, city or vehicle
+parameters), the links are rebuilt from the stored answer and Ollama is not
+called. Whether the item itself changed is decided from the query's intent
+words: what is left after removing numbers, filter vocabulary, filler words
+and Craigslist site names.
+
+Sessions are kept in a bounded in-process LRU, so like request cancellation
+they only reach requests handled by the same worker.
+"""
+
+import re
+import time
+import uuid
+
+from response_cache import LRUCache
+from site_catalog import get_matcher, query_words
+
+# Words that only ever express filters handled by the regex extractors, or
+# carry no item meaning in a refinement ("make it under 8000 instead")
+FILTER_WORDS = frozenset("""
+    under over below above less more than max maximum min minimum budget price prices cost dollar dollars
+    between from to and or up around about at most least cheaper lower higher
+    within miles mile mi radius of near nearby zip code postal area in
+    newer older after before year years model
+    automatic manual transmission stick
+    clean title titles salvage rebuilt parts missing search only hide duplicates no unique
+    fwd rwd awd 4wd front rear all four wheel drive
+    sedan suv coupe convertible wagon hatchback van pickup
+    gas gasoline petrol diesel hybrid electric ev cylinder cylinders cyl
+    black blue brown green grey gray orange purple red white silver yellow custom color colour paint
+    a an the for with without in on my me i im want need looking find show just instead actually
+    now please make it change set limit same but also then let lets try one ones any used
+""".split())
+
+_NUMERIC_WORD = re.compile(r"^(?:\d[\d,.]*k?|v\d+|\d+(?:k|mi|cyl|s))$")
+
+def intent_words(text):
+    """The words of a query that describe the item rather than its filters"""
+    words = query_words(text)
+    # Drop city and state names, which only pick the Craigslist site
+    matcher = get_matcher()
+    for _ in range(3):
+        span = matcher.find_site_span(words)
+        if span is None:
+            break
+        _, start, length = span
+        words = words[:start] + words[start + length:]
+    return [word for word in words if word not in FILTER_WORDS and not _NUMERIC_WORD.match(word)]
+
+def intent_signature(text):
+    """Order-insensitive signature of a query's item intent"""
+    return " ".join(sorted(set(intent_words(text))))
+
+def merge_filters(previous, update, item_changed=True):
+    """Apply the filters found in a refinement on top of the session's filters
+
+    City and nearby sites depend on the merged zip code and radius, so the
+    caller resolves them afterwards. The category is only taken from the
+    refinement when it names a different item (item_changed); the classifier's
+    guess for "hide duplicates" says nothing about the search.
+    """
+    merged = dict(previous)
+    for key, value in update.items():
+        if key in ("city", "nearby_cities") or (key == "category" and not item_changed):
+            continue
+        if key == "vehicle_params":
+            merged[key] = {**previous[key], **{name: value for name, value in value.items() if value}}
+        elif value is not None:
+            merged[key] = value
+    return merged
+
+def changed_filters(previous, current):
+    """Names of the filters that differ between two filter dicts"""
+    changed = [key for key in current if key != "vehicle_params" and previous.get(key) != current[key]]
+    previous_vehicle = previous.get("vehicle_params", {})
+    changed.extend(f"vehicle_params.{name}" for name, value in current.get("vehicle_params", {}).items()
+                   if previous_vehicle.get(name) != value)
+    return changed
+
+class RefinementSessions:
+    """Bounded store of refinement sessions with an idle timeout"""
+
+    def __init__(self, max_sessions=10000, ttl_seconds=1800):
+        self.sessions = LRUCache(max_sessions)
+        self.ttl = ttl_seconds
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def get(self, session_id):
+        if not session_id:
+            return None
+        session = self.sessions.get(session_id)
+        if session is None or time.monotonic() - session["updated"] > self.ttl:
+            return None
+        return session
+
+    def save(self, session_id, query, filters, answer, intent, degraded):
+        self.sessions.put(session_id, {
+            "query": query,
+            "filters": filters,
+            "answer": answer,
+            "intent": intent,
+            "degraded": degraded,
+            "updated": time.monotonic()
+        })
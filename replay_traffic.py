@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Replay captured generate-link traffic for load testing
+
+Reads capture files written when TRAFFIC_CAPTURE_DIR is set and re-sends the
+requests with their original spacing, optionally sped up or slowed down.
+
+Two modes:
+- http (default) sends each request to a running app, with its original
+  method and deadline.
+- pipeline runs the extraction, parsing and link-building stages in-process.
+  The LLM is replaced by a stub that returns the recorded Ollama response, so
+  the results are deterministic and no Ollama server is needed.
+
+Usage:
+    python replay_traffic.py captures/ --target http://localhost:5000
+    python replay_traffic.py captures/ --speed 4
+    python replay_traffic.py captures/ --pipeline --speed 0
+"""
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from metrics import percentile
+from traffic_capture import read_captures
+
+class HttpReplayer:
+    """Send captured requests to a running app"""
+
+    def __init__(self, target, timeout):
+        self.url = f"{target.rstrip('/')}/api/generate-link"
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def __call__(self, entry):
+        headers = {}
+        if entry.get("deadline_ms") is not None:
+            headers['X-Deadline-Ms'] = str(entry["deadline_ms"])
+        if entry.get("method") == 'GET':
+            response = self.session().get(self.url, params={'q': entry["query"]}, headers=headers,
+                                          timeout=self.timeout)
+        else:
+            response = self.session().post(self.url, json={'query': entry["query"]}, headers=headers,
+                                           timeout=self.timeout)
+        return response.status_code
+
+class PipelineReplayer:
+    """Run the in-process pipeline with recorded Ollama responses"""
+
+    def __init__(self, entries, llm_latency):
+        import app
+        self.app = app
+        self.llm_latency = llm_latency
+        # Cache hits and failed requests have no response of their own, so
+        # answer them with one recorded for the same query
+        self.responses = {}
+        for entry in entries:
+            if entry.get("raw_response") is not None and not entry.get("degraded"):
+                self.responses.setdefault(app.normalize_query(entry["query"]), entry["raw_response"])
+
+    def stub_llm(self, entry):
+        """Stand-in for query_ollama: the recorded answer, after the recorded delay if asked"""
+        if self.llm_latency:
+            time.sleep(entry.get("stages", {}).get("ollama_ms", 0) / 1000)
+        raw_response = entry.get("raw_response")
+        if raw_response is None:
+            raw_response = self.responses.get(self.app.normalize_query(entry["query"]))
+        return raw_response
+
+    def __call__(self, entry):
+        app = self.app
+        user_query = entry["query"]
+        filters = app.extract_query_filters(user_query)
+        if entry.get("vehicle_catalog"):
+            app.build_link_result(user_query, filters, app.vehicle_catalog_answer(user_query, filters))
+            return 200
+        raw_response = self.stub_llm(entry)
+        if raw_response is None:
+            return 'no-response'
+        if entry.get("degraded"):
+            parsed_response = app.build_degraded_response(raw_response, filters["category"])
+            app.build_link_result(user_query, filters, parsed_response, degraded=True)
+        else:
+            parsed_response = app.parse_ai_response(raw_response, filters["category"])
+            app.build_link_result(user_query, filters, parsed_response)
+        return 200
+
+def run(args):
+    entries = [entry for entry in read_captures(args.captures) if entry.get("query")]
+    entries.sort(key=lambda entry: entry["ts"])
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        print("No captured requests found", file=sys.stderr)
+        return 1
+
+    if args.pipeline:
+        replay = PipelineReplayer(entries, args.llm_latency)
+    else:
+        replay = HttpReplayer(args.target, args.timeout)
+
+    latencies = []
+    statuses = {}
+    lags = []
+    # Scheduled send time to actual start: time spent waiting for one of the
+    # --concurrency threads, which the latencies alone would hide
+    queue_delays = []
+    lock = threading.Lock()
+
+    def send(entry, due):
+        started = time.perf_counter()
+        try:
+            status = replay(entry)
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            queue_delays.append(max(0.0, started - due) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    first_ts = entries[0]["ts"]
+    print(f"Replaying {len(entries)} requests spanning {entries[-1]['ts'] - first_ts:.1f}s "
+          f"{'without pacing' if args.speed <= 0 else f'at {args.speed:g}x speed'}", file=sys.stderr)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for entry in entries:
+            due = time.perf_counter()
+            if args.speed > 0:
+                due = started + (entry["ts"] - first_ts) / args.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                lags.append(max(0.0, -delay) * 1000)
+            executor.submit(send, entry, due)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    lags.sort()
+    queue_delays.sort()
+    print(f"Sent {len(entries)} requests in {elapsed:.2f}s ({len(entries) / elapsed:.1f} req/s)")
+    print(f"Latency ms: p50 {percentile(latencies, 0.5):.1f}  p90 {percentile(latencies, 0.9):.1f}  "
+          f"p99 {percentile(latencies, 0.99):.1f}  max {latencies[-1]:.1f}")
+    if lags:
+        print(f"Schedule lag ms: p50 {percentile(lags, 0.5):.1f}  p99 {percentile(lags, 0.99):.1f}")
+    print(f"Queueing ms (scheduled send to start): p50 {percentile(queue_delays, 0.5):.1f}  "
+          f"p99 {percentile(queue_delays, 0.99):.1f}  max {queue_delays[-1]:.1f}")
+    if args.speed > 0 and queue_delays[-1] > 100:
+        print(f"Requests waited for a free thread; raise --concurrency (now {args.concurrency}) "
+              f"to replay the original arrival times", file=sys.stderr)
+    print("Results: " + ", ".join(f"{status}: {count}" for status, count in
+                                  sorted(statuses.items(), key=lambda item: str(item[0]))))
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured generate-link traffic")
+    parser.add_argument('captures', nargs='+', help="capture files or directories")
+    parser.add_argument('--target', default='http://localhost:5000',
+                        help="base URL of the app to replay against (http mode)")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="run the in-process pipeline with recorded Ollama responses instead of HTTP")
+    parser.add_argument('--llm-latency', action='store_true',
+                        help="in pipeline mode, make the stub LLM wait as long as Ollama originally did")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="replay rate relative to the original traffic (2 = twice as fast, 0 = no pacing)")
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help="maximum number of requests in flight; requests beyond it queue, "
+                             "which shows up as queueing time")
+    parser.add_argument('--limit', type=int, help="replay only the first N requests")
+    parser.add_argument('--timeout', type=float, default=130.0, help="HTTP timeout in seconds")
+    return run(parser.parse_args())
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+HTTP caching helpers for generate-link responses
+
+Holds serialized results in a bounded in-process LRU keyed on the normalized
+query, derives strong ETags from the body and the model version, and gzip or
+brotli compresses bodies once per cache entry instead of once per response.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+def normalize_query(query):
+    """Normalize a query so trivially different spellings share a cache entry"""
+    return " ".join(query.lower().split())
+
+class LRUCache:
+    """Thread-safe, size-bounded least-recently-used cache"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+def compute_etag(body, model_version):
+    """Strong ETag for a response body produced by a given model version"""
+    digest = hashlib.sha256(model_version.encode('utf-8') + b"\0" + body).hexdigest()
+    return f'"{digest[:32]}"'
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header value against our ETag"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def choose_encoding(accept_encoding):
+    """Pick the best content coding we support from an Accept-Encoding header"""
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    if brotli is not None and offered.get('br', 0) > 0:
+        return 'br'
+    if offered.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+def compress(body, encoding):
+    """Compress a body with the given content coding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+class CachedResponse:
+    """A serialized result with its ETag and lazily built compressed variants"""
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+        self.variants = {None: body}
+        self.shapes = {}    # (query text, (fields, compact) or None) -> CachedResponse of that variant
+
+    def encoded(self, encoding):
+        """Return the body in the given coding, compressing it only once"""
+        variant = self.variants.get(encoding)
+        if variant is None:
+            variant = compress(self.body, encoding)
+            self.variants[encoding] = variant
+        return variant
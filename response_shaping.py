@@ -0,0 +1,85 @@
+"""
+Field selection, compact mode and fast serialization for generate-link results
+
+Clients can trim a result to the fields they use (fields=craigslist_links,city)
+and ask for a compact form that leaves out empty and default values: null
+prices, unset and false vehicle parameters, empty lists, "degraded": false, and the
+recommendations list, whose items are repeated in craigslist_links (unless it
+was selected explicitly).
+
+Results are serialized with orjson when it is installed, and otherwise with
+the standard library encoder.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the json module is always available
+    orjson = None
+
+# Every top-level field a generate-link or refine result can have
+RESULT_FIELDS = (
+    "success", "query", "recommendations", "explanation", "craigslist_links", "city",
+    "nearby_cities", "nearby_links", "category", "min_price", "max_price", "zip_code",
+    "radius", "vehicle_params", "degraded", "session_id", "llm_skipped", "changed_filters",
+)
+
+def dumps(obj):
+    """Serialize to compact JSON bytes
+
+    orjson refuses integers beyond 64 bits (an LLM price like 99999999999999999999);
+    those results go through the json module instead.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+def parse_fields(value):
+    """Turn a fields selector (comma-separated string or list) into a tuple, or None for all fields
+
+    Raises ValueError naming any field a result never has, or for any other
+    kind of value.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    elif not isinstance(value, list):
+        raise ValueError("fields must be a comma-separated string or a list of field names")
+    fields = tuple(dict.fromkeys(str(field).strip() for field in value if str(field).strip()))
+    unknown = [field for field in fields if field not in RESULT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields or None
+
+def parse_flag(value):
+    """Interpret a boolean request parameter"""
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+def is_empty(value):
+    return value is None or value == "" or value == [] or value == {}
+
+def shape_result(result, fields=None, compact=False):
+    """Select fields from a result and optionally drop empty and default values"""
+    if fields is not None:
+        result = {key: value for key, value in result.items() if key in fields}
+    if not compact:
+        return result
+
+    shaped = {}
+    for key, value in result.items():
+        if key == "vehicle_params" and value:
+            value = {name: param for name, param in value.items() if param is not None and param is not False}
+        elif key == "recommendations" and fields is None and result.get("craigslist_links"):
+            continue
+        elif key == "degraded" and value is False:
+            continue
+        if not is_empty(value):
+            shaped[key] = value
+    return shaped
@@ -0,0 +1,189 @@
+"""
+Craigslist site catalog and city matcher
+
+The full list of Craigslist sites, with their aliases and states, lives in the
+versioned data/craigslist_sites.json. On first use it is compiled into a
+phrase table (normalized alias -> site code) that find_site() scans with a
+longest-match lookup over the query's words. The compiled table is cached to
+disk keyed on the catalog's content hash, so later processes skip the build.
+
+Some aliases and state names are also vehicle models ("Tacoma", "Tucson",
+"Colorado", "Santa Fe") or everyday words ("Bend", "Buffalo"). Those only
+count as a place right after a locative word: "couch in tacoma" searches
+Seattle, "toyota tacoma" doesn't.
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import re
+import threading
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+CATALOG_PATH = os.path.join(DATA_DIR, 'craigslist_sites.json')
+VEHICLE_CATALOG_PATH = os.path.join(DATA_DIR, 'vehicle_catalog.json')
+CACHE_DIR = os.getenv('CRAIGSLINK_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'craigslink'))
+
+# Bump when the compiled format changes so stale caches are rebuilt
+MATCHER_FORMAT = 2
+
+# Alias kinds, strongest first
+SITE_ALIAS = 0
+STATE_NAME = 1
+
+# Place names that are also vehicle models missing from the vehicle catalog,
+# or everyday words; like the catalog's makes and models, they need a
+# locative word in front
+AMBIGUOUS_PLACE_NAMES = frozenset("""
+    aspen bend buffalo butte canton carmel dakota durango hollywood kona lacrosse malibu mesa montana
+    parma phoenix pueblo savannah sedona sierra tahoe vail yukon
+""".split())
+
+# Words that make the next words a place
+LOCATIVE_WORDS = frozenset(["in", "near", "around", "at"])
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+def normalize_phrase(text):
+    """Lowercase and reduce text to space-separated words"""
+    return " ".join(_WORD_PATTERN.findall(text.lower().replace("'", "")))
+
+def query_words(query):
+    """Split a query into the normalized words the matcher works on"""
+    return _WORD_PATTERN.findall(query.lower().replace("'", ""))
+
+class SiteMatcher:
+    """Precomputed alias table for finding Craigslist sites named in a query"""
+
+    def __init__(self, version, phrases, max_words, sites):
+        self.version = version
+        self.phrases = phrases      # normalized phrase -> (site code, alias kind, needs a locative word)
+        self.max_words = max_words
+        self.sites = sites          # site code -> (name, state)
+        self.first_words = frozenset(phrase.split(" ", 1)[0] for phrase in phrases)
+
+    @classmethod
+    def build(cls, catalog, vehicle_catalog=None):
+        """Compile a catalog dict into a matcher
+
+        The makes, models and aliases of vehicle_catalog are treated as
+        ambiguous place names.
+        """
+        phrases = {}
+        ambiguous = AMBIGUOUS_PLACE_NAMES | vehicle_names(vehicle_catalog or {"makes": []})
+
+        def add(phrase, code, kind):
+            phrase = normalize_phrase(phrase)
+            # Earlier entries in the catalog win on conflicts
+            if phrase and phrase not in phrases:
+                phrases[phrase] = (code, kind, phrase in ambiguous)
+
+        sites = {}
+        for site in catalog["sites"]:
+            code, state = site["code"], site["state"]
+            sites[code] = (site["name"], state)
+            for alias in site.get("aliases", []):
+                add(alias, code, SITE_ALIAS)
+        for site in catalog["sites"]:
+            # "portland or", "springfield il" and similar qualified forms.
+            # Bare site names are only matched this way since many of them
+            # ("Lincoln", "Mobile", "Reading") are also everyday words.
+            for alias in [site["name"], *site.get("aliases", [])]:
+                add(f"{alias} {site['state']}", site["code"], SITE_ALIAS)
+        for state in catalog.get("states", {}).values():
+            add(state["name"], state["default_site"], STATE_NAME)
+
+        max_words = max(len(phrase.split()) for phrase in phrases)
+        return cls(catalog["version"], phrases, max_words, sites)
+
+    def find_site(self, query):
+        """Return the site code named in the query, or None
+
+        The longest matching alias wins, then site names over state names, then
+        the earliest position in the query. Ambiguous names only match after
+        a locative word.
+        """
+        match = self.find_site_span(query_words(query))
+        return match[0] if match else None
+
+    def find_site_span(self, words):
+        """Return (site code, first word index, word count) for the best match in a word list, or None"""
+        phrases = self.phrases
+        best = None
+        first_words = self.first_words
+        for start in range(len(words)):
+            if words[start] not in first_words:
+                continue
+            for length in range(min(self.max_words, len(words) - start), 0, -1):
+                match = phrases.get(" ".join(words[start:start + length]))
+                if match is None:
+                    continue
+                if match[2] and (start == 0 or words[start - 1] not in LOCATIVE_WORDS):
+                    # "toyota tacoma": try the shorter phrases at this position
+                    continue
+                rank = (-length, match[1], start)
+                if best is None or rank < best[0]:
+                    best = (rank, match[0])
+                break
+        if best is None:
+            return None
+        (negative_length, _, start), code = best
+        return code, start, -negative_length
+
+def vehicle_names(vehicle_catalog):
+    """Normalized make and model names and aliases of a vehicle catalog dict"""
+    names = set()
+    for make in vehicle_catalog["makes"]:
+        names.update(normalize_phrase(name) for name in [make["make"], *make.get("aliases", [])])
+        for model in make["models"]:
+            names.update(normalize_phrase(name) for name in [model["name"], *model.get("aliases", [])])
+    return names
+
+def _catalog_digest(raw):
+    return hashlib.sha256(raw + f"format={MATCHER_FORMAT}".encode()).hexdigest()[:16]
+
+def load_matcher(catalog_path=CATALOG_PATH, cache_dir=CACHE_DIR, vehicle_catalog_path=VEHICLE_CATALOG_PATH):
+    """Load the compiled matcher from the disk cache, building it if needed"""
+    with open(catalog_path, 'rb') as f:
+        raw = f.read()
+    try:
+        with open(vehicle_catalog_path, 'rb') as f:
+            vehicle_raw = f.read()
+    except OSError:
+        vehicle_raw = b'{"makes": []}'
+    cache_path = os.path.join(cache_dir, f"site_matcher_{_catalog_digest(raw + vehicle_raw)}.marshal")
+
+    try:
+        with open(cache_path, 'rb') as f:
+            return SiteMatcher(*marshal.loads(f.read()))
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    matcher = SiteMatcher.build(json.loads(raw), json.loads(vehicle_raw))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(marshal.dumps((matcher.version, matcher.phrases, matcher.max_words, matcher.sites)))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # A read-only cache dir only costs the build on the next start
+        pass
+    return matcher
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+def get_matcher():
+    """Return the process-wide matcher, loading it on first use"""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = load_matcher()
+    return _matcher
+
+def find_site(query):
+    """Return the Craigslist site code named in the query, or None"""
+    return get_matcher().find_site(query)
@@ -28,6 +28,10 @@ if [ ! -d "venv" ] && [ ! -d ".venv" ]; then
     pip3 install -r requirements.txt
 fi
 
+# Build fingerprinted, precompressed static assets
+echo "🗜️  Building static assets..."
+python3 build_assets.py
+
 # Start the application
 echo "🌟 Starting Flask application..."
 echo "🌐 Open your browser to: http://localhost:5000"
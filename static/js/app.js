@@ -14,14 +14,29 @@ const retryBtn = document.getElementById('retryBtn');
 const exampleTags = document.querySelectorAll('.example-tag');
 const themeToggle = document.getElementById('themeToggle');
 const themeIcon = document.getElementById('themeIcon');
+const parsePreview = document.getElementById('parsePreview');
+const parseDetails = document.getElementById('parseDetails');
+const parseLink = document.getElementById('parseLink');
 
 // State
 let currentQuery = '';
 let currentTheme = localStorage.getItem('theme') || 'light';
+let activeRequest = null;    // { controller, requestId, key } for the request in flight
+let submitTimer = null;
+let parseTimer = null;
+let activeParse = null;       // AbortController for the preview request in flight
+
+// Request tuning
+const SUBMIT_DEBOUNCE_MS = 250;
+const RESULT_CACHE_STORAGE_KEY = 'craigslinkResultCache';
+const RESULT_CACHE_TTL_MS = 30 * 60 * 1000;  // 30 minutes
+const RESULT_CACHE_MAX_ENTRIES = 50;
+const PARSE_DEBOUNCE_MS = 120;
 
 // Event listeners
 generateBtn.addEventListener('click', handleGenerateClick);
 userQueryInput.addEventListener('keydown', handleKeyDown);
+userQueryInput.addEventListener('input', handleQueryInput);
 copyBtn.addEventListener('click', handleCopyClick);
 retryBtn.addEventListener('click', handleRetryClick);
 themeToggle.addEventListener('click', toggleTheme);
@@ -32,6 +47,7 @@ exampleTags.forEach(tag => {
         const example = tag.getAttribute('data-example');
         userQueryInput.value = example;
         userQueryInput.focus();
+        handleQueryInput();
     });
 });
 
@@ -45,7 +61,10 @@ async function handleGenerateClick() {
     }
     
     currentQuery = query;
-    await generateCraigslistLink(query);
+    
+    // Collapse rapid resubmits into a single request
+    clearTimeout(submitTimer);
+    submitTimer = setTimeout(() => generateCraigslistLink(query), SUBMIT_DEBOUNCE_MS);
 }
 
 // Handle Enter key in textarea
@@ -56,6 +75,84 @@ function handleKeyDown(event) {
     }
 }
 
+// Preview the detected filters while the user types
+function handleQueryInput() {
+    clearTimeout(parseTimer);
+    const query = userQueryInput.value.trim();
+    if (!query) {
+        cancelActiveParse();
+        parsePreview.classList.add('hidden');
+        return;
+    }
+    parseTimer = setTimeout(() => previewQuery(query), PARSE_DEBOUNCE_MS);
+}
+
+function cancelActiveParse() {
+    if (activeParse) {
+        activeParse.abort();
+        activeParse = null;
+    }
+}
+
+// Ask the server which filters it finds in the query; no AI involved, so this is instant
+async function previewQuery(query) {
+    cancelActiveParse();
+    const controller = new AbortController();
+    activeParse = controller;
+    
+    try {
+        const response = await fetch(`/api/parse?q=${encodeURIComponent(query)}`, { signal: controller.signal });
+        if (!response.ok) return;
+        const data = await response.json();
+        if (activeParse === controller) {
+            displayPreview(data);
+        }
+    } catch (error) {
+        // Superseded by newer input, or the preview is unavailable - either way nothing to show
+    } finally {
+        if (activeParse === controller) {
+            activeParse = null;
+        }
+    }
+}
+
+function displayPreview(data) {
+    parseDetails.innerHTML = '';
+    
+    const details = describeSearch(data);
+    if (data.category && data.category !== 'sss') {
+        details.unshift(`Category: ${data.category.toUpperCase()}`);
+    }
+    details.push(...describeVehicleParams(data.vehicle_params));
+    
+    details.forEach(detail => {
+        const detailElement = document.createElement('span');
+        detailElement.className = 'search-detail-item';
+        detailElement.textContent = detail;
+        parseDetails.appendChild(detailElement);
+    });
+    
+    parseLink.href = data.link;
+    parsePreview.classList.remove('hidden');
+}
+
+// Short labels for the vehicle filters worth showing while typing
+function describeVehicleParams(params) {
+    if (!params) return [];
+    
+    const details = [];
+    if (params.min_year || params.max_year) {
+        details.push(`Years: ${params.min_year || 'any'} - ${params.max_year || 'any'}`);
+    }
+    if (params.max_miles) {
+        details.push(`Under ${params.max_miles.toLocaleString()} miles`);
+    }
+    if (params.search_titles_only) {
+        details.push('Titles only');
+    }
+    return details;
+}
+
 // Handle copy button click
 async function handleCopyClick() {
     try {
@@ -100,23 +197,112 @@ function handleRetryClick() {
     userQueryInput.focus();
 }
 
+// Cache key for a query, so whitespace and case changes reuse results
+function normalizeQuery(query) {
+    return query.toLowerCase().replace(/\s+/g, ' ').trim();
+}
+
+// Read the result cache from localStorage, dropping expired entries
+function loadResultCache() {
+    try {
+        const cache = JSON.parse(localStorage.getItem(RESULT_CACHE_STORAGE_KEY)) || {};
+        const now = Date.now();
+        Object.keys(cache).forEach(key => {
+            if (now - cache[key].storedAt > RESULT_CACHE_TTL_MS) {
+                delete cache[key];
+            }
+        });
+        return cache;
+    } catch (err) {
+        return {};
+    }
+}
+
+function getCachedResult(key) {
+    const entry = loadResultCache()[key];
+    return entry ? entry.data : null;
+}
+
+function storeCachedResult(key, data) {
+    const cache = loadResultCache();
+    cache[key] = { data, storedAt: Date.now() };
+    
+    // Evict the oldest entries beyond the size bound
+    const keys = Object.keys(cache).sort((a, b) => cache[a].storedAt - cache[b].storedAt);
+    keys.slice(0, Math.max(0, keys.length - RESULT_CACHE_MAX_ENTRIES)).forEach(oldKey => delete cache[oldKey]);
+    
+    try {
+        localStorage.setItem(RESULT_CACHE_STORAGE_KEY, JSON.stringify(cache));
+    } catch (err) {
+        // Storage full or disabled - caching is best effort
+        console.warn('Could not cache result:', err);
+    }
+}
+
+function createRequestId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+}
+
+// Abort the request in flight and tell the server to stop its Ollama call
+function cancelActiveRequest() {
+    if (!activeRequest) return;
+    
+    const { controller, requestId } = activeRequest;
+    activeRequest = null;
+    controller.abort();
+    
+    const payload = JSON.stringify({ request_id: requestId });
+    if (navigator.sendBeacon) {
+        navigator.sendBeacon('/api/cancel', new Blob([payload], { type: 'application/json' }));
+    } else {
+        fetch('/api/cancel', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: payload,
+            keepalive: true
+        }).catch(() => {});
+    }
+}
+
 // Main function to generate Craigslist link
 async function generateCraigslistLink(query) {
+    const key = normalizeQuery(query);
+    
+    // Same query already on its way - let it finish
+    if (activeRequest && activeRequest.key === key) {
+        return;
+    }
+    
+    const cached = getCachedResult(key);
+    if (cached) {
+        cancelActiveRequest();
+        displayResults(cached);
+        return;
+    }
+    
+    // A new query supersedes whatever is still running
+    cancelActiveRequest();
+    
+    const request = { controller: new AbortController(), requestId: createRequestId(), key };
+    activeRequest = request;
+    
     try {
         // Show loading state
         hideAllCards();
         showLoadingCard();
         
-        // Disable generate button
-        generateBtn.disabled = true;
-        
         // Make API call
         const response = await fetch('/api/generate-link', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'X-Request-ID': request.requestId
             },
-            body: JSON.stringify({ query })
+            body: JSON.stringify({ query }),
+            signal: request.controller.signal
         });
         
         const data = await response.json();
@@ -129,18 +315,36 @@ async function generateCraigslistLink(query) {
             throw new Error(data.error || 'Unknown error occurred');
         }
         
+        // Partial results from a missed deadline are worth retrying later
+        if (!data.degraded) {
+            storeCachedResult(key, data);
+        }
+        
+        // A newer query (or a cached result) took over while this one finished
+        if (activeRequest !== request) {
+            return;
+        }
+        
         // Display results
         displayResults(data);
         
     } catch (error) {
+        // Superseded requests are expected, not errors
+        if (error.name === 'AbortError' || activeRequest !== request) {
+            return;
+        }
         console.error('Error:', error);
         showError(error.message || 'An unexpected error occurred. Please try again.');
     } finally {
-        // Re-enable generate button
-        generateBtn.disabled = false;
+        if (activeRequest === request) {
+            activeRequest = null;
+        }
     }
 }
 
+// Stop any running request when the user leaves the page
+window.addEventListener('pagehide', cancelActiveRequest);
+
 // Display results in the UI
 function displayResults(data) {
     // Hide loading, show results
@@ -160,6 +364,7 @@ function displayResults(data) {
     // Update Craigslist links
     console.log('Received data:', data); // Debug logging
     updateCraigslistLinks(data.craigslist_links || []);
+    updateNearbyLinks(data.nearby_links || []);
     
     // Scroll to results
     resultCard.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
@@ -190,6 +395,27 @@ function updateRecommendationsList(recommendations) {
 function updateSearchDetails(data) {
     searchDetails.innerHTML = '';
     
+    const details = describeSearch(data);
+    
+    if (details.length > 0) {
+        details.forEach(detail => {
+            const detailElement = document.createElement('span');
+            detailElement.className = 'search-detail-item';
+            detailElement.textContent = detail;
+            searchDetails.appendChild(detailElement);
+        });
+    } else {
+        const noDetailsElement = document.createElement('span');
+        noDetailsElement.className = 'search-detail-item';
+        noDetailsElement.textContent = 'General search area';
+        noDetailsElement.style.background = '#f8f9fa';
+        noDetailsElement.style.color = '#6c757d';
+        searchDetails.appendChild(noDetailsElement);
+    }
+}
+
+// Location and price labels for a result or preview
+function describeSearch(data) {
     const details = [];
     
     if (data.city && data.city !== 'sfbay') {
@@ -204,6 +430,10 @@ function updateSearchDetails(data) {
         details.push(`Radius: ${data.radius} miles`);
     }
     
+    if (data.nearby_cities && data.nearby_cities.length > 0) {
+        details.push(`Nearby: ${data.nearby_cities.map(city => city.toUpperCase()).join(', ')}`);
+    }
+    
     if (data.min_price || data.max_price) {
         let priceText = 'Price: ';
         if (data.min_price && data.max_price) {
@@ -216,21 +446,7 @@ function updateSearchDetails(data) {
         details.push(priceText);
     }
     
-    if (details.length > 0) {
-        details.forEach(detail => {
-            const detailElement = document.createElement('span');
-            detailElement.className = 'search-detail-item';
-            detailElement.textContent = detail;
-            searchDetails.appendChild(detailElement);
-        });
-    } else {
-        const noDetailsElement = document.createElement('span');
-        noDetailsElement.className = 'search-detail-item';
-        noDetailsElement.textContent = 'General search area';
-        noDetailsElement.style.background = '#f8f9fa';
-        noDetailsElement.style.color = '#6c757d';
-        searchDetails.appendChild(noDetailsElement);
-    }
+    return details;
 }
 
 // Update Craigslist links
@@ -264,6 +480,28 @@ function updateCraigslistLinks(links) {
     }
 }
 
+// Append links for other Craigslist sites within the search radius
+function updateNearbyLinks(nearbyLinks) {
+    nearbyLinks.forEach(group => {
+        group.links.forEach(linkData => {
+            const linkContainer = document.createElement('div');
+            linkContainer.className = 'individual-link-container';
+            
+            const linkElement = document.createElement('a');
+            linkElement.href = linkData.url;
+            linkElement.target = '_blank';
+            linkElement.className = 'craigslist-link';
+            linkElement.innerHTML = `
+                <i class="fas fa-external-link-alt"></i>
+                Search for "${linkData.item}" on ${group.city.toUpperCase()}
+            `;
+            
+            linkContainer.appendChild(linkElement);
+            craigslistLinks.appendChild(linkContainer);
+        });
+    });
+}
+
 // Show error message
 function showError(message) {
     hideAllCards();
@@ -366,6 +604,11 @@ document.addEventListener('keydown', (event) => {
     
     // Escape to clear and focus input
     if (event.key === 'Escape') {
+        clearTimeout(submitTimer);
+        clearTimeout(parseTimer);
+        cancelActiveRequest();
+        cancelActiveParse();
+        parsePreview.classList.add('hidden');
         userQueryInput.value = '';
         userQueryInput.focus();
         hideAllCards();
@@ -0,0 +1,132 @@
+"""
+Structured, non-blocking logging
+
+Request threads never write to stdout themselves. Records that pass the level
+and sampling checks are stamped with the current request id and put on a
+bounded queue; a QueueListener thread formats them as one JSON object per
+line and writes them out. When the queue is full, records are dropped and
+counted rather than making the request wait for a slow log collector.
+
+Sampling is decided once per request so a sampled request keeps all of its
+records. Warnings and errors are always logged.
+
+Configured with LOG_LEVEL (default INFO), LOG_SAMPLE_RATE (default 1.0) and
+LOG_QUEUE_SIZE (default 10000).
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+LOGGER_NAME = 'craigslink'
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+_request_sampled = contextvars.ContextVar('request_sampled', default=None)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, event, request id and fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage()
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry["request_id"] = request_id
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RequestContextFilter(logging.Filter):
+    """Drop unsampled records and stamp the rest with the request id"""
+
+    def __init__(self, sample_rate):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING and self.sample_rate < 1:
+            sampled = _request_sampled.get()
+            if sampled is None:
+                sampled = random.random() < self.sample_rate
+            if not sampled:
+                return False
+        record.request_id = _request_id.get()
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Freeze the message now; JSON formatting happens on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_handler = None
+_sample_rate = 1.0
+
+def configure_logging(level=None, sample_rate=None, queue_size=None, stream=None):
+    """Set up the queue-backed JSON logger once and return it"""
+    global _handler, _sample_rate
+    logger = logging.getLogger(LOGGER_NAME)
+    if _handler is not None:
+        return logger
+
+    level = level or os.getenv('LOG_LEVEL', 'INFO')
+    sample_rate = float(sample_rate if sample_rate is not None else os.getenv('LOG_SAMPLE_RATE', '1.0'))
+    queue_size = int(queue_size or os.getenv('LOG_QUEUE_SIZE', '10000'))
+    _sample_rate = sample_rate
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    _handler = DroppingQueueHandler(queue.Queue(queue_size))
+    _handler.addFilter(RequestContextFilter(sample_rate))
+    listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=False)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(_handler)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    return logger
+
+def dropped_records():
+    """Number of records dropped because the log queue was full"""
+    return _handler.dropped if _handler is not None else 0
+
+def bind_request(request_id):
+    """Attach a request id (and its sampling decision) to records from this context"""
+    return (_request_id.set(request_id), _request_sampled.set(random.random() < _sample_rate))
+
+def unbind_request(tokens):
+    """Undo bind_request at the end of a request"""
+    request_token, sampled_token = tokens
+    _request_id.reset(request_token)
+    _request_sampled.reset(sampled_token)
+
+def log_event(logger, level, event, **fields):
+    """Log an event name with structured fields, skipping all work when disabled"""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
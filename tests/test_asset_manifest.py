@@ -0,0 +1,27 @@
+import json
+
+import app as server
+from build_assets import hashed_name
+
+def write_build(static_dir, manifest):
+    (static_dir / "dist").mkdir(parents=True, exist_ok=True)
+    (static_dir / "dist" / "manifest.json").write_text(json.dumps(manifest))
+
+def test_stale_builds_fall_back_to_source(tmp_path, monkeypatch):
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "app.js").write_bytes(b"console.log('new');")
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "style.css").write_bytes(b"body {}")
+    write_build(tmp_path, {
+        "js/app.js": f"dist/{hashed_name('js/app.js', b'console.log(1);')}",
+        "css/style.css": f"dist/{hashed_name('css/style.css', b'body {}')}",
+        "js/missing.js": "dist/js/missing.0123456789.js",
+    })
+    monkeypatch.setattr(server.app, "static_folder", str(tmp_path))
+    monkeypatch.setattr(server, "ASSET_MANIFEST_PATH", str(tmp_path / "dist" / "manifest.json"))
+
+    assert server.load_asset_manifest() == {"css/style.css": f"dist/{hashed_name('css/style.css', b'body {}')}"}
+
+def test_missing_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "ASSET_MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    assert server.load_asset_manifest() == {}
@@ -0,0 +1,32 @@
+import json
+import sys
+
+import bulk_generate
+
+def run_bulk(monkeypatch, tmp_path, lines, *options):
+    input_path, output_path = tmp_path / "queries.jsonl", tmp_path / "results.jsonl"
+    input_path.write_text("".join(f"{line}\n" for line in lines))
+    monkeypatch.setattr(sys, "argv", ["bulk_generate.py", str(input_path), str(output_path), *options])
+    assert bulk_generate.main() == 0
+    assert not (tmp_path / "results.jsonl.checkpoint").exists()
+    return [json.loads(line) for line in output_path.read_text().splitlines()]
+
+def test_empty_input(monkeypatch, tmp_path):
+    assert run_bulk(monkeypatch, tmp_path, []) == []
+
+def test_blank_and_invalid_lines(monkeypatch, tmp_path):
+    records = run_bulk(monkeypatch, tmp_path, ["", "not json", '{"id": 7}'])
+    assert [(record["line"], record["success"]) for record in records] == [(2, False), (3, False)]
+
+def test_catalog_answers_without_ollama(monkeypatch, tmp_path):
+    def no_ollama(*args, **kwargs):
+        raise AssertionError("Ollama called")
+    monkeypatch.setattr(bulk_generate, "query_ollama", no_ollama)
+    records = run_bulk(monkeypatch, tmp_path, [
+        '{"id": "a", "query": "honda civic under $9000"}',
+        '{"id": "b", "query": "Honda  Civic under $9000"}',
+    ])
+    assert [record["id"] for record in records] == ["a", "b"]
+    assert all(record["success"] for record in records)
+    assert records[0]["recommendations"][0] == "Honda Civic"
+    assert records[0]["max_price"] == 9000
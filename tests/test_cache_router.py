@@ -0,0 +1,60 @@
+from collections import Counter
+
+from cache_router import BoundedLoadBalancer, HashRing
+
+NODES = ["http://a", "http://b", "http://c"]
+
+def test_walk_visits_every_node_once():
+    ring = HashRing(NODES)
+    for key in ("honda civic", "session:1", ""):
+        walked = list(ring.walk(key))
+        assert sorted(walked) == NODES
+        assert walked[0] == ring.owner(key)
+
+def test_keys_spread_over_nodes():
+    ring = HashRing(NODES)
+    owners = Counter(ring.owner(f"query {i}") for i in range(3000))
+    assert set(owners) == set(NODES)
+    assert min(owners.values()) > 600
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing(NODES)
+    keys = [f"query {i}" for i in range(1000)]
+    before = {key: ring.owner(key) for key in keys}
+    ring.remove("http://b")
+    for key in keys:
+        if before[key] != "http://b":
+            assert ring.owner(key) == before[key]
+        else:
+            assert ring.owner(key) in ("http://a", "http://c")
+    ring.add("http://b")
+    assert {key: ring.owner(key) for key in keys} == before
+
+def test_empty_ring():
+    ring = HashRing()
+    assert ring.owner("anything") is None
+    assert BoundedLoadBalancer(ring).acquire("anything") is None
+
+def test_hot_key_spills_past_a_full_owner():
+    ring = HashRing(NODES)
+    balancer = BoundedLoadBalancer(ring, load_factor=1.25)
+    owner = ring.owner("hot query")
+    picked = [balancer.acquire("hot query") for _ in range(9)]
+    assert picked[0] == owner
+    assert max(Counter(picked).values()) <= 4
+    for node in picked:
+        balancer.release(node)
+    assert all(load == 0 for load in balancer.loads.values())
+
+def test_unbounded_keys_stick_to_their_owner():
+    ring = HashRing(NODES)
+    balancer = BoundedLoadBalancer(ring, load_factor=1.25)
+    owner = ring.owner("session:abc")
+    assert [balancer.acquire("session:abc", bounded=False) for _ in range(9)] == [owner] * 9
+    # Only a down owner moves the session on
+    assert balancer.acquire("session:abc", exclude={owner}, bounded=False) == list(ring.walk("session:abc"))[1]
+
+def test_keyless_requests_go_to_the_least_loaded_node():
+    ring = HashRing(NODES)
+    balancer = BoundedLoadBalancer(ring)
+    assert sorted(balancer.acquire(None) for _ in range(3)) == NODES
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import app as server
+from category_classifier import MODEL_FORMAT, CategoryClassifier
+from train_category_model import split
+
+CORPUS = [
+    ("oak dresser with mirror", "fua"), ("leather sofa", "fua"), ("dining table and chairs", "fua"),
+    ("walnut bookshelf", "fua"), ("queen bed frame", "fua"), ("sectional sofa", "fua"),
+    ("mountain bike", "bia"), ("road bike carbon", "bia"), ("kids bike with training wheels", "bia"),
+    ("bmx bike", "bia"), ("fixie bike", "bia"), ("electric bike", "bia"),
+]
+
+@pytest.fixture(scope="module")
+def model():
+    model = CategoryClassifier.train(CORPUS, bits=12)
+    model.calibrate(CORPUS)
+    return model
+
+def test_train_and_predict(model):
+    assert model.classes == ["bia", "fua"]
+    assert model.predict("old sofa")[0] == "fua"
+    category, confidence = model.predict("gravel bike")
+    assert category == "bia"
+    assert 0.5 < confidence <= 1.0
+
+def test_save_load_round_trip(model, tmp_path):
+    path = tmp_path / "model.json"
+    model.save(str(path))
+    loaded = CategoryClassifier.load(str(path))
+    assert (loaded.classes, loaded.bits, loaded.temperature) == (model.classes, model.bits, model.temperature)
+    for query in ["old sofa", "gravel bike", "something else entirely"]:
+        assert loaded.predict(query)[0] == model.predict(query)[0]
+        assert loaded.predict(query)[1] == pytest.approx(model.predict(query)[1], abs=1e-4)
+
+@pytest.mark.parametrize("format", [MODEL_FORMAT + 1, None])
+def test_load_rejects_other_formats(model, tmp_path, format):
+    data = model.to_dict()
+    data["format"] = format
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps(data))
+    with pytest.raises(ValueError):
+        CategoryClassifier.load(str(path))
+
+def test_app_ignores_an_unreadable_model(model, tmp_path, monkeypatch):
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps({**model.to_dict(), "format": MODEL_FORMAT + 1}))
+    monkeypatch.setattr(server, "CATEGORY_MODEL_PATH", str(path))
+    assert server.load_category_model() is None
+
+def test_confidence_threshold(model, monkeypatch):
+    monkeypatch.setattr(server, "CATEGORY_MODEL", model)
+    # Keywords answer first, whatever the model thinks
+    assert server.classify_category("laptop") == server.extract_category_from_query("laptop")
+    assert server.extract_category_from_query("used fixie") is None
+    confidence = model.predict("used fixie")[1]
+    monkeypatch.setattr(server, "CATEGORY_MODEL_MIN_CONFIDENCE", confidence)
+    assert server.classify_category("used fixie") == "bia"
+    monkeypatch.setattr(server, "CATEGORY_MODEL_MIN_CONFIDENCE", confidence + 0.01)
+    assert server.classify_category("used fixie") is None
+
+def test_split_keeps_holdout_out_of_fitting():
+    examples = [(f"query {i}", "fua") for i in range(200)]
+    train, calibration, holdout = split(examples)
+    assert sorted(train + calibration + holdout) == sorted(examples)
+    assert not set(holdout) & (set(train) | set(calibration))
+    assert calibration and holdout and len(train) > len(calibration)
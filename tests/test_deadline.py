@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+import app as server
+
+ANSWER = {"recommendations": ["Oak Dresser", "Walnut Dresser"], "category": "fua", "min_price": None, "max_price": 300}
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "RESPONSE_CACHE", server.LRUCache(16))
+    return server.app.test_client()
+
+def deadline_after(monkeypatch, partial_response):
+    def request_ai_response(*args, **kwargs):
+        raise server.DeadlineExceeded(partial_response)
+    monkeypatch.setattr(server, "request_ai_response", request_ai_response)
+
+def test_complete_answer_before_the_deadline_is_not_degraded(client, monkeypatch):
+    deadline_after(monkeypatch, json.dumps(ANSWER) + "\n\nThese dressers are")
+    response = client.get("/api/generate-link", query_string={"q": "dresser under $300"})
+    result = response.get_json()
+    assert result["degraded"] is False
+    assert result["recommendations"] == ANSWER["recommendations"]
+    assert response.headers["Cache-Control"] != "no-store"
+    assert len(server.RESPONSE_CACHE) == 1
+
+def test_cut_off_answer_is_degraded(client, monkeypatch):
+    deadline_after(monkeypatch, '{"recommendations": ["Oak Dresser", "Walnut')
+    response = client.get("/api/generate-link", query_string={"q": "dresser under $300"})
+    result = response.get_json()
+    assert result["degraded"] is True
+    assert result["recommendations"] == ["Oak Dresser"]
+    assert response.headers["Cache-Control"] == "no-store"
+    assert len(server.RESPONSE_CACHE) == 0
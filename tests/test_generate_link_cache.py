@@ -0,0 +1,29 @@
+import pytest
+
+import app as server
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "RESPONSE_CACHE", server.LRUCache(16))
+    return server.app.test_client()
+
+def test_spellings_share_the_cache_but_echo_their_query(client, monkeypatch):
+    seen = []
+    generate_result = server.generate_result
+    monkeypatch.setattr(server, "generate_result", lambda query, *args: seen.append(query) or generate_result(query, *args))
+
+    first = client.get("/api/generate-link", query_string={"q": "  Honda Civic under $9000 "})
+    second = client.get("/api/generate-link", query_string={"q": "honda   CIVIC under $9000"})
+    assert seen == ["Honda Civic under $9000"]
+    assert first.get_json()["query"] == "Honda Civic under $9000"
+    assert second.get_json()["query"] == "honda   CIVIC under $9000"
+    assert first.get_json()["craigslist_links"] == second.get_json()["craigslist_links"]
+    assert first.headers["ETag"] != second.headers["ETag"]
+    assert len(server.RESPONSE_CACHE) == 1
+
+def test_etag_revalidation(client):
+    first = client.get("/api/generate-link?q=toyota+tacoma+truck&compact=1")
+    assert first.status_code == 200
+    again = client.get("/api/generate-link?q=toyota+tacoma+truck&compact=1",
+                       headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
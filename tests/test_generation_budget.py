@@ -0,0 +1,96 @@
+import math
+
+import app as server
+from generation_budget import ALL_CATEGORIES, GenerationBudget
+from metrics import Metrics
+
+def test_default_until_enough_samples():
+    budget = GenerationBudget(min_samples=5)
+    for _ in range(4):
+        budget.record("m", "cta", 100)
+        assert budget.budget("m", "cta") == budget.default
+    budget.record("m", "cta", 100)
+    assert budget.budget("m", "cta") == math.ceil(100 * budget.margin) + budget.extra
+
+def test_category_falls_back_to_model_window():
+    budget = GenerationBudget(min_samples=5)
+    for category in ("cta", "cta", "cta", "electronics", "electronics"):
+        budget.record("m", category, 200)
+    # Neither category has five answers, the model as a whole has
+    assert budget.budget("m", "furniture") == math.ceil(200 * budget.margin) + budget.extra
+    assert budget.budget("m", "cta") == budget.budget("m", "furniture")
+    # Other models keep their own windows
+    assert budget.budget("other", "cta") == budget.default
+
+def test_percentile_margin_and_clamp():
+    budget = GenerationBudget(default=1000, minimum=64, fraction=0.9, margin=1.5, extra=10, min_samples=10)
+    for tokens in range(10, 110, 10):
+        budget.record("m", "cta", tokens)
+    # The 90th percentile of 10..100 is 90
+    assert budget.budget("m", "cta") == math.ceil(90 * 1.5) + 10
+
+    short = GenerationBudget(minimum=64, min_samples=3)
+    for _ in range(3):
+        short.record("m", "cta", 5)
+    assert short.budget("m", "cta") == 64
+
+    long = GenerationBudget(default=1000, min_samples=3)
+    for _ in range(3):
+        long.record("m", "cta", 900)
+    assert long.budget("m", "cta") == 1000
+
+def test_window_keeps_recent_answers():
+    budget = GenerationBudget(min_samples=3, window=3, margin=1.0, extra=0)
+    for tokens in (800, 800, 800, 100, 100, 100):
+        budget.record("m", "cta", tokens)
+    assert len(budget.samples[("m", "cta")]) == 3
+    # The 800-token answers have left the window
+    assert budget.budget("m", "cta") == 100
+
+def test_snapshot():
+    budget = GenerationBudget(min_samples=2)
+    budget.record("m", "cta", 100)
+    budget.record("m", None, 50)
+    snapshot = budget.snapshot()
+    assert set(snapshot) == {"m/cta", "m/none", f"m/{ALL_CATEGORIES}"}
+    # One answer isn't enough for the category, so it gets the model-wide budget
+    model_wide = math.ceil(100 * budget.margin) + budget.extra
+    assert snapshot["m/cta"] == {"samples": 1, "p50": 100, "p99": 100, "num_predict": model_wide}
+    assert snapshot[f"m/{ALL_CATEGORIES}"]["samples"] == 2
+    assert snapshot[f"m/{ALL_CATEGORIES}"]["num_predict"] == model_wide
+
+def budget_answers(monkeypatch, answers):
+    """Serve query_ollama from a list of (text, final chunk) pairs; returns the num_predicts asked for"""
+    asked = []
+    answers = iter(answers)
+
+    def stream_chat(payload, cancel_event=None, deadline=None):
+        asked.append(payload["options"]["num_predict"])
+        return next(answers)
+
+    budget = GenerationBudget(default=server.OLLAMA_NUM_PREDICT, min_samples=1)
+    budget.record(server.OLLAMA_MODEL, "fua", 100)
+    monkeypatch.setattr(server, "ADAPTIVE_NUM_PREDICT", True)
+    monkeypatch.setattr(server, "GENERATION_BUDGET", budget)
+    monkeypatch.setattr(server, "METRICS", Metrics())
+    monkeypatch.setattr(server, "stream_chat", stream_chat)
+    return asked
+
+def test_retry_counts_no_savings(monkeypatch):
+    asked = budget_answers(monkeypatch, [
+        ('{"recommendations": ["Oak', {"done_reason": "length", "eval_count": 141}),
+        ('{"recommendations": ["Oak Dresser"]}', {"done_reason": "stop", "eval_count": 20}),
+    ])
+    server.query_ollama("dresser", category="fua")
+    assert asked == [141, server.OLLAMA_NUM_PREDICT]
+    counters = server.METRICS.snapshot()["counters"]
+    assert counters["budget.retries"] == 1
+    assert counters["budget.reserved_tokens_saved"] == 0
+
+def test_answer_within_budget_counts_savings(monkeypatch):
+    asked = budget_answers(monkeypatch, [
+        ('{"recommendations": ["Oak Dresser"]}', {"done_reason": "stop", "eval_count": 20}),
+    ])
+    server.query_ollama("dresser", category="fua")
+    counters = server.METRICS.snapshot()["counters"]
+    assert counters["budget.reserved_tokens_saved"] == server.OLLAMA_NUM_PREDICT - asked[0]
@@ -0,0 +1,53 @@
+import pytest
+
+from geo_index import (MAX_NEARBY_SITES, MAX_RADIUS_MILES, SiteIndex, ZipIndex, ZipSiteLocator,
+                       haversine_miles)
+
+@pytest.fixture(scope="module")
+def locator():
+    return ZipSiteLocator.load()
+
+def brute_force_within(index, lat, lon, radius):
+    matches = [(code, haversine_miles(lat, lon, site_lat, site_lon))
+               for code, site_lat, site_lon in zip(index.codes, index.lats, index.lons)]
+    return sorted(match for match in matches if match[1] <= radius)
+
+def test_zip_centroid_lookup():
+    index = ZipIndex([(10000, 10299, 40.7, -74.0), (94100, 94199, 37.8, -122.4)])
+    assert index.centroid("10001") == (40.7, -74.0)
+    assert index.centroid(94110) == (37.8, -122.4)
+    assert index.centroid("10300") is None
+    assert index.centroid("00001") is None
+    assert index.centroid("abcde") is None
+
+def test_nearest_site(locator):
+    assert locator.locate("94110")[0] == "sfbay"
+    assert locator.locate("10001")[0] == "nyc"
+
+def test_unknown_zip(locator):
+    assert locator.locate("00000", 50) == (None, [])
+
+def test_within_matches_brute_force(locator):
+    index = locator.site_index
+    for lat, lon, radius in [(40.75, -73.99, 100), (37.77, -122.42, 200), (61.2, -149.9, 250)]:
+        found = sorted((code, distance) for code, distance in index.within(lat, lon, radius))
+        assert found == brute_force_within(index, lat, lon, radius)
+
+def test_within_caps_radius(locator):
+    index = locator.site_index
+    assert index.within(39.0, -95.0, 100000) == index.within(39.0, -95.0, MAX_RADIUS_MILES)
+    assert all(distance <= MAX_RADIUS_MILES for _, distance in index.within(39.0, -95.0, 100000))
+
+def test_within_outside_grid_bounds():
+    index = SiteIndex([("a", 10.0, 10.0), ("b", 11.0, 11.0)])
+    assert index.within(-80.0, -170.0, MAX_RADIUS_MILES) == []
+    assert [code for code, _ in index.within(10.0, 10.0, 200)] == ["a", "b"]
+
+def test_locate_limits_nearby_sites(locator):
+    nearest, nearby = locator.locate("10001", 100000)
+    assert nearest == "nyc"
+    assert 0 < len(nearby) <= MAX_NEARBY_SITES
+    assert "nyc" not in [site for site, _ in nearby]
+    distances = [distance for _, distance in nearby]
+    assert distances == sorted(distances)
+    assert len(locator.locate("10001", 250, limit=3)[1]) == 3
@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+from micro_batcher import BatchFailed, MicroBatcher
+
+def test_items_in_one_window_share_a_batch():
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(items) or [item * 2 for item in items], window_ms=50, max_size=8)
+    futures = [batcher.submit(i) for i in range(5)]
+    assert [future.result(timeout=2) for future in futures] == [0, 2, 4, 6, 8]
+    assert batches == [[0, 1, 2, 3, 4]]
+
+def test_wrong_result_count_fails_the_batch():
+    batcher = MicroBatcher(lambda items: items[:1], window_ms=20)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(BatchFailed):
+            future.result(timeout=2)
+
+def test_items_wait_for_a_free_worker():
+    release = threading.Event()
+    batches = []
+
+    def run_batch(items):
+        batches.append(items)
+        release.wait(2)
+        return items
+
+    batcher = MicroBatcher(run_batch, window_ms=10, max_size=8, concurrency=1)
+    first = batcher.submit("first")
+    time.sleep(0.1)
+    # The only worker is busy, so items further apart than the window still end up in one batch
+    later = []
+    for i in range(3):
+        later.append(batcher.submit(i))
+        time.sleep(0.05)
+    release.set()
+    assert first.result(timeout=2) == "first"
+    assert [future.result(timeout=2) for future in later] == [0, 1, 2]
+    assert batches == [["first"], [0, 1, 2]]
+
+def test_cancelled_items_are_skipped():
+    release = threading.Event()
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(items) or release.wait(2) and items, window_ms=10, concurrency=1)
+    busy = batcher.submit("busy")
+    time.sleep(0.05)
+    gave_up, kept = batcher.submit("gave up"), batcher.submit("kept")
+    gave_up.cancel()
+    release.set()
+    assert busy.result(timeout=2) == "busy"
+    assert kept.result(timeout=2) == "kept"
+    assert batches == [["busy"], ["kept"]]
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from output_scanner import MAX_JSON_DEPTH, capitalized_phrases, find_json_object, product_phrases
+
+ANSWER = {"recommendations": ["Honda Civic", "Toyota Corolla"], "category": "cta"}
+
+@pytest.mark.parametrize("text", [
+    json.dumps(ANSWER),
+    "Sure! Here you go: " + json.dumps(ANSWER) + " Hope that helps.",
+    'Use a { brace. ' + json.dumps(ANSWER),
+    '{ and { again, then ' + json.dumps(ANSWER),
+    'Not {valid} json, then ' + json.dumps(ANSWER),
+    '"quoted prose" then ' + json.dumps(ANSWER),
+    '{"explanation": "unterminated ' + json.dumps(ANSWER),
+    json.dumps(ANSWER) + json.dumps({"recommendations": ["second"]}),
+])
+def test_finds_the_answer(text):
+    parsed, end = find_json_object(text)
+    assert parsed == ANSWER
+    assert json.loads(text[text.index(json.dumps(ANSWER)):end]) == ANSWER
+
+def test_braces_inside_strings():
+    answer = {"recommendations": ["a } b", "c { d"], "explanation": 'say "hi" {'}
+    assert find_json_object("x " + json.dumps(answer))[0] == answer
+
+@pytest.mark.parametrize("text", [
+    "",
+    "no json here",
+    "{ { {",
+    '{"recommendations": ["Honda Civic"',
+    "[1, 2, 3]",
+    "{" * (MAX_JSON_DEPTH + 1) + "}" * (MAX_JSON_DEPTH + 1),
+])
+def test_no_object(text):
+    assert find_json_object(text) == (None, None)
+
+def test_depth_limit():
+    nested = {"a": 1}
+    for _ in range(MAX_JSON_DEPTH - 1):
+        nested = {"a": nested}
+    assert find_json_object(json.dumps(nested))[0] == nested
+
+def test_phrases():
+    text = "Try the Dell Ultrasharp monitor or a Honda Civic Si, or Sony Bravia X90 tv."
+    assert product_phrases(text) == ["Dell Ultrasharp monitor", "Sony Bravia X90 tv"]
+    assert capitalized_phrases(text) == ["Dell Ultrasharp", "Honda Civic Si", "Sony Bravia X90"]
@@ -0,0 +1,19 @@
+import pytest
+
+import app as server
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "PARSE_CACHE", server.LRUCache(16))
+    return server.app.test_client()
+
+def test_echoes_the_query_as_sent(client):
+    first = client.get("/api/parse", query_string={"q": "  Honda Civic under $9000 "}).get_json()
+    second = client.get("/api/parse", query_string={"q": "honda   CIVIC under $9000"}).get_json()
+    assert first["query"] == "Honda Civic under $9000"
+    assert second["query"] == "honda   CIVIC under $9000"
+    assert {**first, "query": None} == {**second, "query": None}
+    assert len(server.PARSE_CACHE) == 1
+
+def test_blank_query(client):
+    assert client.get("/api/parse", query_string={"q": "   "}).status_code == 400
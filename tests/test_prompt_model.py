@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import app as server
+from prompt_library import CATEGORY_PROMPTS, SYSTEM_PROMPT
+
+class FakeOllama:
+    """Stands in for requests.post against /api/show, /api/create and /api/chat"""
+
+    def __init__(self, failures=0, delay=0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = []
+
+    def post(self, url, json=None, timeout=None):
+        self.calls.append((url.rsplit('/', 1)[-1], json.get("model")))
+        time.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise requests.exceptions.ConnectionError("Ollama is down")
+        response = requests.Response()
+        response.status_code = 404 if url.endswith('/api/show') else 200
+        return response
+
+@pytest.fixture
+def ollama(monkeypatch):
+    monkeypatch.setattr(server, "OLLAMA_PROMPT_MODEL", "craigslink")
+    monkeypatch.setattr(server, "PROMPT_MODELS", {prompt: server.PromptModel(prompt) for prompt in server.ACTIVE_PROMPTS})
+
+    def install(**kwargs):
+        fake = FakeOllama(**kwargs)
+        monkeypatch.setattr(server.requests, "post", fake.post)
+        return fake
+    return install
+
+def wait_for_creation():
+    for _ in range(100):
+        if not any(thread.name == "prompt-model" for thread in threading.enumerate()):
+            return
+        time.sleep(0.01)
+
+def test_one_model_per_prompt(ollama):
+    names = {prompt_model.name for prompt_model in server.PROMPT_MODELS.values()}
+    assert len(names) == len(set([SYSTEM_PROMPT, *CATEGORY_PROMPTS.values()]))
+    assert all(name.startswith("craigslink:") for name in names)
+
+def test_requests_never_wait_for_creation(ollama):
+    fake = ollama(delay=0.3)
+    prompt_model = server.PROMPT_MODELS[SYSTEM_PROMPT]
+    started = time.perf_counter()
+    assert prompt_model.ensure() is False
+    assert time.perf_counter() - started < 0.1
+    wait_for_creation()
+    assert [call for call, _ in fake.calls] == ["show", "create"]
+    assert prompt_model.ensure() is True
+
+def test_failed_creation_is_retried(ollama, monkeypatch):
+    fake = ollama(failures=1)
+    prompt_model = server.PROMPT_MODELS[SYSTEM_PROMPT]
+    assert prompt_model.create() is False
+    # Inside the retry interval nothing new is attempted
+    monkeypatch.setattr(server, "PROMPT_MODEL_RETRY_SECONDS", 60)
+    assert prompt_model.ensure() is False
+    wait_for_creation()
+    assert len(fake.calls) == 1
+    monkeypatch.setattr(server, "PROMPT_MODEL_RETRY_SECONDS", 0)
+    prompt_model.ensure()
+    wait_for_creation()
+    assert [call for call, _ in fake.calls] == ["show", "show", "create"]
+    assert prompt_model.ensure() is True
+
+def test_payload_uses_the_category_model_once_ready(ollama, monkeypatch):
+    ollama(failures=1)
+    monkeypatch.setattr(server, "PROMPT_MODEL_RETRY_SECONDS", 60)
+    vehicle_model = server.PROMPT_MODELS[CATEGORY_PROMPTS["cta"]]
+    vehicle_model.create()
+    payload = server.build_chat_payload("honda civic", category="cta")
+    assert payload["model"] == server.OLLAMA_MODEL
+    assert payload["messages"][0] == {"role": "system", "content": CATEGORY_PROMPTS["cta"]}
+
+    vehicle_model.create()
+    payload = server.build_chat_payload("honda civic", category="cta")
+    assert payload["model"] == vehicle_model.name
+    assert [message["role"] for message in payload["messages"]] == ["user"]
+
+def test_warmup_creates_and_warms_every_prompt(ollama):
+    fake = ollama()
+    server.warm_prompt_cache()
+    models = server.PROMPT_MODELS.values()
+    assert all(prompt_model.ready for prompt_model in models)
+    assert sorted(model for call, model in fake.calls if call == "chat") == sorted(m.name for m in models)
+
+def test_new_base_model_gets_a_new_prompt_model(ollama):
+    fake = ollama()
+    small = server.PromptModel(SYSTEM_PROMPT, base_model="llama3.2:3b")
+    large = server.PromptModel(SYSTEM_PROMPT, base_model="llama3.1:8b")
+    assert small.name != large.name
+    assert large.create() is True
+    assert fake.calls == [("show", large.name), ("create", large.name)]
+
+def test_payload_without_prompt_models(ollama):
+    fake = ollama()
+    payload = server.build_chat_payload("honda civic", category="cta", use_prompt_model=False)
+    assert payload["model"] == server.OLLAMA_MODEL
+    assert payload["messages"][0] == {"role": "system", "content": CATEGORY_PROMPTS["cta"]}
+    wait_for_creation()
+    assert fake.calls == []
+    assert not any(prompt_model.ready for prompt_model in server.PROMPT_MODELS.values())
@@ -0,0 +1,35 @@
+import pytest
+
+import app as server
+
+@pytest.mark.parametrize("query, price", [
+    ("honda civic under $15000", 15000),
+    ("couch under $20000", 20000),
+    ("used car under $10000", 10000),
+    ("laptop under $50000", 50000),
+    ("truck over 25000", 25000),
+    ("civic 15000 dollars", 15000),
+])
+def test_prices_are_not_zip_codes(query, price):
+    filters = server.extract_query_filters(query)
+    assert filters["zip_code"] is None
+    assert filters["city"] == server.DEFAULT_CITY
+    assert price in (filters["min_price"], filters["max_price"])
+
+@pytest.mark.parametrize("query", [
+    "couch near 10001",
+    "couch within 20 miles of 10001",
+    "couch zip code 10001",
+    "couch 10001 area",
+])
+def test_zip_named_as_a_place_picks_the_site(query):
+    filters = server.extract_query_filters(query)
+    assert (filters["city"], filters["zip_code"]) == ("nyc", "10001")
+
+def test_bare_zip_is_only_the_postal_filter():
+    filters = server.extract_query_filters("couch 10001 under $300")
+    assert (filters["city"], filters["zip_code"], filters["max_price"]) == (server.DEFAULT_CITY, "10001", 300)
+
+def test_vehicle_model_is_not_a_city():
+    filters = server.extract_query_filters("toyota tacoma under $20000")
+    assert (filters["city"], filters["zip_code"], filters["max_price"]) == (server.DEFAULT_CITY, None, 20000)
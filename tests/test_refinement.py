@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+import app as server
+from refinement import changed_filters, intent_signature, intent_words, merge_filters
+
+def test_intent_words_skip_filters_and_places():
+    assert intent_words("under $8000 in boston instead") == []
+    assert intent_words("hide duplicates") == []
+    assert intent_words("a truck instead") == ["truck"]
+    assert intent_signature("Honda Civic under 9000") == intent_signature("civic honda")
+
+def test_merge_keeps_session_filters_and_applies_new_ones():
+    previous = server.extract_query_filters("honda civic 94110 under $9000 automatic")
+    update = server.extract_query_filters("under $7000")
+    merged = merge_filters(previous, update, item_changed=False)
+    assert (merged["min_price"], merged["max_price"]) == (None, 7000)
+    assert merged["zip_code"] == "94110"
+    assert merged["vehicle_params"]["transmission"] == 2
+    assert changed_filters(previous, merged) == ["max_price"]
+
+def test_filter_only_refinement_keeps_the_category():
+    previous = server.extract_query_filters("honda civic under $9000")
+    update = server.extract_query_filters("hide duplicates")
+    merged = merge_filters(previous, update, item_changed=False)
+    assert merged["category"] == previous["category"]
+    assert merged["vehicle_params"]["hide_duplicates"] is True
+
+def test_item_change_takes_the_new_category():
+    previous = {"category": "cta", "min_price": None}
+    assert merge_filters(previous, {"category": "fua", "min_price": None})["category"] == "fua"
+
+def test_named_city_clears_the_zip_code():
+    previous = server.extract_query_filters("honda civic 94110 within 50 miles")
+    filters = server.refine_filters(previous, "in boston")
+    assert filters["city"] == "boston"
+    assert filters["zip_code"] is None
+    assert filters["nearby_cities"] == []
+
+def test_new_zip_code_moves_the_city():
+    previous = server.extract_query_filters("honda civic in boston")
+    filters = server.refine_filters(previous, "near 94110")
+    assert (filters["city"], filters["zip_code"]) == ("sfbay", "94110")
+
+@pytest.fixture
+def client(monkeypatch):
+    answers = iter([
+        {"recommendations": ["Oak Dresser"], "category": "fua", "min_price": None, "max_price": 300},
+        {"recommendations": ["Walnut Dresser"], "category": "fua", "min_price": None, "max_price": 300},
+    ])
+    monkeypatch.setattr(server, "request_ai_response", lambda *args, **kwargs: json.dumps(next(answers)))
+    return server.app.test_client()
+
+def test_rerun_uses_the_merged_prices(client):
+    first = client.post("/api/refine", json={"query": "oak dresser under $300"}).get_json()
+    assert first["max_price"] == 300
+    second = client.post("/api/refine", json={"session_id": first["session_id"],
+                                              "refinement": "walnut instead, under $150"}).get_json()
+    assert second["llm_skipped"] is False
+    assert second["max_price"] == 150
+    assert all("max_price=150" in link["url"] for link in second["craigslist_links"])
+
+@pytest.mark.parametrize("refinement", ["under $15000 instead", "under 15000 instead", "max price 15000"])
+def test_price_refinement_keeps_the_zip_code(refinement):
+    previous = server.extract_query_filters("oak dresser near 94110")
+    filters = server.refine_filters(previous, refinement)
+    assert (filters["city"], filters["zip_code"], filters["max_price"]) == ("sfbay", "94110", 15000)
+    assert changed_filters(previous, filters) == ["max_price"]
+
+def test_price_refinement_skips_the_llm(client):
+    first = client.post("/api/refine", json={"query": "oak dresser near 94110"}).get_json()
+    second = client.post("/api/refine", json={"session_id": first["session_id"],
+                                              "refinement": "under $15000 instead"}).get_json()
+    assert second["llm_skipped"] is True
+    assert second["changed_filters"] == ["max_price"]
+    assert (second["zip_code"], second["max_price"]) == ("94110", 15000)
+
+def test_bare_number_refinement_keeps_the_location():
+    previous = server.extract_query_filters("oak dresser near 94110")
+    filters = server.refine_filters(previous, "15000 instead")
+    assert (filters["city"], filters["zip_code"]) == ("sfbay", "94110")
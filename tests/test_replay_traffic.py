@@ -0,0 +1,52 @@
+import gzip
+import json
+import time
+from types import SimpleNamespace
+
+import replay_traffic
+
+class SlowReplayer:
+    def __init__(self, target, timeout):
+        pass
+
+    def __call__(self, entry):
+        time.sleep(0.05)
+        return 200
+
+def write_captures(path, entries):
+    with gzip.open(path, 'wt') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+def run_args(captures, **overrides):
+    args = dict(captures=[str(captures)], target='http://localhost:5000', pipeline=False, llm_latency=False,
+                speed=1.0, concurrency=32, limit=None, timeout=1.0)
+    args.update(overrides)
+    return SimpleNamespace(**args)
+
+def queueing_max(output):
+    line = next(line for line in output.splitlines() if line.startswith("Queueing ms"))
+    return float(line.rsplit("max", 1)[1])
+
+def test_queueing_behind_busy_threads_is_reported(tmp_path, monkeypatch, capsys):
+    captures = tmp_path / "capture.jsonl.gz"
+    write_captures(captures, [{"ts": 100.0, "query": f"query {i}"} for i in range(4)])
+    monkeypatch.setattr(replay_traffic, "HttpReplayer", SlowReplayer)
+
+    assert replay_traffic.run(run_args(captures, concurrency=1)) == 0
+    output = capsys.readouterr()
+    # The last of four simultaneous requests waits for the three before it
+    assert queueing_max(output.out) >= 140
+    assert "raise --concurrency" in output.err
+
+    assert replay_traffic.run(run_args(captures, concurrency=4)) == 0
+    assert queueing_max(capsys.readouterr().out) < 40
+
+def test_unpaced_replay_message(tmp_path, monkeypatch, capsys):
+    captures = tmp_path / "capture.jsonl.gz"
+    write_captures(captures, [{"ts": 100.0, "query": "query"}])
+    monkeypatch.setattr(replay_traffic, "HttpReplayer", SlowReplayer)
+
+    assert replay_traffic.run(run_args(captures, speed=0)) == 0
+    err = capsys.readouterr().err
+    assert "without pacing" in err and "speed" not in err
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import app as server
+from response_shaping import dumps, parse_fields, parse_flag, shape_result
+
+RESULT = {
+    "success": True,
+    "recommendations": ["Honda Civic"],
+    "craigslist_links": [{"item": "Honda Civic", "url": "https://sfbay.craigslist.org/search/cta?query=Honda%20Civic"}],
+    "city": "sfbay",
+    "min_price": None,
+    "max_price": 9000,
+    "nearby_cities": [],
+    "degraded": False,
+    "vehicle_params": {"search_titles_only": False, "hide_duplicates": True, "min_year": None,
+                       "transmission": 2, "cylinders": 0},
+}
+
+@pytest.mark.parametrize("value, fields", [
+    (None, None),
+    ("", None),
+    ("city", ("city",)),
+    (" city, craigslist_links ,city", ("city", "craigslist_links")),
+    (["city", "max_price"], ("city", "max_price")),
+    ([], None),
+])
+def test_parse_fields(value, fields):
+    assert parse_fields(value) == fields
+
+@pytest.mark.parametrize("value", ["city,bogus", ["nope"], 5, 0, {"city": 1}, True, 1.5])
+def test_parse_fields_rejects(value):
+    with pytest.raises(ValueError):
+        parse_fields(value)
+
+def test_parse_flag():
+    assert parse_flag(True) and parse_flag("yes") and parse_flag("1")
+    assert not parse_flag(None) and not parse_flag("0") and not parse_flag(False)
+
+def test_fields_only():
+    assert shape_result(RESULT, ("city", "max_price")) == {"city": "sfbay", "max_price": 9000}
+
+def test_compact_drops_defaults():
+    shaped = shape_result(RESULT, compact=True)
+    assert "recommendations" not in shaped
+    assert "min_price" not in shaped and "nearby_cities" not in shaped and "degraded" not in shaped
+    assert shaped["vehicle_params"] == {"hide_duplicates": True, "transmission": 2, "cylinders": 0}
+
+def test_compact_keeps_selected_recommendations():
+    assert shape_result(RESULT, ("recommendations",), compact=True) == {"recommendations": ["Honda Civic"]}
+
+def test_dumps_is_compact_json():
+    assert json.loads(dumps(RESULT)) == RESULT
+    assert b" " not in dumps({"a": [1, 2]})
+
+def test_dumps_huge_prices():
+    result = {**RESULT, "max_price": 99999999999999999999}
+    assert json.loads(dumps(result)) == result
+
+def test_huge_llm_price_is_not_a_server_error(monkeypatch):
+    answer = {"recommendations": ["Oak Dresser"], "category": "fua", "min_price": None, "max_price": 99999999999999999999}
+    monkeypatch.setattr(server, "RESPONSE_CACHE", server.LRUCache(16))
+    monkeypatch.setattr(server, "request_ai_response", lambda *args, **kwargs: json.dumps(answer))
+    response = server.app.test_client().post("/api/generate-link", json={"query": "oak dresser"})
+    assert response.status_code == 200
+    assert response.get_json()["max_price"] == 99999999999999999999
+
+def test_bad_fields_is_a_client_error():
+    client = server.app.test_client()
+    response = client.post("/api/generate-link", json={"query": "honda civic", "fields": 5})
+    assert response.status_code == 400
+    assert "fields" in response.get_json()["error"]
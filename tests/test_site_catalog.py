@@ -0,0 +1,57 @@
+import pytest
+
+from site_catalog import SiteMatcher, load_matcher, query_words
+
+@pytest.fixture(scope="module")
+def matcher(tmp_path_factory):
+    return load_matcher(cache_dir=str(tmp_path_factory.mktemp("cache")))
+
+def test_longest_alias_wins():
+    catalog = {
+        "version": 1,
+        "states": {"ME": {"name": "Maine", "default_site": "maine"}},
+        "sites": [
+            {"code": "portland", "name": "Portland", "state": "OR", "aliases": ["portland"]},
+            {"code": "maine", "name": "Maine", "state": "ME", "aliases": ["portland me", "bar harbor"]},
+        ],
+    }
+    matcher = SiteMatcher.build(catalog)
+    assert matcher.find_site("bike in Portland, ME") == "maine"
+    assert matcher.find_site("bike in portland") == "portland"
+    assert matcher.find_site_span(query_words("kayak bar harbor")) == ("maine", 1, 2)
+    # Site names over state names
+    assert matcher.find_site("maine") == "maine"
+
+@pytest.mark.parametrize("query, site", [
+    ("couch in san francisco", "sfbay"),
+    ("springfield il truck", "springfieldil"),
+    ("portland or bike", "portland"),
+    ("portland me bike", "maine"),
+    ("lincoln ne tractor", "lincoln"),
+])
+def test_alias_state_forms(matcher, query, site):
+    assert matcher.find_site(query) == site
+
+@pytest.mark.parametrize("query", [
+    "toyota tacoma under $20000",
+    "hyundai tucson",
+    "chevy tahoe",
+    "hyundai santa fe",
+    "kia sedona",
+    "chevy colorado",
+    "dodge durango",
+    "gmc sierra",
+    "buffalo plaid jacket",
+])
+def test_vehicle_models_and_words_are_not_places(matcher, query):
+    assert matcher.find_site(query) is None
+
+@pytest.mark.parametrize("query, site", [
+    ("couch in tacoma", "seattle"),
+    ("couch near tucson", "tucson"),
+    ("truck around colorado", "denver"),
+    ("toyota tacoma in boston", "boston"),
+    ("durango co", "westslope"),
+])
+def test_ambiguous_names_need_a_locative_word(matcher, query, site):
+    assert matcher.find_site(query) == site
@@ -0,0 +1,41 @@
+import pytest
+
+from vehicle_catalog import get_catalog
+
+@pytest.fixture(scope="module")
+def catalog():
+    return get_catalog()
+
+@pytest.mark.parametrize("query", [
+    "camry floor mats",
+    "f150 tailgate",
+    "tesla model 3 charger",
+    "jeep wrangler soft top",
+    "camaro seat covers",
+    "mustang horse saddle",
+    "odyssey game",
+    "matchbox car hot wheels camaro",
+    "honda civic for my daughter",
+    "honda",
+])
+def test_other_queries_go_to_the_llm(catalog, query):
+    assert catalog.recommendations(query) is None
+
+@pytest.mark.parametrize("query, first", [
+    ("honda civic", "Honda Civic"),
+    ("black BMW 335i 2010 to 2015 under 100k miles automatic clean title", "BMW 335i"),
+    ("Toyota Tacoma truck 2012 or newer under $20000", "Toyota Tacoma"),
+    ("white bmw i3 within 100 miles of 94086 under 100k miles clean title", "BMW i3"),
+    ("cheap used toyota camry in boston", "Toyota Camry"),
+    ("tesla model 3 under 30k", "Tesla Model 3"),
+    ("toyota camery under 5000", "Toyota Camry"),
+    ("something like a subaru outback", "Subaru Outback"),
+])
+def test_vehicle_and_filter_queries_are_answered(catalog, query, first):
+    answer = catalog.recommendations(query)
+    assert answer is not None
+    assert answer["recommendations"][0] == first
+    assert answer["category"] == "cta"
+
+def test_make_needs_car_context(catalog):
+    assert catalog.recommendations("honda suv")["recommendations"]
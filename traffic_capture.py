@@ -0,0 +1,147 @@
+"""
+Opt-in capture of generate-link traffic for load testing
+
+When TRAFFIC_CAPTURE_DIR is set, app.py hands a sampled subset of
+generate-link requests to a TrafficRecorder: the query, wall-clock timestamp,
+stage timings, status and the raw Ollama response. Request threads only put a
+dict on a bounded queue; a background thread scrubs PII, serializes and
+appends the records to gzip-compressed JSONL files that rotate by size. If the
+writer falls behind, records are dropped rather than slowing requests down.
+
+replay_traffic.py reads the captures back with read_captures().
+"""
+
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import zlib
+
+FILE_PREFIX = "capture-"
+FILE_SUFFIX = ".jsonl.gz"
+
+# Anything that looks like contact details or an account number is masked
+# before it reaches disk. Zip codes and prices are kept since they drive the
+# extraction being load tested.
+_PII_PATTERNS = [
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "[email]"),
+    (re.compile(r"(?<!\d)(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?!\d)"), "[phone]"),
+    (re.compile(r"(?<!\d)\d(?:[ -]?\d){12,18}(?!\d)"), "[number]"),
+]
+
+# Record fields that may contain user text
+_SCRUBBED_FIELDS = ("query", "raw_response", "error")
+
+def scrub(text):
+    """Mask email addresses, phone numbers and long account-like numbers"""
+    for pattern, replacement in _PII_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+class TrafficRecorder:
+    """Sampled, non-blocking writer of rotating compressed capture files"""
+
+    def __init__(self, directory, sample_rate=1.0, max_bytes=64 * 1024 * 1024, max_files=10,
+                 queue_size=10000):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.queue = queue.Queue(queue_size)
+        self.recorded = 0
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def sampled(self):
+        """Decide whether the current request should be captured"""
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def record(self, entry):
+        """Queue a record for writing without blocking the caller"""
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5):
+        """Flush queued records and finish the current file"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def _open_file(self):
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        path = os.path.join(self.directory, f"{FILE_PREFIX}{stamp}-{os.getpid()}{FILE_SUFFIX}")
+        self._prune()
+        return gzip.open(path, 'ab')
+
+    def _prune(self):
+        """Keep the newest max_files - 1 captures, leaving room for a new one"""
+        paths = sorted(glob.glob(os.path.join(self.directory, f"{FILE_PREFIX}*{FILE_SUFFIX}")),
+                       key=os.path.getmtime)
+        for path in paths[:max(0, len(paths) - self.max_files + 1)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _run(self):
+        output = None
+        written = 0
+        while True:
+            entry = self.queue.get()
+            if entry is None:
+                break
+            for field in _SCRUBBED_FIELDS:
+                if isinstance(entry.get(field), str):
+                    entry[field] = scrub(entry[field])
+            line = json.dumps(entry, separators=(',', ':')).encode('utf-8') + b"\n"
+
+            if output is None or written >= self.max_bytes:
+                if output is not None:
+                    output.close()
+                output = self._open_file()
+                written = 0
+            output.write(line)
+            written += len(line)
+            self.recorded += 1
+
+            # Make everything so far readable once the queue is drained
+            if self.queue.empty():
+                output.flush(zlib.Z_SYNC_FLUSH)
+        if output is not None:
+            output.close()
+
+def capture_files(paths):
+    """Expand capture files and directories into capture files, oldest first"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, f"{FILE_PREFIX}*{FILE_SUFFIX}")))
+        else:
+            files.append(path)
+    return sorted(files, key=os.path.getmtime)
+
+def read_captures(paths):
+    """Yield capture records from files and directories
+
+    A file that is still being written ends without a gzip trailer; everything
+    up to its last flush is returned.
+    """
+    for path in capture_files(paths):
+        with gzip.open(path, 'rb') as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            except (EOFError, json.JSONDecodeError):
+                continue
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Train the local category classifier from logged LLM decisions
+
+Training examples are (query, category) pairs taken from:
+- traffic capture files or directories (see TRAFFIC_CAPTURE_DIR), labelled
+  with the category the LLM wrote in its recorded answer
+- JSONL files with "query" and "category" fields, such as
+  benchmarks/golden_queries.jsonl
+
+Distinct queries are split by hash, so the split is stable between runs:
+three fifths train the model, one fifth calibrates its confidence and the
+last fifth is held out. The report on the held-out queries compares the model
+with the keyword extractor: accuracy, how many keyword misses it can answer
+confidently, a calibration table and prediction latency. None of those
+queries were used for fitting or calibration. The model is then refitted on
+all examples, keeping the calibrated temperature, and saved for app.py to load.
+
+Usage:
+    python train_category_model.py captures/ --output data/category_model.json
+    python train_category_model.py captures/ benchmarks/golden_queries.jsonl --min-confidence 0.9
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from collections import Counter
+
+import app
+from category_classifier import CategoryClassifier
+from metrics import percentile
+from traffic_capture import capture_files, read_captures
+
+CATEGORY_FIELD = re.compile(r'"category"\s*:\s*"([a-z]{3})"')
+
+def llm_category(raw_response):
+    """The category the LLM named in its answer, or None"""
+    match = CATEGORY_FIELD.search(raw_response or "")
+    return match.group(1) if match else None
+
+def is_capture(path):
+    return os.path.isdir(path) or path.endswith('.gz')
+
+def load_examples(paths):
+    """(query, category) pairs from capture files and labelled JSONL files"""
+    valid = set(app.CATEGORY_MAPPING.values())
+    examples = []
+    for record in read_captures([path for path in paths if is_capture(path)]):
+        if record.get("status") == 200 and not record.get("degraded") and record.get("raw_response"):
+            examples.append((record["query"], llm_category(record["raw_response"])))
+    for path in paths:
+        if is_capture(path):
+            continue
+        with open(path) as f:
+            examples.extend((row["query"], row.get("category")) for row in map(json.loads, filter(str.strip, f)))
+    return [(query, category) for query, category in examples if query and category in valid]
+
+def deduplicate(examples):
+    """One example per normalized query, labelled with its most common category"""
+    labels = {}
+    for query, category in examples:
+        labels.setdefault(app.normalize_query(query), Counter())[category] += 1
+    return [(query, counts.most_common(1)[0][0]) for query, counts in labels.items()]
+
+def split(examples):
+    """(train, calibration, holdout) example lists, three fifths and a fifth each"""
+    train, calibration, holdout = [], [], []
+    for example in examples:
+        bucket = zlib.crc32(example[0].encode()) % 5
+        (holdout if bucket == 0 else calibration if bucket == 1 else train).append(example)
+    return train, calibration, holdout
+
+def report(model, holdout, min_confidence):
+    predictions = [(query, category, *model.predict(query)) for query, category in holdout]
+    n = len(predictions)
+    correct = sum(predicted == category for _, category, predicted, _ in predictions)
+    print(f"\nHeld-out queries: {n}")
+    print(f"Classifier accuracy: {correct / n:.3f}")
+
+    keyword = [(app.extract_category_from_query(query), category, predicted, confidence)
+               for query, category, predicted, confidence in predictions]
+    answered = [row for row in keyword if row[0] is not None]
+    misses = [row for row in keyword if row[0] is None]
+    print(f"Keyword extractor: answers {len(answered) / n:.3f} of queries, "
+          f"accuracy {sum(found == category for found, category, _, _ in answered) / max(len(answered), 1):.3f} on those")
+    confident = [row for row in misses if row[3] >= min_confidence]
+    print(f"Keyword misses: {len(misses)}; classifier confident (>= {min_confidence}) on {len(confident)}, "
+          f"accuracy {sum(predicted == category for _, category, predicted, _ in confident) / max(len(confident), 1):.3f}")
+    combined = sum((found or (predicted if confidence >= min_confidence else None)) == category
+                   for found, category, predicted, confidence in keyword)
+    print(f"Keywords, then classifier: accuracy {combined / n:.3f} "
+          f"(keywords alone {sum(found == category for found, category, _, _ in keyword) / n:.3f})")
+
+    print(f"\nCalibration (temperature {model.temperature}):")
+    print(f"{'confidence':<12}{'queries':>8}{'accuracy':>10}")
+    error = 0.0
+    for low in (0.0, 0.5, 0.6, 0.7, 0.8, 0.9):
+        high = {0.0: 0.5, 0.9: 1.01}.get(low, low + 0.1)
+        bucket = [row for row in predictions if low <= row[3] < high]
+        if bucket:
+            accuracy = sum(predicted == category for _, category, predicted, _ in bucket) / len(bucket)
+            mean_confidence = sum(row[3] for row in bucket) / len(bucket)
+            error += len(bucket) / n * abs(accuracy - mean_confidence)
+            print(f"{low:.1f}-{min(high, 1.0):.1f}{'':<5}{len(bucket):>8}{accuracy:>10.3f}")
+    print(f"Expected calibration error: {error:.3f}")
+
+    timings = []
+    for query, _ in holdout * max(1, 1000 // n):
+        started = time.perf_counter()
+        model.predict(query)
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    print(f"\nPrediction latency: p50 {percentile(timings, 0.5):.1f} us, p99 {percentile(timings, 0.99):.1f} us")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local category classifier")
+    parser.add_argument('paths', nargs='+', help="capture files or directories, or JSONL files with query and category")
+    parser.add_argument('--output', default=app.CATEGORY_MODEL_PATH, help="where to save the model")
+    parser.add_argument('--bits', type=int, default=18, help="feature hash size in bits")
+    parser.add_argument('--alpha', type=float, default=0.1, help="smoothing")
+    parser.add_argument('--min-confidence', type=float, default=app.CATEGORY_MODEL_MIN_CONFIDENCE,
+                        help="confidence the app requires before using a prediction")
+    args = parser.parse_args()
+
+    examples = deduplicate(load_examples(args.paths))
+    captures = [path for path in args.paths if is_capture(path)]
+    print(f"{len(examples)} distinct labelled queries from {len(capture_files(captures))} capture files "
+          f"and {len(args.paths) - len(captures)} JSONL files")
+    print("Categories: " + ", ".join(f"{category} {count}" for category, count in
+                                     Counter(category for _, category in examples).most_common()))
+    train, calibration, holdout = split(examples)
+    if not train or not calibration or not holdout:
+        print("Not enough examples to calibrate and hold any out", file=sys.stderr)
+        return 1
+
+    model = CategoryClassifier.train(train, bits=args.bits, alpha=args.alpha)
+    model.calibrate(calibration)
+    print(f"\nTrained on {len(train)} queries, calibrated on {len(calibration)}")
+    report(model, holdout, args.min_confidence)
+
+    final = CategoryClassifier.train(examples, bits=args.bits, alpha=args.alpha)
+    final.temperature = model.temperature
+    final.save(args.output)
+    print(f"\nSaved {args.output} ({os.path.getsize(args.output) // 1024} KB)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
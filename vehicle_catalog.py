@@ -0,0 +1,307 @@
+"""
+Vehicle make/model catalog for answering named-vehicle queries without Ollama
+
+The catalog in data/vehicle_catalog.json lists makes with their aliases, and
+for each model its aliases, trims, body variants, body type and market
+segment. It is compiled into a phrase table (normalized phrase -> candidate
+makes, models and trims) that is scanned over the query's words with a
+longest-match lookup, like the Craigslist site matcher. Single-word names of
+five letters or more also match with one typo ("camery", "corrola") through
+an index of their one-letter deletions. complete() does prefix lookup over
+the display names for autocompletion.
+
+recommendations() turns the vehicles named in a query into the answer Ollama
+would give ("BMW 335i", "BMW 3 Series", ...). It only answers when every
+other word of the query is one the filter extractors understand (years,
+prices, miles, a city, title status and so on) or filler; "camry floor mats"
+or "mustang horse saddle" are about something else. Those queries, and ones
+that name no known vehicle or only a make without any car context, return
+None and are left to the LLM.
+"""
+
+import bisect
+import json
+import os
+import threading
+
+from refinement import intent_words
+from site_catalog import normalize_phrase, query_words
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'vehicle_catalog.json')
+
+# Phrase kinds
+MAKE = 0
+MODEL = 1
+TRIM = 2
+
+MAX_RECOMMENDATIONS = 5
+# Names this long can be matched with one typo, by query words of at least FUZZY_MIN_WORD letters
+FUZZY_MIN_LENGTH = 5
+FUZZY_MIN_WORD = 6
+
+# Words that mean the query is about something other than the vehicle itself
+NON_VEHICLE_WORDS = frozenset("""
+    part parts rims bumper bumpers headlight headlights taillight taillights mirror mirrors
+    manuals toy toys diecast lego poster posters
+    mat mats tailgate tailgates charger chargers cover covers seat seats hitch tire tires
+    engine engines battery batteries grille hood fender fenders door doors radio stereo
+    speaker speakers roof rack racks kit kits decal decals sticker stickers key keys fob
+    saddle game games matchbox hotwheels
+""".split())
+
+# Words that ask for comparable models from other makes too
+ALTERNATIVE_WORDS = frozenset("similar like alternative alternatives comparable competitor competitors".split())
+
+# Query words naming a body type, mapped to the catalog's model types
+TYPE_WORDS = {
+    "sedan": "sedan", "sedans": "sedan",
+    "hatchback": "hatchback", "hatchbacks": "hatchback", "hatch": "hatchback",
+    "coupe": "coupe", "coupes": "coupe",
+    "suv": "suv", "suvs": "suv", "crossover": "suv", "crossovers": "suv",
+    "truck": "pickup", "trucks": "pickup", "pickup": "pickup", "pickups": "pickup",
+    "van": "van", "vans": "van", "minivan": "minivan", "minivans": "minivan",
+    "wagon": "wagon", "wagons": "wagon",
+    "sports": "sports", "sporty": "sports", "convertible": "sports", "roadster": "sports",
+}
+
+# Words that make a bare make name ("honda") refer to a car
+VEHICLE_CONTEXT_WORDS = frozenset(TYPE_WORDS) | frozenset("car cars vehicle vehicles auto automobile".split())
+
+# Describing words that don't change which vehicles the catalog would list
+CATALOG_FILLER_WORDS = frozenset("something cheap affordable reliable good nice great used buy sale".split())
+
+def deletions(word):
+    """The word with each single letter removed"""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+def _is_distinctive_trim(trim):
+    """Trims like "335i" or "C300" name a car on their own; "Si" or "GT" only after the model"""
+    normalized = normalize_phrase(trim).replace(" ", "")
+    return len(normalized) >= 4 and any(c.isdigit() for c in normalized) and any(c.isalpha() for c in normalized)
+
+class VehicleCatalog:
+    """Compiled make/model/trim lookup tables"""
+
+    def __init__(self, catalog):
+        self.version = catalog["version"]
+        self.makes = catalog["makes"]
+        self.phrases = {}       # normalized phrase -> [(kind, make index, model index, trim)]
+        self.fuzzy = {}         # one-letter deletion -> {normalized single-word phrase}
+        self.by_segment = {}    # segment -> [(make index, model index)], in catalog order
+
+        for make_index, make in enumerate(self.makes):
+            make_entry = (MAKE, make_index, None, None)
+            make_phrases = [make["make"], *make.get("aliases", [])]
+            for phrase in make_phrases:
+                self._add(phrase, make_entry)
+            for model_index, model in enumerate(make["models"]):
+                self.by_segment.setdefault(model["segment"], []).append((make_index, model_index))
+                model_entry = (MODEL, make_index, model_index, None)
+                model_phrases = [model["name"], *model.get("aliases", [])]
+                trim_phrases = []
+                for trim in model.get("trims", []):
+                    trim_entry = (TRIM, make_index, model_index, trim)
+                    trim_phrases.append((f"{model['name']} {trim}", trim_entry))
+                    if _is_distinctive_trim(trim):
+                        trim_phrases.append((trim, trim_entry))
+                for phrase in model_phrases:
+                    self._add(phrase, model_entry)
+                for phrase, entry in trim_phrases:
+                    self._add(phrase, entry)
+                # "ram 1500", "honda civic si": the make in front also vouches for the model
+                for make_phrase in make_phrases:
+                    for phrase in model_phrases:
+                        self._add(f"{make_phrase} {phrase}", make_entry, model_entry)
+                    for phrase, entry in trim_phrases:
+                        self._add(f"{make_phrase} {phrase}", make_entry, entry)
+
+        self.max_words = max(len(phrase.split()) for phrase in self.phrases)
+        self.first_words = frozenset(phrase.split(" ", 1)[0] for phrase in self.phrases)
+
+        for phrase, candidates in self.phrases.items():
+            fuzzy_ok = all(kind == MAKE or not self.model(make_index, model_index).get("requires_make")
+                           for kind, make_index, model_index, _ in candidates)
+            if " " not in phrase and len(phrase) >= FUZZY_MIN_LENGTH and phrase.isalpha() and fuzzy_ok:
+                for variant in deletions(phrase) | {phrase}:
+                    self.fuzzy.setdefault(variant, set()).add(phrase)
+
+        # Sorted display names for prefix completion
+        self.names = sorted({(normalize_phrase(name), name) for name in self._display_names()})
+
+    def _add(self, phrase, *entries):
+        phrase = normalize_phrase(phrase)
+        if phrase:
+            candidates = self.phrases.setdefault(phrase, [])
+            candidates.extend(entry for entry in entries if entry not in candidates)
+
+    def model(self, make_index, model_index):
+        return self.makes[make_index]["models"][model_index]
+
+    def model_name(self, make_index, model_index):
+        """Display name such as "Honda Civic" (or "Mazda3", which already has the make)"""
+        make = self.makes[make_index]["make"]
+        name = self.model(make_index, model_index)["name"]
+        return name if name.startswith(make) else f"{make} {name}"
+
+    def _display_names(self):
+        for make_index, make in enumerate(self.makes):
+            yield make["make"]
+            for model_index, _ in enumerate(make["models"]):
+                yield self.model_name(make_index, model_index)
+
+    def _fuzzy_phrase(self, word):
+        """The single catalog phrase within one typo of a word, or None"""
+        if len(word) < FUZZY_MIN_WORD or not word.isalpha():
+            return None
+        matches = set()
+        for variant in deletions(word) | {word}:
+            matches |= self.fuzzy.get(variant, set())
+        return matches.pop() if len(matches) == 1 else None
+
+    def scan(self, words):
+        """Non-overlapping (phrase candidates, fuzzy, first word index, word count) found in a word list, longest match first from the left"""
+        found = []
+        start = 0
+        while start < len(words):
+            matched = 0
+            if words[start] in self.first_words:
+                for length in range(min(self.max_words, len(words) - start), 0, -1):
+                    candidates = self.phrases.get(" ".join(words[start:start + length]))
+                    if candidates:
+                        found.append((candidates, False, start, length))
+                        matched = length
+                        break
+            if not matched:
+                phrase = self._fuzzy_phrase(words[start])
+                if phrase:
+                    found.append((self.phrases[phrase], True, start, 1))
+                    matched = 1
+            start += matched or 1
+        return found
+
+    def match(self, query):
+        """Return (make indexes named, [(make index, model index, trim)], whether every match was fuzzy, matched word indexes)"""
+        makes, vehicles, matched = set(), [], set()
+        found = self.scan(query_words(query))
+        for candidates, _, start, length in found:
+            matched.update(range(start, start + length))
+            makes.update(make_index for kind, make_index, _, _ in candidates if kind == MAKE)
+
+        exact = False
+        for candidates, fuzzy, _, _ in found:
+            models = [entry for entry in candidates if entry[0] != MAKE]
+            if not models:
+                continue
+            # A model name shared by several makes, or one that is also an
+            # everyday word ("Focus", "Pilot"), needs its make in the query
+            named = [entry for entry in models if entry[1] in makes]
+            if not named:
+                named = [entry for entry in models if not self.model(entry[1], entry[2]).get("requires_make")
+                         and not self.makes[entry[1]].get("requires_context")]
+                if len({(make_index, model_index) for _, make_index, model_index, _ in named}) != 1:
+                    continue
+            # Prefer the trim when a phrase is both a model alias and a trim ("wrx sti")
+            _, make_index, model_index, trim = max(named, key=lambda entry: entry[0])
+            exact = exact or not fuzzy
+            if (make_index, model_index, trim) not in vehicles:
+                vehicles.append((make_index, model_index, trim))
+        return makes, vehicles, not exact, matched
+
+    def _only_filters(self, query, words, matched):
+        """Whether the query is just the vehicles it names plus words the filter extractors handle"""
+        named = {words[i] for i in matched} | VEHICLE_CONTEXT_WORDS | ALTERNATIVE_WORDS | CATALOG_FILLER_WORDS
+        return named.issuperset(intent_words(query))
+
+    def recommendations(self, query):
+        """The catalog's answer for a query naming known vehicles, or None
+
+        Returns a parsed-response dict shaped like the LLM's answer.
+        """
+        words = query_words(query)
+        if NON_VEHICLE_WORDS.intersection(words):
+            return None
+        makes, vehicles, fuzzy_only, matched = self.match(query)
+        if not self._only_filters(query, words, matched):
+            return None
+        has_context = bool(VEHICLE_CONTEXT_WORDS.intersection(words))
+        if vehicles and fuzzy_only and not makes and not has_context:
+            # A lone near-miss ("sentry" for Sentra) is too weak on its own
+            return None
+
+        items, named = [], []
+        padded = f" {' '.join(words)} "
+        if vehicles:
+            for make_index, model_index, trim in vehicles:
+                model = self.model(make_index, model_index)
+                name = self.model_name(make_index, model_index)
+                named.append(name)
+                # Body styles the query asks for ("mustang convertible") go first
+                bodies = sorted(model.get("bodies", []), key=lambda body: f" {normalize_phrase(body)} " not in padded)
+                if trim:
+                    make = self.makes[make_index]["make"]
+                    trim_name = f"{make} {trim}" if _is_distinctive_trim(trim) else f"{name} {trim}"
+                    items.extend([trim_name, name])
+                    items.extend(f"{trim_name} {body}" for body in bodies[:1])
+                else:
+                    items.append(name)
+                    items.extend(f"{name} {body}" for body in bodies)
+        elif makes:
+            # A bare make only counts as a vehicle search with car words around it
+            if not has_context:
+                return None
+            wanted_types = {TYPE_WORDS[word] for word in words if word in TYPE_WORDS}
+            for make_index in sorted(makes):
+                named.append(self.makes[make_index]["make"])
+                for model_index, model in enumerate(self.makes[make_index]["models"]):
+                    if not wanted_types or model["type"] in wanted_types:
+                        items.append(self.model_name(make_index, model_index))
+        if not items:
+            return None
+
+        # Keep the named vehicles first; pad with same-segment models only when asked for alternatives
+        recommendations = list(dict.fromkeys(items))
+        if ALTERNATIVE_WORDS.intersection(words):
+            primary = list(dict.fromkeys(self.model_name(make_index, model_index)
+                                         for make_index, model_index, _ in vehicles))
+            siblings = [self.model_name(*sibling)
+                        for make_index, model_index, _ in vehicles
+                        for sibling in self.by_segment[self.model(make_index, model_index)["segment"]]
+                        if sibling[0] != make_index]
+            recommendations = list(dict.fromkeys(primary + siblings + recommendations))
+
+        return {
+            "recommendations": recommendations[:MAX_RECOMMENDATIONS],
+            "category": "cta",
+            "min_price": None,
+            "max_price": None,
+            "explanation": f"Matched {', '.join(named)} in the vehicle catalog."
+        }
+
+    def complete(self, prefix, limit=10):
+        """Display names starting with a prefix, for autocompletion"""
+        prefix = normalize_phrase(prefix)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.names, (prefix,))
+        results = []
+        for normalized, name in self.names[start:]:
+            if not normalized.startswith(prefix) or len(results) >= limit:
+                break
+            results.append(name)
+        return results
+
+def load_catalog(path=CATALOG_PATH):
+    with open(path) as f:
+        return VehicleCatalog(json.load(f))
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """Return the process-wide catalog, loading it on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = load_catalog()
+    return _catalog